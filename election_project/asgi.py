@@ -3,6 +3,13 @@ ASGI config for election_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live results stream (``results/election/<id>/live/stream/``) holds a
+connection open per subscriber when served by an ASGI server such as
+``uvicorn election_project.asgi:application``; WSGI workers answer it with
+the current results and let the browser reconnect. Set ``DJANGO_ASYNC_VIEWS=1``
+as well to serve the ballot, vote submission and live results endpoints
+with their async views; see ``gunicorn.conf.py`` for both deployment modes.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
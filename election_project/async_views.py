@@ -0,0 +1,26 @@
+"""
+Helpers for views with ``async def`` handlers.
+
+Under ASGI such views run on the event loop, so they must not touch the
+database synchronously: that includes the lazy ``request.user``, the
+session and template context processors. ``AsyncLoginRequiredMixin`` loads
+the user (and with it the session) through the async auth API, and
+``arender`` renders templates in a worker thread so anything a template
+reads lazily stays off the loop.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import AccessMixin
+from django.shortcuts import render
+
+arender = sync_to_async(render)
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    """``LoginRequiredMixin`` for views whose handlers are coroutines"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Replace the lazy user so later sync code does not load it again
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
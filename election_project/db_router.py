@@ -0,0 +1,139 @@
+"""
+Read-replica routing.
+
+Views that only read results data set ``use_read_replica = True`` (see
+``ReadReplicaMixin``). While such a view runs, ``ReplicaRouter`` sends reads
+of the ``REPLICA_APPS`` models to one of ``DATABASE_REPLICAS``; sessions,
+auth and every other request keep reading the primary. Writes always go
+to the primary, and the first write pins the rest of the request to it so
+the view reads its own writes.
+
+A replica lagging more than ``REPLICA_MAX_LAG_SECONDS`` (or failing the lag
+check) is skipped until its next check, ``REPLICA_LAG_CHECK_INTERVAL``
+seconds later; with no usable replica, reads fall back to the primary.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+REPLICA_APPS = {'elections', 'results', 'voting'}
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def postgres_replica_lag(alias):
+    """Seconds the replica is behind; 0 once it has replayed everything it received"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def no_replica_lag(alias):
+    """Lag check for replicas that are not streamed, e.g. local test databases"""
+    return 0
+
+
+class LagMonitor:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = {}
+
+    def is_fresh(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            checked_at, fresh = self.checked.get(alias, (None, False))
+        if checked_at is not None and now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+            return fresh
+
+        check = import_string(getattr(settings, 'REPLICA_LAG_CHECK', 'election_project.db_router.postgres_replica_lag'))
+        try:
+            lag = check(alias)
+            fresh = lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+            if not fresh:
+                logger.warning(f"Replica {alias} is {lag}s behind, reading from the primary")
+        except DatabaseError:
+            logger.exception(f"Replica {alias} lag check failed, reading from the primary")
+            fresh = False
+        with self.lock:
+            self.checked[alias] = (now, fresh)
+        return fresh
+
+    def reset(self):
+        with self.lock:
+            self.checked.clear()
+
+
+lag_monitor = LagMonitor()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or state['pinned'] or model._meta.app_label not in REPLICA_APPS:
+            return None
+        if state['replica'] is None:
+            replicas = [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if lag_monitor.is_fresh(alias)]
+            state['replica'] = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['pinned'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+class ReplicaMiddleware:
+    """Lets views marked ``use_read_replica`` read from a replica for the rest of the request"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request_state.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_state.set(None)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if getattr(view_class, 'use_read_replica', False):
+            # One replica per request, so every read sees the same snapshot
+            _request_state.set({'pinned': False, 'replica': None})
+        return None
+
+
+class ReadReplicaMixin:
+    """Mark a read-only view as safe to serve from a read replica"""
+    use_read_replica = True
@@ -0,0 +1,213 @@
+"""
+Per-view request metrics exposed in the Prometheus text format.
+
+``MetricsMiddleware`` records, for every request, the resolved URL name,
+the latency, and the number and total duration of the database queries it
+ran. ``metrics_view`` serves the counters at ``/metrics`` to staff users
+and to scrapers sending ``Authorization: Bearer <METRICS_TOKEN>``. Queries slower
+than ``SLOW_QUERY_THRESHOLD_MS`` are logged with their SQL and the view that
+issued them.
+
+Queries are counted by an execute wrapper installed on every database
+connection as it opens, which finds the running request's timer in a
+context variable. ORM calls of async views run in ``sync_to_async``
+threads with connections of their own, and the context follows them there.
+
+Counters live in process memory, so each worker exposes its own series;
+scrape every worker or aggregate with the Prometheus ``instance`` label.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+slow_query_logger = logging.getLogger('election_project.slow_queries')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class QueryTimer:
+    """Database execute wrapper counting and timing the queries of one request"""
+
+    def __init__(self, slow_threshold):
+        self.count = 0
+        self.duration = 0.0
+        self.slow_threshold = slow_threshold
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+                self.slow.append((sql, elapsed))
+
+
+_request_timer = ContextVar('metrics_query_timer', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    timer = _request_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+# Connections this thread opened before the module was imported
+for _connection in connections.all(initialized_only=True):
+    install_query_timer(None, _connection)
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.requests = {}
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view, method, status, latency, queries, query_seconds):
+        with self.lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics()
+            key = (method, status)
+            metrics.requests[key] = metrics.requests.get(key, 0) + 1
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    metrics.bucket_counts[index] += 1
+                    break
+            else:
+                metrics.bucket_counts[-1] += 1
+            metrics.latency_sum += latency
+            metrics.latency_count += 1
+            metrics.queries += queries
+            metrics.query_seconds += query_seconds
+
+    def render(self):
+        lines = [
+            '# HELP django_http_requests_total Requests handled, by view, method and status.',
+            '# TYPE django_http_requests_total counter',
+        ]
+        with self.lock:
+            views = sorted(self.views.items())
+            for view, metrics in views:
+                for (method, status), count in sorted(metrics.requests.items()):
+                    lines.append(f'django_http_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+
+            lines += [
+                '# HELP django_http_request_duration_seconds Request latency by view.',
+                '# TYPE django_http_request_duration_seconds histogram',
+            ]
+            for view, metrics in views:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, metrics.bucket_counts):
+                    cumulative += count
+                    lines.append(f'django_http_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                lines.append(f'django_http_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {metrics.latency_count}')
+                lines.append(f'django_http_request_duration_seconds_sum{{view="{view}"}} {metrics.latency_sum:.6f}')
+                lines.append(f'django_http_request_duration_seconds_count{{view="{view}"}} {metrics.latency_count}')
+
+            lines += [
+                '# HELP django_db_queries_total Database queries run, by view.',
+                '# TYPE django_db_queries_total counter',
+            ]
+            for view, metrics in views:
+                lines.append(f'django_db_queries_total{{view="{view}"}} {metrics.queries}')
+
+            lines += [
+                '# HELP django_db_query_duration_seconds_total Time spent in database queries, by view.',
+                '# TYPE django_db_query_duration_seconds_total counter',
+            ]
+            for view, metrics in views:
+                lines.append(f'django_db_query_duration_seconds_total{{view="{view}"}} {metrics.query_seconds:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = self.query_timer()
+        started = time.perf_counter()
+        token = _request_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = self.query_timer()
+        started = time.perf_counter()
+        token = _request_timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    def query_timer(self):
+        threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+        return QueryTimer(threshold_ms / 1000 if threshold_ms is not None else None)
+
+    def observe(self, request, response, latency, timer):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        registry.observe(view, request.method, response.status_code, latency, timer.count, timer.duration)
+
+        for sql, elapsed in timer.slow:
+            slow_query_logger.warning(f"Slow query ({elapsed * 1000:.1f}ms) in view {view}: {sql}")
+
+
+def metrics_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics_view(request):
+    # Per-view traffic and latency would help anyone probing the site
+    if not metrics_allowed(request):
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'election_project.metrics.MetricsMiddleware',
+    'election_project.db_router.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,6 +69,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media',
+                'users.roles.role',
             ],
         },
     },
@@ -89,6 +92,17 @@ DATABASES = {
     }
 }
 
+# Read replicas: add each replica to DATABASES (with 'TEST': {'MIRROR':
+# 'default'}) and list its alias here. Results pages, vote exports and
+# election listings read from a replica lagging at most
+# REPLICA_MAX_LAG_SECONDS, checked every REPLICA_LAG_CHECK_INTERVAL seconds;
+# otherwise from default
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['election_project.db_router.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_LAG_CHECK_INTERVAL = 2
+REPLICA_LAG_CHECK = 'election_project.db_router.postgres_replica_lag'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -135,6 +149,12 @@ import os
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Candidate photos are cropped to squares of these sizes in pixels (results
+# cards show 100 and the profile page 200, both at double density) and
+# stored as WebP and JPEG in this media directory
+CANDIDATE_PHOTO_SIZES = (200, 400)
+CANDIDATE_PHOTO_DIR = 'candidates/renditions'
+
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 LOGIN_URL = '/users/login/'
@@ -142,3 +162,109 @@ LOGIN_URL = '/users/login/'
 # Security settings (for production)
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
+
+# Serve the ballot, vote submission and live results endpoints with their
+# async views. Turn on for the ASGI deployment (uvicorn workers, see
+# gunicorn.conf.py); sync WSGI workers should leave it off, as they would
+# run every async view in its own event loop
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+# Live results stream: seconds between tally reads shared by all subscribers,
+# and, when served by WSGI workers that cannot hold the stream open, seconds
+# after which the browser reconnects for fresh results
+LIVE_RESULTS_POLL_INTERVAL = 1.0
+LIVE_RESULTS_STREAM_RETRY_SECONDS = 5
+
+# Serialized live results are cached per results version; the version in the
+# key makes entries stale-proof, so the timeout only bounds memory use
+LIVE_RESULTS_CACHE_TIMEOUT = 300
+
+# Background results reports: worker threads per process, and seconds after
+# which a job that never finished is queued again
+REPORT_WORKERS = 2
+REPORT_JOB_TIMEOUT = 600
+
+# Cache used by the live results, ballot rendering and login throttling.
+# Set REDIS_URL wherever several workers run: local memory is per process,
+# so invalidations would not reach the other workers and every worker would
+# keep its own throttle counters. gunicorn.conf.py warns when several
+# workers start without it
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Dashboard statistics are shared by all viewers for this many seconds;
+# election and role changes drop them immediately
+DASHBOARD_CACHE_TIMEOUT = 30
+
+# Co-voting analysis is cached per results version like the live results
+ANALYTICS_CACHE_TIMEOUT = 600
+
+# Round-by-round counts of ranked positions, cached per results version
+RANKED_COUNT_CACHE_TIMEOUT = 600
+
+# Seconds after an election's end_date before the first results request
+# freezes its final results snapshot; no close path may freeze one sooner
+RESULTS_CLOSE_GRACE_SECONDS = 60
+
+# Rendered ballots are cached per election and dropped whenever one of its
+# positions or candidates changes; the timeout bounds staleness in workers
+# that did not see the change when the cache is not shared
+BALLOT_CACHE_TIMEOUT = 300
+
+# Login throttling: every attempt takes a token from a bucket for the client
+# IP and one for the username, each (capacity, seconds to refill fully). An
+# empty bucket locks the IP or username out for LOGIN_LOCKOUT_SECONDS,
+# doubled for every lockout within LOGIN_STRIKES_TIMEOUT up to the maximum.
+# Rejections are written to the audit log at most once per interval and key.
+# Attempts are counted per fixed window of the period with atomic cache
+# increments; the cache must be shared between workers (REDIS_URL)
+LOGIN_THROTTLE_IP = (30, 300)
+LOGIN_THROTTLE_USERNAME = (5, 300)
+LOGIN_LOCKOUT_SECONDS = 60
+LOGIN_LOCKOUT_MAX_SECONDS = 3600
+LOGIN_STRIKES_TIMEOUT = 86400
+LOGIN_THROTTLE_AUDIT_INTERVAL = 60
+
+# Reverse proxies in front of the app that append the client address to
+# X-Forwarded-For; the default 1 is Render's load balancer. Client IPs for
+# login throttling and the audit log are read from that entry. Set 0 only
+# when clients connect directly: then they come from REMOTE_ADDR and
+# X-Forwarded-For is ignored
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', '1'))
+
+# Ed25519 private key (PEM) signing published vote tree roots; create it with
+# `manage.py generate_merkle_key`. Its public key is served with the roots.
+# Without the file, roots are published unsigned
+MERKLE_SIGNING_KEY_FILE = os.environ.get('MERKLE_SIGNING_KEY_FILE', os.path.join(BASE_DIR, 'merkle_signing_key.pem'))
+
+# Queries slower than this are logged with their SQL and originating view
+SLOW_QUERY_THRESHOLD_MS = 200
+
+# /metrics is served to staff users and to scrapers sending this bearer
+# token; leave it empty to allow staff only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Audit entries are buffered in memory and bulk-written by a background
+# thread; batches the database rejects are appended to the fallback file
+# (load them back with `manage.py replay_audit_log`)
+AUDIT_LOG_BUFFERED = True
+AUDIT_FLUSH_INTERVAL_MS = 500
+AUDIT_FLUSH_BATCH_SIZE = 200
+AUDIT_FALLBACK_PATH = os.path.join(BASE_DIR, 'audit_fallback.jsonl')
+
+# Audit rows older than the retention window are moved to compressed
+# archive files by `manage.py archive_audit_log`
+AUDIT_RETENTION_DAYS = 90
+AUDIT_ARCHIVE_DIR = os.path.join(BASE_DIR, 'audit_archive')
@@ -0,0 +1,25 @@
+"""
+Settings for running the test suite locally: two SQLite databases stand
+in for the primary and a read replica.
+
+    python manage.py test --settings=election_project.test_settings
+"""
+from election_project.settings import *  # noqa: F401,F403
+from election_project.settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_replica.sqlite3',
+    },
+}
+# Routing tests enable the replica with override_settings(DATABASE_REPLICAS=['replica'])
+DATABASE_REPLICAS = []
+REPLICA_LAG_CHECK = 'election_project.db_router.no_replica_lag'
+
+ALLOWED_HOSTS = ['testserver', 'localhost']
+AUDIT_LOG_BUFFERED = False
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+
+from election_project import urls as project_urls
+from election_project.metrics import MetricsRegistry, registry
+from results.views import AsyncLiveResultsView
+
+
+class AsyncUrls:
+    urlpatterns = [
+        path('results/election/<int:election_id>/live/', AsyncLiveResultsView.as_view(), name='live_results'),
+        path('', include(project_urls)),
+    ]
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.views.clear()
+
+    def test_middleware_records_requests_latency_and_queries(self):
+        user = User.objects.create_user('metrics-voter')
+        self.client.force_login(user)
+        self.client.get(reverse('election_list'), secure=True)
+        self.client.get(reverse('election_list'), secure=True)
+
+        metrics = registry.views['election_list']
+        self.assertEqual(metrics.requests, {('GET', 200): 2})
+        self.assertEqual(metrics.latency_count, 2)
+        self.assertEqual(sum(metrics.bucket_counts), 2)
+        self.assertGreater(metrics.queries, 0)
+
+    @override_settings(ROOT_URLCONF=AsyncUrls)
+    async def test_queries_run_by_asgi_requests_are_counted(self):
+        user = await User.objects.acreate(username='metrics-voter')
+        await self.async_client.aforce_login(user)
+        # A sync view run in a sync_to_async thread, then an async one
+        await self.async_client.get(reverse('election_list'), secure=True)
+        await self.async_client.get(reverse('live_results', args=[1]), secure=True)
+
+        self.assertGreater(registry.views['election_list'].queries, 0)
+        self.assertGreater(registry.views['live_results'].queries, 0)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    async def test_slow_queries_of_asgi_requests_are_logged(self):
+        await self.async_client.aforce_login(await User.objects.acreate(username='metrics-voter'))
+        with self.assertLogs('election_project.slow_queries', 'WARNING') as logs:
+            await self.async_client.get(reverse('election_list'), secure=True)
+        self.assertIn('in view election_list', logs.output[0])
+
+    def test_histogram_buckets_are_cumulative(self):
+        local = MetricsRegistry()
+        local.observe('home', 'GET', 200, 0.003, 1, 0.001)
+        local.observe('home', 'GET', 200, 0.2, 4, 0.05)
+        text = local.render()
+        self.assertIn('django_http_request_duration_seconds_bucket{view="home",le="0.005"} 1', text)
+        self.assertIn('django_http_request_duration_seconds_bucket{view="home",le="0.25"} 2', text)
+        self.assertIn('django_db_queries_total{view="home"} 5', text)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_endpoint_needs_staff_or_the_bearer_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, secure=True).status_code, 403)
+        self.assertEqual(self.client.get(url, secure=True, headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+
+        response = self.client.get(url, secure=True, headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'django_http_requests_total')
+
+        self.client.force_login(User.objects.create_user('voter'))
+        self.assertEqual(self.client.get(url, secure=True).status_code, 403)
+        self.client.force_login(User.objects.create_user('operator', is_staff=True))
+        self.assertEqual(self.client.get(url, secure=True).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_is_never_accepted(self):
+        response = self.client.get(reverse('metrics'), secure=True, headers={'Authorization': 'Bearer '})
+        self.assertEqual(response.status_code, 403)
@@ -20,11 +20,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
+from election_project.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('', TemplateView.as_view(template_name='home.html'), name='home'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Only include these if the apps exist
@@ -1,5 +1,9 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from .models import Election, Position, Candidate
+from django.utils import timezone
+from django.utils.html import format_html
+from results.snapshots import close_election, is_closable
 
 @admin.register(Election)
 class ElectionAdmin(admin.ModelAdmin):
@@ -7,11 +11,29 @@ class ElectionAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'start_date']
     search_fields = ['title', 'description']
     date_hierarchy = 'start_date'
+    actions = ['close_out']
+    
+    @admin.action(description='Close out: freeze final results')
+    def close_out(self, request, queryset):
+        closed = 0
+        now = timezone.now()
+        for election in queryset:
+            if not is_closable(election, now):
+                self.message_user(
+                    request,
+                    f"{election.title} has not ended, or ended less than "
+                    f"{settings.RESULTS_CLOSE_GRACE_SECONDS}s ago.",
+                    messages.WARNING
+                )
+                continue
+            close_election(election, user=request.user)
+            closed += 1
+        self.message_user(request, f"Froze results for {closed} election(s).")
 
 @admin.register(Position)
 class PositionAdmin(admin.ModelAdmin):
-    list_display = ['title', 'election', 'max_votes']
-    list_filter = ['election']
+    list_display = ['title', 'election', 'ballot_type', 'max_votes']
+    list_filter = ['election', 'ballot_type']
     search_fields = ['title', 'description']
 
 @admin.register(Candidate)
@@ -23,7 +45,9 @@ class CandidateAdmin(admin.ModelAdmin):
     
     def get_photo_url(self, obj):
         if obj.photo:
-            return f'<img src="{obj.photo.url}" width="100" height="100" style="object-fit: cover;" />'
+            return format_html(
+                '<img src="{}" width="100" height="100" style="object-fit: cover;" />',
+                obj.get_photo_url(200)
+            )
         return "No photo"
-    get_photo_url.allow_tags = True
     get_photo_url.short_description = 'Photo Preview'
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from elections.models import Candidate
+from elections.photos import build_renditions
+
+
+class Command(BaseCommand):
+    help = 'Build the WebP and JPEG renditions of candidate photos uploaded before renditions existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every photo, e.g. after changing CANDIDATE_PHOTO_SIZES')
+
+    def handle(self, *args, **options):
+        candidates = Candidate.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['all']:
+            candidates = candidates.filter(photo_hash='')
+
+        built = failed = 0
+        for candidate in candidates.only('id', 'photo').iterator():
+            photo_hash = build_renditions(candidate.photo)
+            # update() leaves the ballot cache and save() change tracking alone
+            Candidate.objects.filter(id=candidate.id).update(photo_hash=photo_hash)
+            if photo_hash:
+                built += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Built renditions for {built} photo(s), {failed} unreadable"))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0002_alter_candidate_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='position',
+            name='ballot_type',
+            field=models.CharField(choices=[('PLURALITY', 'Single choice'), ('APPROVAL', 'Approval'), ('IRV', 'Ranked choice (instant runoff)'), ('STV', 'Single transferable vote')], default='PLURALITY', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='position',
+            name='max_votes',
+            field=models.IntegerField(default=1, help_text='Seats to fill; approval and STV positions elect this many candidates'),
+        ),
+    ]
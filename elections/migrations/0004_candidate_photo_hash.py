@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0003_position_ballot_type_alter_position_max_votes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+
+from elections.photos import build_renditions, rendition_url
 
 class Election(models.Model):
     title = models.CharField(max_length=200)
@@ -13,26 +17,84 @@ class Election(models.Model):
         return self.title
 
 class Position(models.Model):
+    BALLOT_CHOICES = [
+        ('PLURALITY', 'Single choice'),
+        ('APPROVAL', 'Approval'),
+        ('IRV', 'Ranked choice (instant runoff)'),
+        ('STV', 'Single transferable vote'),
+    ]
+    RANKED_BALLOTS = {'IRV', 'STV'}
+    MULTI_SEAT_BALLOTS = {'APPROVAL', 'STV'}
+    
     election = models.ForeignKey(Election, on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
     description = models.TextField()
-    max_votes = models.IntegerField(default=1)
+    ballot_type = models.CharField(max_length=10, choices=BALLOT_CHOICES, default='PLURALITY')
+    max_votes = models.IntegerField(default=1, help_text='Seats to fill; approval and STV positions elect this many candidates')
     
     def __str__(self):
         return f"{self.title} - {self.election.title}"
+    
+    def clean(self):
+        if self.max_votes < 1:
+            raise ValidationError({'max_votes': 'A position fills at least one seat.'})
+        if self.max_votes > 1 and self.ballot_type not in self.MULTI_SEAT_BALLOTS:
+            raise ValidationError({'max_votes': 'Only approval and STV positions can fill more than one seat.'})
+    
+    @property
+    def is_ranked(self):
+        return self.ballot_type in self.RANKED_BALLOTS
+    
+    @property
+    def seats(self):
+        return self.max_votes if self.ballot_type in self.MULTI_SEAT_BALLOTS else 1
 
 class Candidate(models.Model):
     position = models.ForeignKey(Position, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     party = models.CharField(max_length=100)
     photo = models.ImageField(upload_to='candidates/%Y/%m/%d/', null=True, blank=True)
+    # Content hash naming the photo's renditions (elections.photos); empty
+    # until they are built, and then the original is served
+    photo_hash = models.CharField(max_length=20, blank=True, editable=False)
     manifesto = models.TextField()
     is_active = models.BooleanField(default=True)
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_photo = self.photo_name()
+    
     def __str__(self):
         return f"{self.name} - {self.position.title}"
     
-    def get_photo_url(self):
+    def photo_name(self):
+        # Deferred photos are absent from __dict__ and cannot have changed
+        photo = self.__dict__.get('photo')
+        return getattr(photo, 'name', photo)
+    
+    def save(self, *args, **kwargs):
+        if 'photo' in self.__dict__ and (self.photo_name() != self._loaded_photo or not self.photo._committed):
+            self.photo_hash = build_renditions(self.photo) if self.photo else ''
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'photo' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'photo_hash'}
+        super().save(*args, **kwargs)
+        self._loaded_photo = self.photo_name()
+    
+    def photo_size(self, size):
+        """Smallest rendition size of at least ``size`` pixels, else the largest"""
+        sizes = sorted(settings.CANDIDATE_PHOTO_SIZES)
+        return next((s for s in sizes if size is not None and s >= size), sizes[-1])
+    
+    def get_photo_url(self, size=None):
+        """JPEG rendition for a ``size`` pixel square, or the original before renditions exist"""
+        if self.photo_hash:
+            return rendition_url(self.photo_hash, self.photo_size(size), 'jpg')
         if self.photo and hasattr(self.photo, 'url'):
             return self.photo.url
         return '/static/images/default_profile.jpg'
+    
+    def get_photo_webp_url(self, size=None):
+        if self.photo_hash:
+            return rendition_url(self.photo_hash, self.photo_size(size), 'webp')
+        return ''
@@ -0,0 +1,73 @@
+"""
+Candidate photo renditions.
+
+Uploaded photos can be several megabytes, while the results page shows
+them at 100 pixels. When a candidate's photo changes, ``Candidate.save``
+crops it to squares of every ``CANDIDATE_PHOTO_SIZES`` and stores each
+as WebP and JPEG under ``CANDIDATE_PHOTO_DIR``. Each file name starts
+with a hash of the uploaded file, so a rendition never changes once
+written and ``CandidatePhotoView`` serves it with an immutable cache
+header. Identical uploads share their renditions.
+
+``manage.py build_photo_renditions`` fills in photos uploaded before
+renditions existed.
+"""
+import hashlib
+import io
+import logging
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# extension: (Pillow format, content type, save options)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+RENDITION_NAME = re.compile(r'^(?P<digest>[0-9a-f]{20})-(?P<size>\d+)\.(?P<extension>webp|jpg)$')
+
+
+def rendition_path(name):
+    return f'{settings.CANDIDATE_PHOTO_DIR}/{name}'
+
+
+def rendition_url(digest, size, extension):
+    return reverse('candidate_photo', args=[f'{digest}-{size}.{extension}'])
+
+
+def build_renditions(photo):
+    """Write every rendition of an image file and return its content hash, or '' if it cannot be read"""
+    try:
+        photo.open('rb')
+        try:
+            data = photo.read()
+        finally:
+            # A pending upload is saved to storage from this same file object
+            if photo._committed:
+                photo.close()
+            else:
+                photo.seek(0)
+        with Image.open(io.BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source).convert('RGB')
+    except (OSError, Image.DecompressionBombError):
+        logger.warning(f"Could not read candidate photo {photo.name}, serving the original")
+        return ''
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    for size in settings.CANDIDATE_PHOTO_SIZES:
+        square = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for extension, (image_format, _, options) in RENDITION_FORMATS.items():
+            path = rendition_path(f'{digest}-{size}.{extension}')
+            if default_storage.exists(path):
+                continue
+            buffer = io.BytesIO()
+            square.save(buffer, image_format, **options)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+    return digest
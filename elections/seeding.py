@@ -0,0 +1,82 @@
+import hashlib
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from elections.models import Election, Position, Candidate
+from users.models import UserProfile
+
+
+def seed_election(positions=5, candidates=6, voters=1000, turnout=1.0, title='Benchmark Election', prefix='bench', password=None):
+    """Create an open election with synthetic voters and ballots.
+
+    Used by the benchmark and load-test commands. Voters get unusable
+    passwords, so log them in with ``force_login``, unless ``password`` is
+    given, in which case every voter shares that password (hashed once).
+    """
+    from voting.models import Vote, Participation
+    from voting.merkle import rebuild_tree
+    from results.models import rebuild_tallies
+
+    now = timezone.now()
+    run = uuid.uuid4().hex[:8]
+    owner = User.objects.create(username=f'{prefix}-owner-{run}', password='!')
+    election = Election.objects.create(
+        title=title,
+        description='Synthetic election for benchmarking',
+        start_date=now - timedelta(days=1),
+        end_date=now + timedelta(days=1),
+        is_active=True,
+        created_by=owner,
+    )
+
+    position_objs = Position.objects.bulk_create([
+        Position(election=election, title=f'Position {i + 1}', description='')
+        for i in range(positions)
+    ])
+    Candidate.objects.bulk_create([
+        Candidate(position=position, name=f'Candidate {position.id}-{j + 1}', party=f'Party {j + 1}', manifesto='')
+        for position in position_objs
+        for j in range(candidates)
+    ])
+    ballot = {
+        position.id: list(Candidate.objects.filter(position=position).values_list('id', flat=True))
+        for position in position_objs
+    }
+
+    password_hash = make_password(password) if password else '!'
+    voter_objs = User.objects.bulk_create([
+        User(username=f'{prefix}-{run}-{i}', password=password_hash)
+        for i in range(voters)
+    ], batch_size=1000)
+    UserProfile.objects.bulk_create([
+        UserProfile(user=voter, role='VOTER')
+        for voter in voter_objs
+    ], batch_size=1000)
+
+    voted = voter_objs[:int(len(voter_objs) * turnout)]
+    votes = []
+    for i, voter in enumerate(voted):
+        for position in position_objs:
+            choices = ballot[position.id]
+            # Skew the spread so results have a clear ordering
+            candidate_id = choices[(i * i + position.id) % len(choices)]
+            votes.append(Vote(
+                voter=voter,
+                candidate_id=candidate_id,
+                position=position,
+                election=election,
+                vote_hash=hashlib.sha256(uuid.uuid4().bytes).hexdigest(),
+            ))
+    Vote.objects.bulk_create(votes, batch_size=2000)
+    Participation.objects.bulk_create([
+        Participation(voter=voter, election=election)
+        for voter in voted
+    ], batch_size=2000)
+    rebuild_tallies([election])
+    rebuild_tree(election)
+
+    return election, voter_objs
@@ -1,3 +1,80 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from elections.models import Candidate, Election, Position
+from elections.photos import rendition_path
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def photo_upload(name='portrait.jpg', size=(1600, 1200), color=(200, 40, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG', quality=95)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, AUDIT_LOG_BUFFERED=False, CANDIDATE_PHOTO_SIZES=(200, 400))
+class CandidatePhotoTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user('viewer', password='a-long-unique-passphrase')
+        now = timezone.now()
+        election = Election.objects.create(
+            title='Photo Election', description='', start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=1), is_active=True, created_by=self.user,
+        )
+        self.election = election
+        self.position = Position.objects.create(election=election, title='Chair', description='')
+
+    def test_upload_builds_hashed_renditions(self):
+        candidate = Candidate.objects.create(position=self.position, name='Ada', party='A', manifesto='', photo=photo_upload())
+
+        self.assertEqual(len(candidate.photo_hash), 20)
+        for size in (200, 400):
+            for extension, image_format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(rendition_path(f'{candidate.photo_hash}-{size}.{extension}')) as rendition:
+                    with Image.open(rendition) as image:
+                        self.assertEqual((image.format, image.size), (image_format, (size, size)))
+        self.assertEqual(candidate.get_photo_url(100), f'/elections/photos/{candidate.photo_hash}-200.jpg')
+        self.assertEqual(candidate.get_photo_webp_url(), f'/elections/photos/{candidate.photo_hash}-400.webp')
+
+        # The same image uploaded again shares its renditions; a new one gets new names
+        twin = Candidate.objects.create(position=self.position, name='Bea', party='B', manifesto='', photo=photo_upload('copy.jpg'))
+        self.assertEqual(twin.photo_hash, candidate.photo_hash)
+        candidate.photo = photo_upload(color=(10, 90, 200))
+        candidate.save()
+        self.assertNotEqual(candidate.photo_hash, twin.photo_hash)
+
+        candidate.photo = None
+        candidate.save()
+        self.assertEqual(candidate.photo_hash, '')
+        self.assertEqual(candidate.get_photo_url(), '/static/images/default_profile.jpg')
+
+    def test_renditions_are_served_immutable_and_used_by_results(self):
+        candidate = Candidate.objects.create(position=self.position, name='Ada', party='A', manifesto='', photo=photo_upload())
+
+        response = self.client.get(candidate.get_photo_webp_url(200), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertLess(len(b''.join(response.streaming_content)), 20000)
+        self.assertEqual(self.client.get('/elections/photos/../settings.py', secure=True).status_code, 404)
+        self.assertEqual(self.client.get('/elections/photos/0123456789abcdef0123-200.jpg', secure=True).status_code, 404)
+
+        self.client.force_login(self.user)
+        page = self.client.get(f'/results/election/{self.election.id}/', secure=True)
+        self.assertContains(page, f'<source srcset="/elections/photos/{candidate.photo_hash}-200.webp" type="image/webp">', html=False)
+        self.assertContains(page, f'src="/elections/photos/{candidate.photo_hash}-200.jpg"')
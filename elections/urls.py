@@ -6,4 +6,5 @@ from .views import CandidateDetailView
 urlpatterns = [
     path('', views.ElectionListView.as_view(), name='election_list'),
     path('candidate/<int:pk>/', CandidateDetailView.as_view(), name='candidate_detail'),
+    path('photos/<str:name>', views.CandidatePhotoView.as_view(), name='candidate_photo'),
 ]
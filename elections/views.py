@@ -1,19 +1,40 @@
 from django.shortcuts import render
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.views import View
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .models import Election
 from django.views.generic import DetailView
 from .models import Candidate  # Import Candidate from current app
+from election_project.db_router import ReadReplicaMixin
+from .photos import RENDITION_FORMATS, RENDITION_NAME, rendition_path
 
 
 
-class ElectionListView(LoginRequiredMixin, ListView):
+class ElectionListView(ReadReplicaMixin, LoginRequiredMixin, ListView):
     model = Election
     template_name = 'elections/election_list.html'
     context_object_name = 'elections'
 
 
-class CandidateDetailView(LoginRequiredMixin, DetailView):
+class CandidateDetailView(ReadReplicaMixin, LoginRequiredMixin, DetailView):
     model = Candidate
     template_name = 'elections/candidate_detail.html'
     context_object_name = 'candidate'
+
+
+class CandidatePhotoView(View):
+    """Photo renditions; their names carry a content hash, so browsers and CDNs keep them forever"""
+    
+    def get(self, request, name):
+        match = RENDITION_NAME.match(name)
+        if match is None or not default_storage.exists(rendition_path(name)):
+            raise Http404("No such photo")
+        
+        response = FileResponse(
+            default_storage.open(rendition_path(name)),
+            content_type=RENDITION_FORMATS[match['extension']][1]
+        )
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
@@ -0,0 +1,55 @@
+"""
+Gunicorn settings for the two deployment modes; gunicorn reads this file
+from the working directory.
+
+Sync (default): WSGI sync workers, each serving one request at a time, so
+a slow client holds a whole worker until its request is done::
+
+    gunicorn
+
+Async: uvicorn workers serving ``election_project.asgi`` with the async
+ballot, vote submission and live results views (``ASYNC_VIEWS``). A worker
+keeps thousands of connections open and only spends a thread on a request
+while it runs sync code (sessions, templates, the ballot transaction)::
+
+    DJANGO_ASYNC_VIEWS=1 gunicorn
+
+or, for a single process without gunicorn::
+
+    DJANGO_ASYNC_VIEWS=1 uvicorn election_project.asgi:application --host 0.0.0.0 --port 8000
+
+Under ASGI every request that touches the database opens its own
+connection and closes it afterwards; keep ``CONN_MAX_AGE`` at 0 and put a
+pooler such as PgBouncer in front of PostgreSQL when many requests query
+at once. ``manage.py benchmark_async`` compares both modes on this machine.
+
+Several workers only share cached results and login throttle counters
+through a shared cache, so set ``REDIS_URL`` whenever more than one runs;
+without it gunicorn logs a warning at startup and every worker keeps its
+own cache.
+"""
+import multiprocessing
+import os
+
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+if ASYNC_VIEWS:
+    wsgi_app = 'election_project.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Slow clients wait on the event loop, not on a worker
+    timeout = 60
+else:
+    wsgi_app = 'election_project.wsgi:application'
+    worker_class = 'sync'
+    timeout = 30
+
+
+def when_ready(server):
+    if workers > 1 and not os.environ.get('REDIS_URL'):
+        server.log.warning(
+            f'{workers} workers without REDIS_URL each keep their own cache and login throttle; '
+            'set REDIS_URL, or WEB_CONCURRENCY=1'
+        )
@@ -1,3 +1,25 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import ResultsSnapshot
+from .snapshots import verify_snapshot
+
+@admin.register(ResultsSnapshot)
+class ResultsSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['election', 'created_at', 'created_by', 'checksum', 'checksum_ok']
+    list_select_related = ['election', 'created_by']
+    readonly_fields = ['election', 'payload', 'checksum', 'created_at', 'created_by']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        # Deleting one would let the next results request freeze new totals
+        return False
+    
+    @admin.display(boolean=True, description='Checksum OK')
+    def checksum_ok(self, obj):
+        return verify_snapshot(obj)
@@ -0,0 +1,150 @@
+"""
+Cross-position co-voting analysis.
+
+Every selection is loaded as a ``(voter_id, candidate_id)`` integer pair
+straight from ``values_list`` into NumPy: one per plurality vote, and one
+per candidate in the packed ``ranking`` of approval and ranked votes. The
+pairs become a sparse CSR voter x candidate incidence matrix ``A``, so
+memory grows with the number of selections rather than voters x
+candidates. ``A.T @ A`` is the candidate co-vote matrix and ``A @ M``
+(candidate -> party/position) gives every voter's per-party coverage for
+the straight-ticket rates.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from elections.models import Candidate
+from voting.ballots import RANKING_DTYPE
+from voting.models import Vote
+
+
+def load_pairs(election, chunk_size=20000):
+    """(voter_ids, candidate_ids) of every selection in the election as int64 arrays"""
+    votes = Vote.objects.filter(election=election)
+    single = votes.filter(ranking__isnull=True).values_list('voter_id', 'candidate_id')
+    flat = np.fromiter(itertools.chain.from_iterable(single.iterator(chunk_size=chunk_size)), dtype=np.int64)
+    pairs = flat.reshape(-1, 2)
+    voter_ids, candidate_ids = [pairs[:, 0]], [pairs[:, 1]]
+
+    ranked = votes.filter(ranking__isnull=False).values_list('voter_id', 'ranking')
+    for voter_id, ranking in ranked.iterator(chunk_size=chunk_size):
+        selected = np.frombuffer(ranking, dtype=RANKING_DTYPE).astype(np.int64)
+        voter_ids.append(np.full(len(selected), voter_id, dtype=np.int64))
+        candidate_ids.append(selected)
+    return np.concatenate(voter_ids), np.concatenate(candidate_ids)
+
+
+def load_candidates(election):
+    rows = (
+        Candidate.objects.filter(position__election=election)
+        .order_by('position_id', 'id')
+        .values_list('id', 'name', 'party', 'position_id', 'position__title')
+    )
+    return pd.DataFrame.from_records(list(rows), columns=['id', 'name', 'party', 'position_id', 'position'])
+
+
+def covote_analysis(voter_ids, candidate_ids, candidates):
+    """
+    Co-vote counts and straight-ticket rates.
+
+    ``candidates`` is the frame from ``load_candidates``. Returns a dict with
+    ``ballots``, the ``covotes`` matrix (candidates x candidates, diagonal =
+    votes), the ``candidates`` frame, and ``parties`` (one row per party
+    with positions contested, supporters, straight-ticket voters and rate).
+    """
+    n_candidates = len(candidates)
+    if n_candidates == 0:
+        # No positions or candidates yet: nothing to count, and NumPy cannot
+        # reduce the empty incidence matrices
+        return {
+            'ballots': 0,
+            'candidates': candidates,
+            'covotes': np.zeros((0, 0), dtype=np.int64),
+            'parties': pd.DataFrame({
+                'party': pd.Series(dtype=object),
+                'positions': pd.Series(dtype=int),
+                'supporters': pd.Series(dtype=np.int64),
+                'straight': pd.Series(dtype=np.int64),
+                'rate': pd.Series(dtype=float),
+            }),
+        }
+    candidate_index = pd.Index(candidates['id'])
+    columns = candidate_index.get_indexer(candidate_ids)
+    known = columns >= 0
+    voter_ids, columns = voter_ids[known], columns[known]
+
+    # Dense voter numbering; a voter selects a candidate at most once
+    voters, rows = np.unique(voter_ids, return_inverse=True)
+    n_voters = len(voters)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, columns)), shape=(n_voters, n_candidates),
+    )
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+    covotes = (incidence.T @ incidence).toarray()
+
+    position_codes, positions = pd.factorize(candidates['position_id'])
+    party_names = candidates['party'].fillna('').str.strip()
+    party_codes, parties = pd.factorize(party_names.where(party_names != '', None))
+    n_positions, n_parties = len(positions), len(parties)
+
+    # Candidate -> (party, position) incidence; independents map nowhere
+    has_party = np.flatnonzero(party_codes >= 0)
+    party_position = sparse.csr_matrix(
+        (np.ones(len(has_party), dtype=np.int64),
+         (has_party, party_codes[has_party] * n_positions + position_codes[has_party])),
+        shape=(n_candidates, n_parties * n_positions),
+    )
+    # (party, position) column -> party
+    slot_party = sparse.csr_matrix(
+        (np.ones(n_parties * n_positions, dtype=np.int64),
+         (np.arange(n_parties * n_positions), np.repeat(np.arange(n_parties), n_positions))),
+        shape=(n_parties * n_positions, n_parties),
+    )
+    contested = np.bincount(np.unique(party_position.indices) // n_positions, minlength=n_parties)
+
+    # Positions each voter covered per party; only parties they voted for are stored
+    slots = incidence @ party_position
+    slots.data[:] = 1
+    covered = (slots @ slot_party).tocoo()
+    supporters = np.bincount(covered.col, minlength=n_parties).astype(np.int64)
+    straight = np.bincount(covered.col[covered.data == contested[covered.col]], minlength=n_parties).astype(np.int64)
+
+    party_frame = pd.DataFrame({
+        'party': list(parties),
+        'positions': contested.astype(int),
+        'supporters': supporters,
+        'straight': straight,
+    })
+    party_frame['rate'] = np.where(supporters > 0, straight / np.maximum(supporters, 1) * 100, 0.0).round(2)
+
+    return {
+        'ballots': n_voters,
+        'candidates': candidates,
+        'covotes': covotes,
+        'parties': party_frame.sort_values('supporters', ascending=False, ignore_index=True),
+    }
+
+
+def conditional_support(analysis):
+    """
+    Percentage of each row candidate's voters who also voted for each
+    column candidate in another position (NaN within the same position).
+    """
+    candidates = analysis['candidates']
+    covotes = analysis['covotes'].astype(np.float64)
+    votes = np.diag(covotes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(votes[:, None] > 0, covotes / votes[:, None] * 100, np.nan)
+    same_position = candidates['position_id'].to_numpy()[:, None] == candidates['position_id'].to_numpy()[None, :]
+    share[same_position] = np.nan
+    labels = [f"{row.name} ({row.position})" for row in candidates.itertuples()]
+    return pd.DataFrame(share.round(1), index=labels, columns=labels)
+
+
+def election_covoting(election):
+    voter_ids, candidate_ids = load_pairs(election)
+    return covote_analysis(voter_ids, candidate_ids, load_candidates(election))
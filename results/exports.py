@@ -0,0 +1,55 @@
+import csv
+import json
+import zlib
+
+from voting.models import Vote
+
+VOTE_EXPORT_FIELDS = ['vote_hash', 'position', 'candidate', 'timestamp']
+VOTE_EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def election_votes(election, chunk_size=VOTE_EXPORT_CHUNK_SIZE):
+    """Iterate over an election's raw votes with a server-side cursor"""
+    return Vote.objects.filter(election=election).order_by('id').values_list(
+        'vote_hash', 'position__title', 'candidate__name', 'timestamp'
+    ).iterator(chunk_size=chunk_size)
+
+
+def stream_votes_csv(election, lines_per_chunk=VOTE_EXPORT_CHUNK_SIZE):
+    """Yield CSV text, one chunk per batch of rows"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(VOTE_EXPORT_FIELDS)
+    lines = []
+    for vote_hash, position, candidate, timestamp in election_votes(election):
+        lines.append(writer.writerow([vote_hash, position, candidate, timestamp.isoformat()]))
+        if len(lines) >= lines_per_chunk:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def stream_votes_jsonl_gzip(election, lines_per_chunk=VOTE_EXPORT_CHUNK_SIZE):
+    """Yield gzip-compressed JSON Lines, sync-flushing after every batch of rows"""
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    lines = []
+    for vote_hash, position, candidate, timestamp in election_votes(election):
+        lines.append(json.dumps({
+            'vote_hash': vote_hash,
+            'position': position,
+            'candidate': candidate,
+            'timestamp': timestamp.isoformat(),
+        }))
+        if len(lines) >= lines_per_chunk:
+            yield compressor.compress(('\n'.join(lines) + '\n').encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            lines = []
+    if lines:
+        yield compressor.compress(('\n'.join(lines) + '\n').encode())
+    yield compressor.flush()
@@ -0,0 +1,118 @@
+import asyncio
+import contextvars
+import json
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from results.models import ResultsVersion
+from results.services import vote_counts
+
+
+def poll_interval():
+    return getattr(settings, 'LIVE_RESULTS_POLL_INTERVAL', 1.0)
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def format_retry(seconds):
+    """Tell the client how long to wait before reconnecting"""
+    return f"retry: {int(seconds * 1000)}\n\n"
+
+
+class ElectionFeed:
+    """Shared upstream for every live-results subscriber of one election.
+
+    A single task per election and process watches the results version,
+    re-reads the tally table only when it moves, and fans out just the
+    candidate counts that changed since the last read, so the cost of
+    counting does not grow with the number of viewers.
+    The task stops once the last subscriber disconnects.
+    """
+
+    def __init__(self, election_id):
+        self.election_id = election_id
+        self.version = None
+        self.counts = None
+        self.subscribers = set()
+        self.task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            # The feed outlives the request that starts it, so it must not
+            # inherit that request's replica routing state
+            self.task = asyncio.create_task(self.run(), context=contextvars.Context())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def run(self):
+        try:
+            while self.subscribers:
+                version = await sync_to_async(ResultsVersion.current)(self.election_id)
+                if version != self.version:
+                    counts = await sync_to_async(vote_counts)(self.election_id)
+                    if counts != self.counts:
+                        # The first read is sent in full so nothing cast between a
+                        # subscriber's snapshot and the feed starting is missed
+                        self.publish(self.diff(self.counts or {}, counts))
+                    self.version = version
+                    self.counts = counts
+                await asyncio.sleep(poll_interval())
+        finally:
+            _feeds.pop(self.election_id, None)
+
+    def publish(self, update):
+        for queue in self.subscribers:
+            queue.put_nowait(update)
+
+    @staticmethod
+    def diff(previous, current):
+        changed = [
+            {'position': position_id, 'candidate': candidate_id, 'votes': votes}
+            for (position_id, candidate_id), votes in current.items()
+            if previous.get((position_id, candidate_id)) != votes
+        ]
+        totals = defaultdict(int)
+        for (position_id, _), votes in current.items():
+            totals[position_id] += votes
+        changed_positions = {row['position'] for row in changed}
+        return {
+            'candidates': changed,
+            'totals': {position_id: totals[position_id] for position_id in changed_positions},
+        }
+
+
+_feeds = {}
+
+
+def get_feed(election_id):
+    feed = _feeds.get(election_id)
+    if feed is None:
+        feed = _feeds[election_id] = ElectionFeed(election_id)
+    return feed
+
+
+async def stream_results(election_id, snapshot, keepalive=15.0):
+    """Yield a full snapshot, then one 'update' event per change in the counts"""
+    feed = get_feed(election_id)
+    queue = feed.subscribe()
+    try:
+        yield format_event('snapshot', snapshot)
+        while True:
+            try:
+                update = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                # Comment lines keep idle connections open through proxies
+                yield ": keepalive\n\n"
+                continue
+            yield format_event('update', update)
+    finally:
+        feed.unsubscribe(queue)
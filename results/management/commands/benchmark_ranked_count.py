@@ -0,0 +1,42 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from results.ranked import count_rankings, preference_matrix
+
+
+def synthetic_rankings(ballots, candidates, seed=0):
+    """(lengths, candidate_ids) of random truncated rankings with skewed candidate popularity"""
+    rng = np.random.default_rng(seed)
+    popularity = np.log(rng.dirichlet(np.full(candidates, 2.0)))
+    # Sorting Gumbel-perturbed log-popularities draws Plackett-Luce rankings
+    order = np.argsort(-(rng.gumbel(size=(ballots, candidates)) + popularity), axis=1)
+    lengths = rng.integers(1, candidates + 1, ballots)
+    return lengths, (order + 1)[np.arange(candidates) < lengths[:, None]]
+
+
+class Command(BaseCommand):
+    help = 'Time the ranked-choice tally engine on synthetic ballots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ballots', type=int, default=1000000)
+        parser.add_argument('--candidates', type=int, default=8)
+        parser.add_argument('--seats', type=int, default=1)
+        parser.add_argument('--method', choices=['IRV', 'STV'], default='IRV')
+
+    def handle(self, *args, **options):
+        lengths, candidate_ids = synthetic_rankings(options['ballots'], options['candidates'])
+        self.stdout.write(f"{options['ballots']} ballot(s), {len(candidate_ids)} preference(s)")
+
+        started = time.perf_counter()
+        prefs, weights = preference_matrix(lengths, candidate_ids, list(range(1, options['candidates'] + 1)))
+        matrix_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        count = count_rankings(prefs, weights, options['candidates'], seats=options['seats'], method=options['method'])
+        count_ms = (time.perf_counter() - started) * 1000
+
+        self.stdout.write(f"preference matrix  {matrix_ms:.0f}ms ({len(prefs)} distinct ranking(s))")
+        self.stdout.write(f"{options['method']} count {count_ms:>9.0f}ms ({len(count['rounds'])} round(s))")
+        self.stdout.write(f"elected: {', '.join(f'Candidate {column + 1}' for column in count['elected'])}")
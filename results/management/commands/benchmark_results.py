@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from elections.models import Position, Candidate
+from elections.seeding import seed_election
+from results.services import build_election_results
+from voting.models import Vote
+
+
+def legacy_election_results(election):
+    """The per-candidate COUNT loop the results views used before the results service"""
+    results = []
+    for position in Position.objects.filter(election=election):
+        candidates = Candidate.objects.filter(position=position, is_active=True)
+        total_votes = Vote.objects.filter(position=position, election=election).count()
+        position_results = []
+        for candidate in candidates:
+            vote_count = Vote.objects.filter(candidate=candidate, position=position, election=election).count()
+            position_results.append({'candidate': candidate, 'vote_count': vote_count})
+        results.append({'position': position, 'candidates': position_results, 'total_votes': total_votes})
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Compare query count and latency of the legacy results loop against the results service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=8)
+        parser.add_argument('--voters', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Everything seeded here is rolled back when the benchmark finishes
+        with transaction.atomic():
+            election, _ = seed_election(
+                positions=options['positions'],
+                candidates=options['candidates'],
+                voters=options['voters'],
+            )
+            self.stdout.write(
+                f"Seeded {options['positions']} position(s) x {options['candidates']} candidate(s), "
+                f"{Vote.objects.filter(election=election).count()} vote(s)"
+            )
+
+            for label, build in [('before (per-candidate COUNT)', legacy_election_results),
+                                 ('after (results service)', build_election_results)]:
+                queries, timings = self.measure(build, election, options['repeat'])
+                self.stdout.write(
+                    f"{label:<30} queries={queries:<5} "
+                    f"median={statistics.median(timings):.2f}ms max={max(timings):.2f}ms"
+                )
+
+            transaction.set_rollback(True)
+
+    def measure(self, build, election, repeat):
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                build(election)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(captured)
+        return queries, timings
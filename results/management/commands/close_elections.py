@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from elections.models import Election
+from results.snapshots import close_election, is_closable, verify_snapshot
+from results.models import ResultsSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Freeze the final results of every ended election that has no snapshot yet '
+        '(suitable for cron), or verify existing snapshots'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election', type=int, action='append', dest='elections',
+            help='Only close this election ID (can be repeated); it must be past its grace period',
+        )
+        parser.add_argument('--verify', action='store_true', help='Check every snapshot against its checksum')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            broken = [snapshot for snapshot in ResultsSnapshot.objects.select_related('election') if not verify_snapshot(snapshot)]
+            for snapshot in broken:
+                self.stderr.write(f"Checksum mismatch: {snapshot.election.title}")
+            if broken:
+                raise CommandError(f"{len(broken)} snapshot(s) failed verification")
+            self.stdout.write(self.style.SUCCESS("All snapshots match their checksums."))
+            return
+
+        now = timezone.now()
+        if options['elections']:
+            elections = list(Election.objects.filter(id__in=options['elections']))
+            missing = set(options['elections']) - {election.id for election in elections}
+            if missing:
+                raise CommandError(f"Election(s) not found: {', '.join(map(str, sorted(missing)))}")
+            still_open = [election.id for election in elections if not is_closable(election, now)]
+            if still_open:
+                raise CommandError(
+                    f"Election(s) still open or within RESULTS_CLOSE_GRACE_SECONDS: {', '.join(map(str, still_open))}"
+                )
+        else:
+            elections = [
+                election for election in Election.objects.filter(end_date__lte=now, results_snapshot__isnull=True)
+                if is_closable(election, now)
+            ]
+
+        for election in elections:
+            snapshot = close_election(election)
+            self.stdout.write(self.style.SUCCESS(f"{election.title}: checksum {snapshot.checksum}"))
+        if not elections:
+            self.stdout.write('No elections to close.')
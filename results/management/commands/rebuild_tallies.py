@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from elections.models import Election
+from results.models import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = 'Recompute the candidate tally table from recorded votes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election', type=int, action='append', dest='elections',
+            help='Only rebuild tallies for this election ID (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        elections = None
+        if options['elections']:
+            elections = list(Election.objects.filter(id__in=options['elections']))
+            missing = set(options['elections']) - {election.id for election in elections}
+            if missing:
+                raise CommandError(f"Election(s) not found: {', '.join(map(str, sorted(missing)))}")
+
+        with transaction.atomic():
+            candidate_count = rebuild_tallies(elections)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {candidate_count} candidate tally row(s)."))
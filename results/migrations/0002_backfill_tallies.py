@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_tallies(apps, schema_editor):
+    Vote = apps.get_model('voting', 'Vote')
+    CandidateTally = apps.get_model('results', 'CandidateTally')
+    PositionTally = apps.get_model('results', 'PositionTally')
+
+    CandidateTally.objects.bulk_create([
+        CandidateTally(
+            election_id=row['election'],
+            position_id=row['position'],
+            candidate_id=row['candidate'],
+            votes=row['votes'],
+        )
+        for row in Vote.objects.values('election', 'position', 'candidate').annotate(votes=Count('id')).order_by()
+    ], batch_size=1000)
+
+    PositionTally.objects.bulk_create([
+        PositionTally(
+            election_id=row['election'],
+            position_id=row['position'],
+            total_votes=row['total_votes'],
+        )
+        for row in Vote.objects.values('election', 'position').annotate(total_votes=Count('id')).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0001_initial'),
+        ('voting', '0002_alter_auditlog_action'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    Election = apps.get_model('elections', 'Election')
+    ResultsVersion = apps.get_model('results', 'ResultsVersion')
+    ResultsVersion.objects.bulk_create([
+        ResultsVersion(election_id=election_id, generation=1)
+        for election_id in Election.objects.values_list('id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0002_alter_candidate_photo'),
+        ('results', '0002_backfill_tallies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.PositiveBigIntegerField(default=0)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='elections.election')),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0005_resultssnapshot'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='PositionTally',
+        ),
+    ]
@@ -1,3 +1,200 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
-# Create your models here.
+
+class CandidateTally(models.Model):
+    """Running vote count for a candidate, maintained as votes are cast"""
+
+    election = models.ForeignKey('elections.Election', on_delete=models.CASCADE)
+    position = models.ForeignKey('elections.Position', on_delete=models.CASCADE)
+    candidate = models.ForeignKey('elections.Candidate', on_delete=models.CASCADE)
+    votes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['election', 'position', 'candidate']
+
+    def __str__(self):
+        return f"{self.candidate.name} - {self.votes} vote(s)"
+
+    @classmethod
+    def increment(cls, election, position, candidate, by=1):
+        """Add votes to a candidate's tally; call inside the vote transaction"""
+        updated = cls.objects.filter(
+            election=election, position=position, candidate=candidate
+        ).update(votes=F('votes') + by)
+        if not updated:
+            tally, created = cls.objects.get_or_create(
+                election=election, position=position, candidate=candidate,
+                defaults={'votes': by}
+            )
+            if not created:
+                cls.objects.filter(pk=tally.pk).update(votes=F('votes') + by)
+
+    @classmethod
+    def increment_many(cls, election, candidates, by=1):
+        """Add votes to several candidates' tallies with a single UPDATE"""
+        candidate_ids = {candidate.id for candidate in candidates}
+        updated = cls.objects.filter(
+            election=election, candidate_id__in=candidate_ids
+        ).update(votes=F('votes') + by)
+        if updated < len(candidate_ids):
+            existing = set(cls.objects.filter(
+                election=election, candidate_id__in=candidate_ids
+            ).values_list('candidate_id', flat=True))
+            for candidate in candidates:
+                if candidate.id not in existing:
+                    cls.increment(election, candidate.position, candidate, by)
+
+
+class ResultsVersion(models.Model):
+    """Generation counter bumped whenever an election's results may have changed"""
+
+    election = models.OneToOneField('elections.Election', on_delete=models.CASCADE)
+    generation = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.election.title} - generation {self.generation}"
+
+    @classmethod
+    def current(cls, election_id):
+        generation = cls.objects.filter(
+            election_id=election_id
+        ).values_list('generation', flat=True).first()
+        return generation or 0
+
+    @classmethod
+    async def acurrent(cls, election_id):
+        generation = await cls.objects.filter(
+            election_id=election_id
+        ).values_list('generation', flat=True).afirst()
+        return generation or 0
+
+    @classmethod
+    def bump(cls, election_id):
+        cls.objects.filter(election_id=election_id).update(generation=F('generation') + 1)
+
+
+@receiver(post_save, sender='elections.Election')
+def create_results_version(sender, instance, created, **kwargs):
+    if created:
+        ResultsVersion.objects.get_or_create(election=instance)
+
+
+@receiver(post_save, sender='elections.Election')
+@receiver(post_delete, sender='elections.Election')
+@receiver(post_save, sender='users.UserProfile')
+@receiver(post_delete, sender='users.UserProfile')
+def dashboard_changed(sender, instance, **kwargs):
+    from results.services import invalidate_dashboard_stats
+    invalidate_dashboard_stats()
+
+
+@receiver(post_save, sender='elections.Position')
+@receiver(post_delete, sender='elections.Position')
+def position_changed(sender, instance, **kwargs):
+    ResultsVersion.bump(instance.election_id)
+
+
+@receiver(post_save, sender='elections.Candidate')
+@receiver(post_delete, sender='elections.Candidate')
+def candidate_changed(sender, instance, **kwargs):
+    ResultsVersion.objects.filter(
+        election__position=instance.position_id
+    ).update(generation=F('generation') + 1)
+
+
+class ReportJob(models.Model):
+    """A results report rendered in the background for one results version"""
+
+    FORMAT_CHOICES = [
+        ('PDF', 'PDF'),
+        ('CSV', 'CSV'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    election = models.ForeignKey('elections.Election', on_delete=models.CASCADE)
+    format = models.CharField(max_length=3, choices=FORMAT_CHOICES)
+    version = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    file = models.FileField(upload_to='reports/%Y/%m/%d/', null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['election', 'format', 'version']
+
+    def __str__(self):
+        return f"{self.election.title} {self.format} v{self.version} - {self.status}"
+
+
+class ResultsSnapshot(models.Model):
+    """Final results of a closed election, written once and never modified"""
+
+    election = models.OneToOneField('elections.Election', on_delete=models.CASCADE, related_name='results_snapshot')
+    payload = models.TextField()
+    checksum = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
+
+    def __str__(self):
+        return f"Final results for {self.election.title}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Results snapshots are immutable')
+        super().save(*args, **kwargs)
+
+
+def rebuild_tallies(elections=None):
+    """Recompute CandidateTally rows from the Vote table"""
+    from collections import Counter
+    from django.db.models import Count
+    from voting.ballots import unpack_ranking
+    from voting.models import Vote
+
+    votes = Vote.objects.all()
+    candidate_tallies = CandidateTally.objects.all()
+    if elections is not None:
+        votes = votes.filter(election__in=elections)
+        candidate_tallies = candidate_tallies.filter(election__in=elections)
+
+    candidate_tallies.delete()
+
+    # Approval votes count every approved candidate, the rest their first choice
+    candidate_rows = list(
+        votes.exclude(position__ballot_type='APPROVAL')
+        .values('election', 'position', 'candidate').annotate(votes=Count('id')).order_by()
+    )
+    approvals = Counter()
+    approval_votes = votes.filter(position__ballot_type='APPROVAL').values_list('election', 'position', 'candidate', 'ranking')
+    for election_id, position_id, candidate_id, ranking in approval_votes.iterator(chunk_size=10000):
+        for approved in (unpack_ranking(ranking) if ranking is not None else [candidate_id]):
+            approvals[(election_id, position_id, approved)] += 1
+    candidate_rows += [
+        {'election': election_id, 'position': position_id, 'candidate': candidate_id, 'votes': count}
+        for (election_id, position_id, candidate_id), count in approvals.items()
+    ]
+    CandidateTally.objects.bulk_create([
+        CandidateTally(
+            election_id=row['election'],
+            position_id=row['position'],
+            candidate_id=row['candidate'],
+            votes=row['votes'],
+        )
+        for row in candidate_rows
+    ], batch_size=1000)
+
+    version_elections = ResultsVersion.objects.all()
+    if elections is not None:
+        version_elections = version_elections.filter(election__in=elections)
+    version_elections.update(generation=F('generation') + 1)
+
+    return len(candidate_rows)
@@ -0,0 +1,238 @@
+"""
+Round-by-round counts for ranked-choice positions.
+
+Rankings are read from the packed ``Vote.ranking`` bytes into one uint32
+array and laid out as a ballots x preferences matrix of candidate columns
+(-1 pads short ballots). Identical rankings are merged into one weighted
+row, so even a million ballots over a handful of candidates shrink to a
+few thousand rows. Every round finds each row's highest continuing
+preference with one vectorized pass and tallies the rows with
+``np.bincount``, so no round loops over ballots in Python.
+
+IRV elects a candidate with a majority of the continuing ballots. STV
+uses the Droop quota and transfers an elected candidate's surplus at a
+fractional value (Gregory method). Either way the last-placed candidate
+is eliminated when nobody is elected; ties go to whoever had fewer votes
+in the latest round that separates them, then to the one listed last.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from results.models import ResultsVersion
+from voting.ballots import RANKING_DTYPE
+from voting.models import Vote
+
+
+def load_rankings(position, chunk_size=20000):
+    """(lengths, candidate_ids) of every ballot for the position, flattened in ballot order"""
+    rows = Vote.objects.filter(position=position).values_list('ranking', 'candidate_id')
+    packed = []
+    for ranking, candidate_id in rows.iterator(chunk_size=chunk_size):
+        # Votes cast before the position became ranked hold a single choice
+        packed.append(ranking if ranking is not None else np.array([candidate_id], dtype=RANKING_DTYPE).tobytes())
+    lengths = np.fromiter((len(ranking) for ranking in packed), dtype=np.int64, count=len(packed)) // RANKING_DTYPE.itemsize
+    candidate_ids = np.frombuffer(b''.join(packed), dtype=RANKING_DTYPE).astype(np.int64)
+    return lengths, candidate_ids
+
+
+def preference_matrix(lengths, candidate_ids, candidates):
+    """
+    Unique rankings as a matrix of column indexes into ``candidates`` and
+    their ballot counts. Preferences for anyone not in ``candidates`` (e.g.
+    withdrawn candidates) are skipped; ballots left empty are dropped.
+    """
+    candidates = np.asarray(candidates, dtype=np.int64)
+    if not len(candidates) or not len(lengths):
+        return np.full((0, 1), -1, dtype=np.int32), np.zeros(0, dtype=np.float64)
+    prefs = np.full((len(lengths), int(lengths.max())), -1, dtype=np.int32)
+
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    ranks = np.arange(len(candidate_ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    order = np.argsort(candidates, kind='stable')
+    found = np.minimum(np.searchsorted(candidates[order], candidate_ids), len(candidates) - 1)
+    known = candidates[order][found] == candidate_ids
+    prefs[rows[known], ranks[known]] = order[found[known]]
+
+    # Close the gaps left by skipped preferences
+    prefs = np.take_along_axis(prefs, np.argsort(prefs < 0, axis=1, kind='stable'), axis=1)
+    prefs = prefs[prefs[:, 0] >= 0]
+    base = len(candidates) + 1
+    if prefs.shape[1] * np.log2(base) < 63:
+        # Each ranking read as a base-(candidates + 1) number: a 1-d unique is far quicker than rows
+        keys = (prefs.astype(np.int64) + 1) @ base ** np.arange(prefs.shape[1] - 1, -1, -1, dtype=np.int64)
+        _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        return prefs[first], counts.astype(np.float64)
+    unique, counts = np.unique(prefs, axis=0, return_counts=True)
+    return unique, counts.astype(np.float64)
+
+
+def current_choices(prefs, continuing):
+    """Each row's highest-ranked continuing candidate, or -1 once its ballot is exhausted"""
+    # The padding value -1 picks the trailing False
+    live = np.append(continuing, False)[prefs]
+    first = live.argmax(axis=1)
+    rows = np.arange(len(prefs))
+    return np.where(live[rows, first], prefs[rows, first], -1)
+
+
+def last_place(history, continuing):
+    """Continuing candidate to eliminate, breaking ties on earlier rounds"""
+    latest = history[-1]
+    tied = np.flatnonzero(continuing & np.isclose(latest, latest[continuing].min()))
+    for earlier in reversed(history[:-1]):
+        if len(tied) == 1:
+            break
+        tied = tied[np.isclose(earlier[tied], earlier[tied].min())]
+    return int(tied[-1])
+
+
+def count_rankings(prefs, weights, n_candidates, seats=1, method='IRV'):
+    """
+    Run the count over a preference matrix from ``preference_matrix``.
+
+    Returns ``{'quota', 'ballots', 'rounds', 'elected'}``; each round has
+    the ``votes`` per candidate column, the ``exhausted`` ballot value and
+    the columns ``elected`` or ``eliminated`` at the end of that round.
+    """
+    weights = weights.astype(np.float64)
+    ballots = float(weights.sum())
+    quota = float(np.floor(ballots / (seats + 1)) + 1) if method == 'STV' else None
+    continuing = np.ones(n_candidates, dtype=bool)
+    elected = []
+    history = []
+    rounds = []
+
+    while True:
+        choices = current_choices(prefs, continuing)
+        counted = choices >= 0
+        votes = np.bincount(choices[counted], weights=weights[counted], minlength=n_candidates)
+        history.append(votes)
+        this_round = {
+            'votes': votes,
+            'exhausted': float(weights[~counted].sum()),
+            'elected': [],
+            'eliminated': [],
+        }
+        rounds.append(this_round)
+
+        open_seats = seats - len(elected)
+        standing = np.flatnonzero(continuing)
+        if open_seats <= 0 or not len(standing) or not ballots:
+            break
+        if len(standing) <= open_seats:
+            winners = standing[np.argsort(-votes[standing], kind='stable')].tolist()
+            elected += winners
+            this_round['elected'] = winners
+            break
+
+        if method == 'IRV':
+            leader = int(standing[np.argmax(votes[standing])])
+            if votes[leader] * 2 > votes[standing].sum():
+                elected.append(leader)
+                this_round['elected'] = [leader]
+                break
+        else:
+            reached = standing[votes[standing] >= quota]
+            if len(reached):
+                reached = reached[np.argsort(-votes[reached], kind='stable')][:open_seats].tolist()
+                for candidate in reached:
+                    # The ballots carrying the candidate move on at the surplus value
+                    weights[choices == candidate] *= (votes[candidate] - quota) / votes[candidate]
+                    continuing[candidate] = False
+                elected += reached
+                this_round['elected'] = reached
+                continue
+
+        loser = last_place(history, continuing)
+        continuing[loser] = False
+        this_round['eliminated'] = [loser]
+
+    return {'quota': quota, 'ballots': ballots, 'rounds': rounds, 'elected': elected}
+
+
+def count_position(position, candidates):
+    """
+    Count a ranked position among ``candidates`` (ids in ballot order).
+
+    The result only holds JSON types, with candidates given by id, so it
+    can be cached and frozen into results snapshots.
+    """
+    lengths, candidate_ids = load_rankings(position)
+    prefs, weights = preference_matrix(lengths, candidate_ids, candidates)
+    count = count_rankings(prefs, weights, len(candidates), seats=position.seats, method=position.ballot_type)
+    return {
+        'method': position.ballot_type,
+        'seats': position.seats,
+        'quota': count['quota'],
+        'ballots': count['ballots'],
+        'candidates': list(candidates),
+        'rounds': [
+            {
+                'votes': [round(float(votes), 2) for votes in this_round['votes']],
+                'exhausted': round(this_round['exhausted'], 2),
+                'elected': [candidates[column] for column in this_round['elected']],
+                'eliminated': [candidates[column] for column in this_round['eliminated']],
+            }
+            for this_round in count['rounds']
+        ],
+        'elected': [candidates[column] for column in count['elected']],
+    }
+
+
+def election_counts(election, positions):
+    """Counts of the election's ranked positions by position id, cached per results version"""
+    ranked = [position for position in positions if position.is_ranked]
+    if not ranked:
+        return {}
+    cache_key = f'ranked_counts:{election.id}:{ResultsVersion.current(election.id)}'
+    counts = cache.get(cache_key)
+    if counts is None:
+        counts = {
+            position.id: count_position(position, [candidate.id for candidate in position.active_candidates])
+            for position in ranked
+        }
+        cache.set(cache_key, counts, settings.RANKED_COUNT_CACHE_TIMEOUT)
+    return counts
+
+
+def transfer_table(count, names):
+    """
+    Rows for the round-by-round table: one per candidate with the votes
+    held and gained or lost in every round, then the exhausted ballots.
+    """
+    rounds = count['rounds']
+    rows = []
+    for column, candidate_id in enumerate(count['candidates']):
+        cells = []
+        status = ''
+        previous = None
+        for number, this_round in enumerate(rounds, start=1):
+            if status:
+                cells.append(None)
+                continue
+            votes = this_round['votes'][column]
+            cells.append({'votes': votes, 'change': None if previous is None else round(votes - previous, 2)})
+            previous = votes
+            if candidate_id in this_round['elected']:
+                status = f'Elected in round {number}'
+            elif candidate_id in this_round['eliminated']:
+                status = f'Eliminated in round {number}'
+        rows.append({
+            'name': names.get(candidate_id, ''),
+            'cells': cells,
+            'elected': candidate_id in count['elected'],
+            'status': status or 'Not elected',
+        })
+
+    exhausted = []
+    previous = 0
+    for this_round in rounds:
+        exhausted.append({'votes': this_round['exhausted'], 'change': round(this_round['exhausted'] - previous, 2)})
+        previous = this_round['exhausted']
+    return {
+        'rounds': list(range(1, len(rounds) + 1)),
+        'quota': count['quota'],
+        'rows': rows,
+        'exhausted': exhausted,
+    }
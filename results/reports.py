@@ -0,0 +1,199 @@
+import csv
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+
+from results.models import ReportJob, ResultsSnapshot, ResultsVersion
+from results.services import build_election_results
+from results.snapshots import snapshot_results
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'REPORT_WORKERS', 2),
+            thread_name_prefix='results-report',
+        )
+    return _executor
+
+
+def render_results_csv(election, results):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Election Results', election.title])
+    writer.writerow(['Generated on', election.end_date])
+    writer.writerow([])
+
+    for result in results:
+        writer.writerow([f'Position: {result["position"].title}'])
+        writer.writerow(['Candidate', 'Party', 'Votes', 'Percentage'])
+
+        for candidate_result in result['candidates']:
+            writer.writerow([
+                candidate_result['candidate'].name,
+                candidate_result['candidate'].party,
+                candidate_result['vote_count'],
+                f"{candidate_result['percentage']:.2f}%"
+            ])
+
+        writer.writerow(['Total Votes', '', result['total_votes'], '100%'])
+        if result['position'].ballot_type != 'PLURALITY':
+            writer.writerow(['Elected', ', '.join(winner['candidate'].name for winner in result['winners'])])
+        writer.writerow([])
+
+    return output.getvalue().encode()
+
+
+def render_results_pdf(election, results):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Title
+    elements.append(Paragraph(f"Election Results: {election.title}", styles['Title']))
+    elements.append(Paragraph(f"Generated on: {election.end_date}", styles['Normal']))
+    elements.append(Paragraph("<br/>", styles['Normal']))
+
+    for result in results:
+        # Position header
+        elements.append(Paragraph(f"Position: {result['position'].title}", styles['Heading2']))
+
+        # Table data
+        data = [['Candidate', 'Party', 'Votes', 'Percentage']]
+        for candidate_result in result['candidates']:
+            data.append([
+                candidate_result['candidate'].name,
+                candidate_result['candidate'].party,
+                str(candidate_result['vote_count']),
+                f"{candidate_result['percentage']:.2f}%"
+            ])
+
+        data.append(['Total Votes', '', str(result['total_votes']), '100%'])
+
+        # Create table
+        table = Table(data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        elements.append(table)
+        if result['position'].ballot_type != 'PLURALITY':
+            elected = ', '.join(winner['candidate'].name for winner in result['winners'])
+            elements.append(Paragraph(f"Elected: {elected}", styles['Normal']))
+        elements.append(Paragraph("<br/>", styles['Normal']))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'CSV': (render_results_csv, 'csv'),
+    'PDF': (render_results_pdf, 'pdf'),
+}
+
+
+class ReportSuperseded(Exception):
+    """The results moved on and another job covers the new version"""
+
+
+def versioned_results(job, attempts=3):
+    """Results at the job's version; raises ReportSuperseded if that version is gone.
+
+    Ballots commit their tallies together with their version bump, so
+    results read between two equal reads of the version are exactly those
+    of that version; reads that a ballot slipped into are repeated. Nothing
+    is locked, so ballots keep committing while a count runs. A job whose
+    version was superseded before it ran takes over the current version
+    unless another job has it.
+    """
+    for _ in range(attempts):
+        version = ResultsVersion.current(job.election_id)
+        snapshot = ResultsSnapshot.objects.filter(election_id=job.election_id).first()
+        if snapshot is not None:
+            results = snapshot_results(snapshot)[0]
+        else:
+            results = build_election_results(job.election)
+        if ResultsVersion.current(job.election_id) != version:
+            continue
+
+        if version != job.version:
+            try:
+                with transaction.atomic():
+                    ReportJob.objects.filter(id=job.id).update(version=version)
+            except IntegrityError:
+                raise ReportSuperseded('Superseded by a newer results version')
+            logger.info(f"Report job {job.id} moved from results version {job.version} to {version}")
+            job.version = version
+        return results
+    raise ReportSuperseded(f'Results changed during each of {attempts} reads')
+
+
+def run_report_job(job_id):
+    """Render a report job's file; runs on a worker pool thread"""
+    close_old_connections()
+    try:
+        job = ReportJob.objects.select_related('election').get(id=job_id)
+        job.status = 'RUNNING'
+        job.save(update_fields=['status', 'updated_at'])
+
+        render, extension = RENDERERS[job.format]
+        results = versioned_results(job)
+        content = render(job.election, results)
+        # A retried job replaces its earlier file instead of adding a suffixed copy
+        if job.file:
+            job.file.delete(save=False)
+        job.file.save(f'election_{job.election_id}_v{job.version}.{extension}', ContentFile(content), save=False)
+        job.status = 'DONE'
+        job.error = ''
+        job.save(update_fields=['file', 'status', 'error', 'updated_at'])
+    except ReportSuperseded as exc:
+        logger.info(f"Report job {job_id} not rendered: {exc}")
+        ReportJob.objects.filter(id=job_id).update(status='FAILED', error=str(exc), updated_at=timezone.now())
+    except Exception as exc:
+        logger.exception(f"Report job {job_id} failed")
+        ReportJob.objects.filter(id=job_id).update(status='FAILED', error=str(exc), updated_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def request_report(election, report_format):
+    """Return the report job for the election's current results version, queueing it if needed"""
+    version = ResultsVersion.current(election.id)
+    job, created = ReportJob.objects.get_or_create(election=election, format=report_format, version=version)
+
+    # Failed jobs, and jobs whose worker died, are queued again by whichever
+    # request claims them first
+    stale_after = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_JOB_TIMEOUT', 600))
+    retry = False
+    if job.status == 'FAILED' or (job.status in ('PENDING', 'RUNNING') and job.updated_at < stale_after):
+        retry = ReportJob.objects.filter(
+            id=job.id, status=job.status, updated_at=job.updated_at
+        ).update(status='PENDING', error='', updated_at=timezone.now()) == 1
+        job.refresh_from_db()
+
+    if created or retry:
+        transaction.on_commit(lambda: get_executor().submit(run_report_job, job.id))
+    return job
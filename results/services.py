@@ -0,0 +1,184 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Prefetch, Q
+from django.utils import timezone
+
+from elections.models import Election, Position, Candidate
+from results.models import CandidateTally
+from results.ranked import election_counts, transfer_table
+from users.models import UserProfile
+from voting.models import Participation
+
+DASHBOARD_CACHE_KEY = 'dashboard_stats'
+
+
+def vote_counts(election):
+    """Return {(position_id, candidate_id): votes} for an election in one query"""
+    rows = CandidateTally.objects.filter(election=election).values_list('position', 'candidate', 'votes')
+    return {(position_id, candidate_id): votes for position_id, candidate_id, votes in rows}
+
+
+def build_election_results(election, count_rounds=True):
+    """Build the full results for an election with a constant number of queries.
+
+    Returns a list with one entry per position::
+
+        {'position': Position, 'candidates': [...], 'total_votes': int, 'winner': dict or None,
+         'winners': [...], 'count': dict or None, 'transfers': dict or None}
+
+    where each candidate entry has ``candidate``, ``vote_count``,
+    ``percentage``, ``photo_url``, ``photo_webp_url`` (empty before the
+    photo's renditions exist) and ``elected``, sorted by vote count
+    (descending). Vote counts are first preferences for ranked positions
+    and approvals for approval positions. Ranked positions are elected by
+    the round-by-round ``count`` (see ``results.ranked``), skipped when
+    ``count_rounds`` is false.
+    """
+    positions = Position.objects.filter(election=election).order_by('id').prefetch_related(
+        Prefetch(
+            'candidate_set',
+            queryset=Candidate.objects.filter(is_active=True).order_by('id'),
+            to_attr='active_candidates',
+        )
+    )
+    counts = vote_counts(election)
+    ranked_counts = election_counts(election, positions) if count_rounds else {}
+
+    # Position totals include votes for candidates that were later deactivated
+    totals = defaultdict(int)
+    for (position_id, _), votes in counts.items():
+        totals[position_id] += votes
+
+    results = []
+    for position in positions:
+        total_votes = totals[position.id]
+        position_results = []
+
+        for candidate in position.active_candidates:
+            vote_count = counts.get((position.id, candidate.id), 0)
+            percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0
+
+            position_results.append({
+                'candidate': candidate,
+                'vote_count': vote_count,
+                'percentage': round(percentage, 2),
+                'photo_url': candidate.get_photo_url(200),
+                'photo_webp_url': candidate.get_photo_webp_url(200),
+            })
+
+        # Sort by vote count (descending)
+        position_results.sort(key=lambda x: x['vote_count'], reverse=True)
+
+        count = ranked_counts.get(position.id)
+        winners = elect(position, position_results, count)
+        names = {candidate_result['candidate'].id: candidate_result['candidate'].name for candidate_result in position_results}
+
+        results.append({
+            'position': position,
+            'candidates': position_results,
+            'total_votes': total_votes,
+            'winner': winners[0] if winners else None,
+            'winners': winners,
+            'count': count,
+            'transfers': transfer_table(count, names) if count else None,
+        })
+
+    return results
+
+
+def elect(position, position_results, count=None):
+    """Mark and return the elected candidate entries of a position, in order of election"""
+    by_id = {candidate_result['candidate'].id: candidate_result for candidate_result in position_results}
+    if position.is_ranked:
+        winners = [by_id[candidate_id] for candidate_id in count['elected']] if count else []
+    elif position.ballot_type == 'APPROVAL':
+        winners = [candidate_result for candidate_result in position_results if candidate_result['vote_count'] > 0][:position.seats]
+    else:
+        # Plurality ties are all shown as leading
+        top = position_results[0]['vote_count'] if position_results else 0
+        winners = [candidate_result for candidate_result in position_results if top > 0 and candidate_result['vote_count'] == top]
+
+    elected = {id(candidate_result) for candidate_result in winners}
+    for candidate_result in position_results:
+        candidate_result['elected'] = id(candidate_result) in elected
+    return winners
+
+
+def live_results_payload(election):
+    """JSON-serializable results used by the live endpoints"""
+    positions_data = []
+    # Polled after every ballot, so ranked positions show first preferences only
+    for result in build_election_results(election, count_rounds=False):
+        positions_data.append({
+            'id': result['position'].id,
+            'position': result['position'].title,
+            'total_votes': result['total_votes'],
+            'candidates': [
+                {
+                    'id': candidate_result['candidate'].id,
+                    'name': candidate_result['candidate'].name,
+                    'party': candidate_result['candidate'].party,
+                    'votes': candidate_result['vote_count']
+                }
+                for candidate_result in result['candidates']
+            ]
+        })
+
+    return {
+        'election': election.title,
+        'turnout': Participation.turnout(election),
+        'positions': positions_data
+    }
+
+
+def compute_dashboard_stats(recent=5):
+    """Site-wide election, voter and turnout figures in five grouped queries"""
+    now = timezone.now()
+    elections = Election.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True, start_date__lte=now, end_date__gte=now)),
+        upcoming=Count('id', filter=Q(start_date__gt=now)),
+        completed=Count('id', filter=Q(end_date__lt=now)),
+    )
+
+    roles = dict(UserProfile.objects.values_list('role').annotate(count=Count('id')).order_by())
+    voters = roles.get('VOTER', 0)
+
+    recent_elections = list(
+        Election.objects.order_by('-start_date').values('id', 'title', 'description', 'start_date', 'end_date', 'is_active')[:recent]
+    )
+    ballots = dict(
+        Participation.objects.filter(election__in=[election['id'] for election in recent_elections])
+        .values_list('election').annotate(count=Count('id')).order_by()
+    )
+    for election in recent_elections:
+        election['ballots'] = ballots.get(election['id'], 0)
+        election['turnout'] = round(election['ballots'] / voters * 100, 1) if voters else 0
+        election['completed'] = election['end_date'] < now
+
+    return {
+        'elections': elections,
+        'roles': [
+            {'role': role, 'label': label, 'count': roles.get(role, 0)}
+            for role, label in UserProfile.ROLE_CHOICES
+        ],
+        'voters': voters,
+        'ballots': Participation.objects.count(),
+        'recent_elections': recent_elections,
+        'computed_at': now,
+    }
+
+
+def dashboard_stats():
+    """Cached dashboard figures; election and role changes drop the cache, ballots age out with the TTL"""
+    stats = cache.get(DASHBOARD_CACHE_KEY)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_CACHE_KEY, stats, settings.DASHBOARD_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_CACHE_KEY)
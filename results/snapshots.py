@@ -0,0 +1,216 @@
+"""
+Frozen final results for closed elections.
+
+``close_election`` publishes the vote tree root and writes the final
+tallies as canonical JSON with its SHA-256 checksum. Results pages, live
+results and report exports of a closed election are then served from
+that snapshot instead of the tally tables. No election is closed before
+``end_date + RESULTS_CLOSE_GRACE_SECONDS``: the first results request
+after that closes it automatically, as do the election admin action and
+``manage.py close_elections``. Ballots that still commit after the
+snapshot are refused by ``record_ballot``.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.utils import timezone
+
+from elections.models import Position
+from results.models import ResultsSnapshot, ResultsVersion
+from results.ranked import transfer_table
+from results.services import build_election_results, live_results_payload
+from voting.merkle import publish_root
+from voting.models import Participation
+
+
+def canonical_json(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+
+
+def checksum_of(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def snapshot_payload(election, tree):
+    positions = []
+    for result in build_election_results(election):
+        position = result['position']
+        positions.append({
+            'id': position.id,
+            'title': position.title,
+            'description': position.description,
+            'ballot_type': position.ballot_type,
+            'seats': position.seats,
+            'total_votes': result['total_votes'],
+            'count': result['count'],
+            'candidates': [
+                {
+                    'id': candidate_result['candidate'].id,
+                    'name': candidate_result['candidate'].name,
+                    'party': candidate_result['candidate'].party,
+                    'manifesto': candidate_result['candidate'].manifesto,
+                    'photo_url': candidate_result['photo_url'],
+                    'photo_webp_url': candidate_result['photo_webp_url'],
+                    'votes': candidate_result['vote_count'],
+                    'percentage': candidate_result['percentage'],
+                    'elected': candidate_result['elected'],
+                }
+                for candidate_result in result['candidates']
+            ],
+        })
+
+    return {
+        'election': {
+            'id': election.id,
+            'title': election.title,
+            'start_date': election.start_date,
+            'end_date': election.end_date,
+        },
+        'turnout': Participation.turnout(election),
+        'votes': tree.published_size,
+        'merkle_root': tree.published_root,
+        'positions': positions,
+        'closed_at': timezone.now(),
+    }
+
+
+def close_election(election, user=None):
+    """Freeze the election's final results; returns the (possibly existing) snapshot"""
+    if not is_closable(election):
+        raise ValueError(f'{election.title} is still within its voting period or grace period')
+    # Results views may be reading a lagging replica that has not seen the
+    # snapshot yet; only the primary can tell whether closing is needed
+    existing = ResultsSnapshot.objects.using(DEFAULT_DB_ALIAS).filter(election=election).first()
+    if existing is not None:
+        return existing
+
+    try:
+        with transaction.atomic():
+            # Publishing the root locks the vote tree, so ballots still in
+            # flight commit before the tallies are read
+            tree = publish_root(election)
+            payload = canonical_json(snapshot_payload(election, tree))
+            snapshot = ResultsSnapshot.objects.create(
+                election=election,
+                payload=payload,
+                checksum=checksum_of(payload),
+                created_by=user,
+            )
+            ResultsVersion.bump(election.id)
+    except IntegrityError:
+        # Closed concurrently by another request
+        return ResultsSnapshot.objects.using(DEFAULT_DB_ALIAS).get(election=election)
+    return snapshot
+
+
+def is_closable(election, now=None):
+    grace = timedelta(seconds=getattr(settings, 'RESULTS_CLOSE_GRACE_SECONDS', 60))
+    return election.end_date + grace <= (now or timezone.now())
+
+
+def get_snapshot(election):
+    """The election's snapshot, closing it first if it has ended; None while open"""
+    snapshot = ResultsSnapshot.objects.filter(election=election).first()
+    if snapshot is None and is_closable(election):
+        snapshot = close_election(election)
+    return snapshot
+
+
+def verify_snapshot(snapshot):
+    return checksum_of(snapshot.payload) == snapshot.checksum
+
+
+def snapshot_results(snapshot):
+    """Rebuild the ``build_election_results`` structure and turnout from a snapshot"""
+    data = json.loads(snapshot.payload)
+    results = []
+    for position in data['positions']:
+        candidates = [
+            {
+                'candidate': SimpleNamespace(
+                    id=candidate['id'],
+                    name=candidate['name'],
+                    party=candidate['party'],
+                    manifesto=candidate['manifesto'],
+                ),
+                'vote_count': candidate['votes'],
+                'percentage': candidate['percentage'],
+                'photo_url': candidate['photo_url'],
+                'photo_webp_url': candidate['photo_webp_url'],
+                'elected': candidate['elected'],
+            }
+            for candidate in position['candidates']
+        ]
+        ballot_type = position['ballot_type']
+        count = position['count']
+        winners = [candidate for candidate in candidates if candidate['elected']]
+        if count:
+            order = {candidate_id: index for index, candidate_id in enumerate(count['elected'])}
+            winners.sort(key=lambda candidate: order.get(candidate['candidate'].id, len(order)))
+        names = {candidate['candidate'].id: candidate['candidate'].name for candidate in candidates}
+        results.append({
+            'position': SimpleNamespace(
+                id=position['id'],
+                title=position['title'],
+                description=position['description'],
+                ballot_type=ballot_type,
+                seats=position['seats'],
+                is_ranked=ballot_type in Position.RANKED_BALLOTS,
+                get_ballot_type_display=dict(Position.BALLOT_CHOICES)[ballot_type],
+            ),
+            'candidates': candidates,
+            'total_votes': position['total_votes'],
+            'winner': winners[0] if winners else None,
+            'winners': winners,
+            'count': count,
+            'transfers': transfer_table(count, names) if count else None,
+        })
+    return results, data['turnout']
+
+
+def snapshot_live_payload(snapshot):
+    """The live results JSON shape, read from a snapshot"""
+    data = json.loads(snapshot.payload)
+    return {
+        'election': data['election']['title'],
+        'turnout': data['turnout'],
+        'final': True,
+        'checksum': snapshot.checksum,
+        'positions': [
+            {
+                'id': position['id'],
+                'position': position['title'],
+                'total_votes': position['total_votes'],
+                'candidates': [
+                    {
+                        'id': candidate['id'],
+                        'name': candidate['name'],
+                        'party': candidate['party'],
+                        'votes': candidate['votes'],
+                    }
+                    for candidate in position['candidates']
+                ],
+            }
+            for position in data['positions']
+        ],
+    }
+
+
+def election_results(election):
+    """(results, turnout) from the snapshot once closed, otherwise from the tallies"""
+    snapshot = get_snapshot(election)
+    if snapshot is not None:
+        return snapshot_results(snapshot)
+    return build_election_results(election), Participation.turnout(election)
+
+
+def results_payload(election):
+    snapshot = get_snapshot(election)
+    if snapshot is not None:
+        return snapshot_live_payload(snapshot)
+    return live_results_payload(election)
@@ -1,3 +1,634 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from election_project.db_router import ReplicaRouter, _request_state, lag_monitor
+from elections.models import Candidate, Election, Position
+from elections.seeding import seed_election
+from results.exports import stream_votes_csv
+from results.live import _feeds
+from results.analytics import conditional_support, covote_analysis, election_covoting
+from results.models import CandidateTally, ReportJob, ResultsSnapshot, ResultsVersion, rebuild_tallies
+from results.ranked import count_rankings, preference_matrix
+from results import reports
+from results.reports import run_report_job
+from results.services import build_election_results, dashboard_stats, invalidate_dashboard_stats
+from results.snapshots import close_election, get_snapshot, snapshot_results, verify_snapshot
+from users.models import UserProfile
+from voting.ballots import ElectionClosed, record_ballot, unpack_ranking
+from voting.models import Participation, Vote
+
+
+class ResultsSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.election, cls.voters = seed_election(positions=2, candidates=3, voters=40)
+        cls.live_results = build_election_results(cls.election)
+        Election.objects.filter(id=cls.election.id).update(end_date=timezone.now() - timedelta(hours=1))
+        cls.election.refresh_from_db()
+
+    def test_snapshot_freezes_final_tallies(self):
+        snapshot = close_election(self.election)
+        self.assertTrue(verify_snapshot(snapshot))
+        self.assertEqual(close_election(self.election).pk, snapshot.pk)
+
+        # Later tally changes do not reach the frozen results
+        CandidateTally.objects.filter(election=self.election).update(votes=0)
+        results, turnout = snapshot_results(ResultsSnapshot.objects.get(pk=snapshot.pk))
+        self.assertEqual(turnout, 40)
+        self.assertEqual(
+            [[(c['candidate'].id, c['vote_count']) for c in result['candidates']] for result in results],
+            [[(c['candidate'].id, c['vote_count']) for c in result['candidates']] for result in self.live_results],
+        )
+
+        with self.assertRaises(ValueError):
+            snapshot.save()
+
+    def test_results_page_of_ended_election_reads_only_the_snapshot(self):
+        self.client.force_login(self.voters[0])
+        url = reverse('position_results', args=[self.election.id])
+        self.client.get(url, secure=True)
+        self.assertIsNotNone(get_snapshot(self.election))
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        sql = ' '.join(query['sql'] for query in captured)
+        for table in ['results_candidatetally', 'voting_vote', 'voting_participation', 'elections_position']:
+            self.assertNotIn(table, sql)
+
+    def test_open_election_is_not_closed(self):
+        election, _ = seed_election(positions=1, candidates=2, voters=3)
+        self.assertIsNone(get_snapshot(election))
+
+    def test_no_close_path_skips_the_grace_period(self):
+        election, _ = seed_election(positions=1, candidates=2, voters=3)
+        Election.objects.filter(id=election.id).update(end_date=timezone.now() - timedelta(seconds=5))
+        election.refresh_from_db()
+
+        with self.assertRaises(ValueError):
+            close_election(election)
+        with self.assertRaises(CommandError):
+            call_command('close_elections', '--election', str(election.id), stdout=io.StringIO())
+        self.assertFalse(ResultsSnapshot.objects.filter(election=election).exists())
+
+    def test_ballot_committing_after_the_close_is_refused(self):
+        election, (voter,) = seed_election(positions=1, candidates=2, voters=1, turnout=0)
+        position = Position.objects.get(election=election)
+        ballot = [(position, [Candidate.objects.filter(position=position).first()])]
+
+        # The voter passed the end_date check just before the election closed
+        Election.objects.filter(id=election.id).update(end_date=timezone.now() - timedelta(hours=1))
+        election.refresh_from_db()
+        close_election(election)
+        with self.assertRaises(ElectionClosed):
+            record_ballot(voter, election, ballot)
+        self.assertFalse(Vote.objects.filter(election=election).exists())
+        self.assertFalse(Participation.objects.filter(election=election).exists())
+
+
+class CoVotingAnalysisTests(TestCase):
+    def test_covotes_and_straight_tickets(self):
+        candidates = pd.DataFrame.from_records([
+            (10, 'Ann', 'Red', 1, 'Mayor'),
+            (11, 'Bob', 'Blue', 1, 'Mayor'),
+            (20, 'Cat', 'Red', 2, 'Clerk'),
+            (21, 'Dan', 'Blue', 2, 'Clerk'),
+            (22, 'Eve', '', 2, 'Clerk'),
+        ], columns=['id', 'name', 'party', 'position_id', 'position'])
+        ballots = [(1, 10), (1, 20), (2, 10), (2, 21), (3, 11), (3, 21), (4, 11), (4, 22), (5, 10)]
+        voter_ids = np.array([voter for voter, _ in ballots])
+        candidate_ids = np.array([candidate for _, candidate in ballots])
+
+        analysis = covote_analysis(voter_ids, candidate_ids, candidates)
+
+        self.assertEqual(analysis['ballots'], 5)
+        covotes = pd.DataFrame(analysis['covotes'], index=candidates['name'], columns=candidates['name'])
+        self.assertEqual(covotes.loc['Ann', 'Ann'], 3)
+        self.assertEqual(covotes.loc['Ann', 'Cat'], 1)
+        self.assertEqual(covotes.loc['Ann', 'Dan'], 1)
+        self.assertEqual(covotes.loc['Bob', 'Eve'], 1)
+        self.assertEqual(covotes.loc['Ann', 'Bob'], 0)
+
+        parties = analysis['parties'].set_index('party')
+        self.assertEqual(parties.loc['Red', 'supporters'], 3)
+        self.assertEqual(parties.loc['Red', 'straight'], 1)
+        self.assertEqual(parties.loc['Blue', 'supporters'], 3)
+        self.assertEqual(parties.loc['Blue', 'straight'], 1)
+        self.assertNotIn('', parties.index)
+
+        support = conditional_support(analysis)
+        self.assertAlmostEqual(support.loc['Ann (Mayor)', 'Cat (Clerk)'], 33.3)
+        self.assertTrue(np.isnan(support.loc['Ann (Mayor)', 'Bob (Mayor)']))
+
+    def test_every_approval_and_ranked_choice_is_a_selection(self):
+        election, (first_voter, second_voter) = seed_election(positions=3, candidates=2, voters=2, turnout=0)
+        approval, ranked, plurality = Position.objects.filter(election=election).order_by('id')
+        Position.objects.filter(pk=approval.pk).update(ballot_type='APPROVAL', max_votes=2)
+        Position.objects.filter(pk=ranked.pk).update(ballot_type='IRV')
+        a1, a2 = Candidate.objects.filter(position=approval).order_by('id')
+        r1, r2 = Candidate.objects.filter(position=ranked).order_by('id')
+        p1, _ = Candidate.objects.filter(position=plurality).order_by('id')
+        positions = Position.objects.filter(election=election).order_by('id')
+        record_ballot(first_voter, election, list(zip(positions, [[a1, a2], [r2, r1], [p1]])))
+        record_ballot(second_voter, election, list(zip(positions, [[a2], [r1], [p1]])))
+
+        analysis = election_covoting(election)
+
+        covotes = pd.DataFrame(analysis['covotes'], index=analysis['candidates']['id'], columns=analysis['candidates']['id'])
+        self.assertEqual(analysis['ballots'], 2)
+        self.assertEqual(covotes.loc[a1.id, a2.id], 1)
+        self.assertEqual(covotes.loc[a2.id, a2.id], 2)
+        self.assertEqual(covotes.loc[r1.id, r1.id], 2)
+        self.assertEqual(covotes.loc[r1.id, a1.id], 1)
+        self.assertEqual(covotes.loc[p1.id, r1.id], 2)
+
+    def test_election_without_candidates_or_parties(self):
+        cache.clear()
+        election, voters = seed_election(positions=1, candidates=0, voters=1, turnout=0)
+        UserProfile.objects.filter(user=voters[0]).update(role='TALLY_OFFICER')
+        self.client.force_login(voters[0])
+        response = self.client.get(reverse('covoting', args=[election.id]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['ballots'], 0)
+
+        Position.objects.filter(election=election).delete()
+        analysis = election_covoting(election)
+        self.assertEqual((analysis['ballots'], analysis['covotes'].shape, len(analysis['parties'])), (0, (0, 0), 0))
+        self.assertTrue(conditional_support(analysis).empty)
+
+        # Independents only: co-votes are counted, parties are not
+        candidates = pd.DataFrame.from_records(
+            [(1, 'Ann', '', 1, 'Mayor'), (2, 'Bob', None, 2, 'Clerk')],
+            columns=['id', 'name', 'party', 'position_id', 'position'],
+        )
+        analysis = covote_analysis(np.array([7, 7]), np.array([1, 2]), candidates)
+        self.assertEqual(analysis['covotes'][0, 1], 1)
+        self.assertTrue(analysis['parties'].empty)
+
+
+def flatten(ballots):
+    lengths = np.array([len(ranking) for ranking, copies in ballots for _ in range(copies)])
+    candidate_ids = np.array([candidate for ranking, copies in ballots for _ in range(copies) for candidate in ranking])
+    return lengths, candidate_ids
+
+
+class RankedCountTests(TestCase):
+    def test_instant_runoff_transfers(self):
+        # Memphis, Nashville, Chattanooga, Knoxville
+        lengths, candidate_ids = flatten([
+            ([1, 2, 3, 4], 42), ([2, 3, 4, 1], 26), ([3, 4, 2, 1], 15), ([4, 3, 2, 1], 17),
+        ])
+        prefs, weights = preference_matrix(lengths, candidate_ids, [1, 2, 3, 4])
+        self.assertEqual(len(prefs), 4)
+
+        count = count_rankings(prefs, weights, 4)
+        self.assertEqual([this_round['eliminated'] for this_round in count['rounds']], [[2], [1], []])
+        self.assertEqual(count['rounds'][1]['votes'].tolist(), [42, 26, 0, 32])
+        self.assertEqual(count['elected'], [3])
+
+    def test_single_transferable_vote_surplus_and_withdrawn_candidates(self):
+        # Candidate 9 has withdrawn, so the ballots ranking it first start with their second choice
+        lengths, candidate_ids = flatten([
+            ([1], 4), ([2, 1], 2), ([9, 3, 4], 8), ([3, 5], 4), ([6], 1), ([7], 1),
+        ])
+        prefs, weights = preference_matrix(lengths, candidate_ids, [1, 2, 3, 4, 5, 6, 7])
+        count = count_rankings(prefs, weights, 7, seats=3, method='STV')
+
+        self.assertEqual(count['quota'], 6)
+        self.assertEqual(count['rounds'][1]['votes'].tolist(), [4, 2, 0, 4, 2, 1, 1])
+        self.assertEqual(count['elected'], [2, 0, 3])
+
+    def test_ranked_ballots_are_cast_counted_and_frozen(self):
+        election, voters = seed_election(positions=1, candidates=0, voters=5, turnout=0)
+        position = Position.objects.get(election=election)
+        Position.objects.filter(pk=position.pk).update(ballot_type='IRV')
+        alice, bob, carol = [
+            Candidate.objects.create(position=position, name=name, party='', manifesto='')
+            for name in ['Alice', 'Bob', 'Carol']
+        ]
+        self.client.force_login(voters[0])
+        self.assertContains(self.client.get(reverse('vote', args=[election.id]), secure=True), f'name="rank_{position.id}_{alice.id}"')
+
+        rankings = [[alice, bob], [alice], [bob, carol, alice], [carol, bob], [carol, bob]]
+        for voter, ranking in zip(voters, rankings):
+            self.client.force_login(voter)
+            self.client.post(reverse('cast_vote', args=[election.id]), {
+                f'rank_{position.id}_{candidate.id}': rank for rank, candidate in enumerate(ranking, start=1)
+            }, secure=True)
+
+        self.assertEqual(unpack_ranking(Vote.objects.get(voter=voters[2]).ranking), [bob.id, carol.id, alice.id])
+        self.assertEqual(CandidateTally.objects.get(candidate=alice).votes, 2)
+
+        response = self.client.get(reverse('position_results', args=[election.id]), secure=True)
+        result = response.context['results'][0]
+        self.assertEqual([winner['candidate'].name for winner in result['winners']], ['Carol'])
+        self.assertEqual([row['status'] for row in result['transfers']['rows']],
+                         ['Not elected', 'Eliminated in round 1', 'Elected in round 2'])
+        self.assertContains(response, 'Round-by-Round Count')
+
+        Election.objects.filter(id=election.id).update(end_date=timezone.now() - timedelta(hours=1))
+        election.refresh_from_db()
+        results, _ = snapshot_results(close_election(election))
+        self.assertEqual([winner['candidate'].name for winner in results[0]['winners']], ['Carol'])
+        self.assertEqual(results[0]['transfers'], result['transfers'])
+
+    def test_approval_tallies_count_every_approval(self):
+        election, voters = seed_election(positions=1, candidates=3, voters=2, turnout=0)
+        position = Position.objects.get(election=election)
+        Position.objects.filter(pk=position.pk).update(ballot_type='APPROVAL', max_votes=2)
+        first, second, third = Candidate.objects.filter(position=position).order_by('id')
+        for voter, approved in zip(voters, [[first, second], [second]]):
+            self.client.force_login(voter)
+            self.client.post(reverse('cast_vote', args=[election.id]), {
+                f'position_{position.id}': [candidate.id for candidate in approved]
+            }, secure=True)
+
+        expected = {first.id: 1, second.id: 2}
+        self.assertEqual(dict(CandidateTally.objects.filter(election=election).values_list('candidate', 'votes')), expected)
+        rebuild_tallies([election])
+        self.assertEqual(dict(CandidateTally.objects.filter(election=election).values_list('candidate', 'votes')), expected)
+
+        result = build_election_results(election)[0]
+        self.assertEqual([winner['candidate'].id for winner in result['winners']], [second.id, first.id])
+
+
+class ResultsServiceTests(TestCase):
+    def test_query_count_does_not_grow_with_positions_or_candidates(self):
+        for positions, candidates in ((1, 2), (5, 8)):
+            election, _ = seed_election(positions=positions, candidates=candidates, voters=10)
+            # Positions, their candidates and the tallies
+            with self.assertNumQueries(3):
+                results = build_election_results(election)
+            self.assertEqual([len(result['candidates']) for result in results], [candidates] * positions)
+
+    def test_candidate_numbers(self):
+        election, voters = seed_election(positions=1, candidates=3, voters=5, turnout=0)
+        position = Position.objects.get(election=election)
+        first, second, withdrawn = Candidate.objects.filter(position=position).order_by('id')
+        for voter, candidate in zip(voters, [second, second, second, first, withdrawn]):
+            record_ballot(voter, election, [(position, [candidate])])
+        withdrawn.is_active = False
+        withdrawn.save()
+
+        (result,) = build_election_results(election)
+        # The withdrawn candidate is not listed, but their vote still counts in the total
+        self.assertEqual(result['total_votes'], 5)
+        self.assertEqual(
+            [(c['candidate'].id, c['vote_count'], c['percentage'], c['elected']) for c in result['candidates']],
+            [(second.id, 3, 60.0, True), (first.id, 1, 20.0, False)],
+        )
+        self.assertEqual(result['winner']['candidate'].id, second.id)
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        invalidate_dashboard_stats()
+
+    def test_stats_are_grouped_and_invalidated_on_election_change(self):
+        election, _ = seed_election(positions=1, candidates=2, voters=10, turnout=0.5)
+        with self.assertNumQueries(5):
+            stats = dashboard_stats()
+        self.assertEqual(stats['elections']['total'], 1)
+        self.assertEqual(stats['elections']['active'], 1)
+        self.assertEqual(stats['ballots'], 5)
+        self.assertEqual(stats['recent_elections'][0]['ballots'], 5)
+
+        with self.assertNumQueries(0):
+            dashboard_stats()
+
+        Election.objects.get(id=election.id).save()
+        with self.assertNumQueries(5):
+            dashboard_stats()
+
+
+class VoteExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.election, cls.voters = seed_election(positions=2, candidates=2, voters=3)
+        UserProfile.objects.filter(user=cls.voters[0]).update(role='TALLY_OFFICER')
+        cls.url = reverse('export_votes', args=[cls.election.id])
+        cls.rows = [
+            [vote.vote_hash, vote.position.title, vote.candidate.name, vote.timestamp.isoformat()]
+            for vote in Vote.objects.filter(election=cls.election).select_related('position', 'candidate').order_by('id')
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.voters[0])
+
+    def test_csv_export_streams_every_vote(self):
+        response = self.client.get(self.url, {'format': 'csv'}, secure=True)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{self.election.title}_votes.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows, [['vote_hash', 'position', 'candidate', 'timestamp'], *self.rows])
+
+        # Rows are yielded in batches after the header
+        self.assertEqual(len(list(stream_votes_csv(self.election, lines_per_chunk=4))), 3)
+
+    def test_jsonl_export_streams_gzipped_lines(self):
+        response = self.client.get(self.url, {'format': 'jsonl'}, secure=True)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{self.election.title}_votes.jsonl.gz"')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(
+            [[line['vote_hash'], line['position'], line['candidate'], line['timestamp']] for line in map(json.loads, lines)],
+            self.rows,
+        )
+
+    def test_unknown_format_and_voters_are_refused(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}, secure=True).status_code, 400)
+        self.client.force_login(self.voters[1])
+        self.assertEqual(self.client.get(self.url, secure=True).status_code, 403)
+
+
+class LiveResultsEtagTests(TestCase):
+    def test_unchanged_results_answer_304_until_a_ballot_is_cast(self):
+        election, _ = seed_election(positions=1, candidates=2, voters=0)
+        position = Position.objects.get(election=election)
+        url = reverse('live_results', args=[election.id])
+        self.client.force_login(User.objects.create_user('etag-voter'))
+
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        for _ in range(2):
+            response = self.client.get(url, secure=True, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+
+        self.client.post(reverse('cast_vote', args=[election.id]), {
+            f'position_{position.id}': Candidate.objects.filter(position=position).values_list('id', flat=True).first(),
+        }, secure=True)
+        response = self.client.get(url, secure=True, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(sum(candidate['votes'] for candidate in response.json()['positions'][0]['candidates']), 1)
+
+
+REPORTS_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=REPORTS_ROOT, AUDIT_LOG_BUFFERED=False)
+class ReportJobTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(REPORTS_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.election, (self.officer, self.voter) = seed_election(positions=1, candidates=2, voters=2, turnout=0)
+        UserProfile.objects.filter(user=self.officer).update(role='TALLY_OFFICER')
+        self.client.force_login(self.officer)
+        position = Position.objects.get(election=self.election)
+        self.ballot = [(position, [Candidate.objects.filter(position=position).first()])]
+
+    def status(self, job):
+        return self.client.get(reverse('report_status', args=[job.id]), secure=True).json()
+
+    def test_job_is_queued_rendered_and_downloaded_by_id(self):
+        export_url = reverse('export_csv', args=[self.election.id])
+        response = self.client.get(export_url, secure=True)
+        self.assertEqual(response.status_code, 202)
+        job = ReportJob.objects.get(election=self.election)
+        self.assertEqual((job.status, job.version), ('PENDING', ResultsVersion.current(self.election.id)))
+        self.assertIsNone(self.status(job)['download_url'])
+        self.assertEqual(self.client.get(reverse('report_download', args=[job.id]), secure=True).status_code, 404)
+
+        run_report_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'DONE')
+        download_url = self.status(job)['download_url']
+        self.assertEqual(download_url, reverse('report_download', args=[job.id]))
+
+        # A ballot moves the results on: the finished job still downloads
+        # without queueing anything, while the export queues the new version
+        record_ballot(self.voter, self.election, self.ballot)
+        response = self.client.get(download_url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Total Votes,,0,100%', b''.join(response.streaming_content))
+        self.assertEqual(ReportJob.objects.filter(election=self.election).count(), 1)
+        self.assertEqual(self.client.get(export_url, secure=True).status_code, 202)
+        self.assertEqual(ReportJob.objects.filter(election=self.election).count(), 2)
+
+        # Rendering a job again replaces its file rather than adding a copy
+        name = job.file.name
+        run_report_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.file.name, name)
+
+    def test_job_renders_the_version_it_is_labelled_with(self):
+        self.client.get(reverse('export_csv', args=[self.election.id]), secure=True)
+        job = ReportJob.objects.get(election=self.election)
+
+        # The results moved on before the worker ran: the job takes over the
+        # new version and renders its tallies
+        record_ballot(self.voter, self.election, self.ballot)
+        run_report_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.version), ('DONE', ResultsVersion.current(self.election.id)))
+        with job.file.open('rb') as report:
+            self.assertIn(b'Total Votes,,1,100%', report.read())
+
+        # A superseded job whose new version already has a job fails
+        # instead of writing a second file for it
+        stale = ReportJob.objects.create(election=self.election, format='CSV', version=job.version - 1)
+        run_report_job(stale.id)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.version), ('FAILED', job.version - 1))
+        self.assertEqual(stale.error, 'Superseded by a newer results version')
+        self.assertFalse(stale.file)
+
+    def test_results_read_while_a_ballot_commits_are_read_again(self):
+        self.client.get(reverse('export_csv', args=[self.election.id]), secure=True)
+        job = ReportJob.objects.get(election=self.election)
+        build = reports.build_election_results
+        calls = []
+
+        def build_during_ballot(election):
+            results = build(election)
+            calls.append(len(calls))
+            if len(calls) == 1:
+                record_ballot(self.voter, self.election, self.ballot)
+            return results
+
+        with mock.patch.object(reports, 'build_election_results', build_during_ballot):
+            run_report_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((job.status, job.version), ('DONE', ResultsVersion.current(self.election.id)))
+        with job.file.open('rb') as report:
+            self.assertIn(b'Total Votes,,1,100%', report.read())
+
+        # Results that never hold still fail the job rather than mislabel it
+        ResultsVersion.bump(self.election.id)
+        retry = ReportJob.objects.create(election=self.election, format='PDF', version=ResultsVersion.current(self.election.id))
+
+        def build_while_voting(election):
+            ResultsVersion.bump(election.id)
+            return build(election)
+
+        with mock.patch.object(reports, 'build_election_results', build_while_voting):
+            run_report_job(retry.id)
+        retry.refresh_from_db()
+        self.assertEqual((retry.status, retry.error), ('FAILED', 'Results changed during each of 3 reads'))
+
+
+
+def sse_events(data):
+    """(event, data) of every message in a Server-Sent Events body"""
+    events = []
+    for message in data.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@override_settings(LIVE_RESULTS_POLL_INTERVAL=0.01, LIVE_RESULTS_STREAM_RETRY_SECONDS=5)
+class LiveResultsStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.election, (cls.viewer, cls.voter) = seed_election(positions=1, candidates=2, voters=2, turnout=0)
+        cls.position = Position.objects.get(election=cls.election)
+        cls.candidate = Candidate.objects.filter(position=cls.position).first()
+        cls.url = reverse('live_results_stream', args=[cls.election.id])
+
+    def test_wsgi_sends_the_results_once_and_has_the_browser_reconnect(self):
+        self.client.force_login(self.viewer)
+        response = self.client.get(self.url, secure=True)
+
+        self.assertFalse(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.content.startswith(b'retry: 5000\n\n'))
+        (event, data), = sse_events(response.content)
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual([position['id'] for position in data['positions']], [self.position.id])
+
+    async def test_asgi_streams_the_snapshot_then_every_change(self):
+        await self.async_client.aforce_login(self.viewer)
+        response = await self.async_client.get(self.url, secure=True)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = response.streaming_content
+        (event, data), = sse_events(await anext(stream))
+        self.assertEqual((event, data['positions'][0]['total_votes']), ('snapshot', 0))
+
+        await sync_to_async(record_ballot)(self.voter, self.election, [(self.position, [self.candidate])])
+        update = []
+        while not update:
+            update = sse_events(await asyncio.wait_for(anext(stream), 5))
+        event, data = update[-1]
+        self.assertEqual(event, 'update')
+        self.assertIn({'position': self.position.id, 'candidate': self.candidate.id, 'votes': 1}, data['candidates'])
+
+        # A disconnecting client cancels the response task; the shared feed
+        # stops with its last subscriber
+        reader = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        for _ in range(100):
+            if self.election.id not in _feeds:
+                break
+            await asyncio.sleep(0.01)
+        self.assertNotIn(self.election.id, _feeds)
+
+def lagging_replica(alias):
+    return 60
+
+
+@skipUnless('replica' in settings.DATABASES, 'run with --settings=election_project.test_settings')
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_MAX_LAG_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    """Two SQLite databases stand in for the primary and a replica holding different rows"""
+    # The runner checks every listed alias, even for skipped tests
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def setUp(self):
+        lag_monitor.reset()
+        self.addCleanup(lag_monitor.reset)
+        now = timezone.now()
+        self.user = User.objects.create_user('reader')
+        self.election = Election.objects.create(
+            title='Primary copy', description='', start_date=now - timedelta(hours=1),
+            end_date=now + timedelta(hours=1), is_active=True, created_by=self.user,
+        )
+        # bulk_create skips the signals that would write to the primary
+        User.objects.using('replica').bulk_create([User(id=self.user.id, username='reader')])
+        Election.objects.using('replica').bulk_create([Election(
+            id=self.election.id, title='Replica copy', description='', start_date=self.election.start_date,
+            end_date=self.election.end_date, is_active=True, created_by_id=self.user.id,
+        )])
+        self.client.force_login(self.user)
+
+    def test_results_views_read_the_replica(self):
+        response = self.client.get(reverse('election_results'), secure=True)
+        self.assertContains(response, 'Replica copy')
+        self.assertNotContains(response, 'Primary copy')
+
+    def test_voting_views_read_the_primary(self):
+        response = self.client.get(reverse('vote', args=[self.election.id]), secure=True)
+        self.assertContains(response, 'Primary copy')
+
+    @override_settings(REPLICA_LAG_CHECK='results.tests.lagging_replica')
+    def test_lagging_replica_falls_back_to_primary(self):
+        response = self.client.get(reverse('election_results'), secure=True)
+        self.assertContains(response, 'Primary copy')
+
+    def test_report_export_keys_its_job_to_the_primary_version(self):
+        UserProfile.objects.filter(user=self.user).update(role='TALLY_OFFICER')
+        ResultsVersion.objects.filter(election=self.election).update(generation=7)
+
+        response = self.client.get(reverse('export_csv', args=[self.election.id]), secure=True)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(ReportJob.objects.get(election=self.election).version, 7)
+
+    def test_snapshot_missing_on_the_replica_is_not_written_again(self):
+        ended = timezone.now() - timedelta(hours=1)
+        Election.objects.filter(id=self.election.id).update(end_date=ended)
+        Election.objects.using('replica').filter(id=self.election.id).update(end_date=ended)
+        self.election.refresh_from_db()
+        snapshot = close_election(self.election)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('position_results', args=[self.election.id]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if query['sql'].startswith(('INSERT', 'UPDATE'))])
+        self.assertEqual(ResultsSnapshot.objects.get(election=self.election).pk, snapshot.pk)
+
+    def test_first_write_pins_request_to_primary(self):
+        router = ReplicaRouter()
+        token = _request_state.set({'pinned': False, 'replica': None})
+        try:
+            self.assertEqual(router.db_for_read(Election), 'replica')
+            self.assertIsNone(router.db_for_read(User))
+            self.assertEqual(router.db_for_write(Election), 'default')
+            self.assertIsNone(router.db_for_read(Election))
+        finally:
+            _request_state.reset(token)
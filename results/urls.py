@@ -1,18 +1,33 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ElectionResultsView,
     PositionResultsView,
     LiveResultsView,
+    AsyncLiveResultsView,
+    LiveResultsStreamView,
     ExportResultsCSVView,
     ExportResultsPDFView,
+    ExportVotesView,
+    ReportStatusView,
+    ReportDownloadView,
+    CoVotingView,
     DashboardView
 )
 
+if settings.ASYNC_VIEWS:
+    LiveResultsView = AsyncLiveResultsView
+
 urlpatterns = [
     path('', ElectionResultsView.as_view(), name='election_results'),
     path('dashboard/', DashboardView.as_view(), name='results_dashboard'),
     path('election/<int:election_id>/', PositionResultsView.as_view(), name='position_results'),
     path('election/<int:election_id>/live/', LiveResultsView.as_view(), name='live_results'),
+    path('election/<int:election_id>/live/stream/', LiveResultsStreamView.as_view(), name='live_results_stream'),
     path('election/<int:election_id>/export/csv/', ExportResultsCSVView.as_view(), name='export_csv'),
     path('election/<int:election_id>/export/pdf/', ExportResultsPDFView.as_view(), name='export_pdf'),
+    path('election/<int:election_id>/export/votes/', ExportVotesView.as_view(), name='export_votes'),
+    path('election/<int:election_id>/covoting/', CoVotingView.as_view(), name='covoting'),
+    path('reports/<int:job_id>/', ReportStatusView.as_view(), name='report_status'),
+    path('reports/<int:job_id>/download/', ReportDownloadView.as_view(), name='report_download'),
 ]
@@ -1,18 +1,28 @@
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, TemplateView, View
-from django.http import JsonResponse, HttpResponse
-from django.urls import reverse_lazy
-from elections.models import Election, Position, Candidate
-from voting.models import Vote
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse, FileResponse
+from django.urls import reverse, reverse_lazy
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from elections.models import Election
+from results.models import ReportJob, ResultsVersion
+from users.roles import has_role
+from election_project.async_views import AsyncLoginRequiredMixin
+from election_project.db_router import ReadReplicaMixin
+from results.services import dashboard_stats
+from results.snapshots import election_results, get_snapshot, results_payload
+from results.live import format_event, format_retry, stream_results
+from results.exports import stream_votes_csv, stream_votes_jsonl_gzip
+from results.analytics import election_covoting, conditional_support
+from results.reports import RENDERERS, request_report
+from asgiref.sync import sync_to_async
 import json
-import csv
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-import io
 
 
 
@@ -21,10 +31,9 @@ class AdminTallyMixin(UserPassesTestMixin):
     
     def test_func(self):
         return self.request.user.is_authenticated and \
-               hasattr(self.request.user, 'userprofile') and \
-               self.request.user.userprofile.role in ['ADMIN', 'TALLY_OFFICER']
+               has_role(self.request, 'ADMIN', 'TALLY_OFFICER')
 
-class ElectionResultsView(LoginRequiredMixin, ListView):
+class ElectionResultsView(ReadReplicaMixin, LoginRequiredMixin, ListView):
     model = Election
     template_name = 'results/election_results.html'
     context_object_name = 'elections'
@@ -32,178 +41,209 @@ class ElectionResultsView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return Election.objects.all().order_by('-start_date')
 
-class PositionResultsView(LoginRequiredMixin, View):
+class PositionResultsView(ReadReplicaMixin, LoginRequiredMixin, View):
     template_name = 'results/position_results.html'
     
     def get(self, request, election_id):
         election = get_object_or_404(Election, id=election_id)
-        positions = Position.objects.filter(election=election)
-        
-        # Calculate results for each position
-        results = []
-        for position in positions:
-            candidates = Candidate.objects.filter(position=position, is_active=True)
-            position_results = []
-            total_votes = Vote.objects.filter(position=position, election=election).count()
-            
-            for candidate in candidates:
-                vote_count = Vote.objects.filter(candidate=candidate, position=position, election=election).count()
-                percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0
-                
-                position_results.append({
-                    'candidate': candidate,
-                    'vote_count': vote_count,
-                    'percentage': round(percentage, 2),
-                    'photo_url': candidate.get_photo_url()
-                })
-            
-            # Sort by vote count (descending)
-            position_results.sort(key=lambda x: x['vote_count'], reverse=True)
-            
-            # Determine winner
-            winner = position_results[0] if position_results and position_results[0]['vote_count'] > 0 else None
-            
-            results.append({
-                'position': position,
-                'candidates': position_results,
-                'total_votes': total_votes,
-                'winner': winner
-            })
         
+        # Closed elections are served from their frozen snapshot
+        results, turnout = election_results(election)
         context = {
             'election': election,
             'results': results,
+            'turnout': turnout,
         }
         return render(request, self.template_name, context)
 
-class LiveResultsView(LoginRequiredMixin, View):
+class LiveResultsView(ReadReplicaMixin, LoginRequiredMixin, View):
+    """Live results JSON, revalidated with an ETag derived from the results version"""
+    
+    def get(self, request, election_id):
+        version = ResultsVersion.current(election_id)
+        etag = quote_etag(f'{election_id}-{version}')
+        
+        # Unchanged results cost one lookup and no serialization
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        
+        cache_key = f'live_results:{election_id}:{version}'
+        body = cache.get(cache_key)
+        if body is None:
+            election = get_object_or_404(Election, id=election_id)
+            body = json.dumps(results_payload(election), cls=DjangoJSONEncoder)
+            cache.set(cache_key, body, settings.LIVE_RESULTS_CACHE_TIMEOUT)
+        
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class AsyncLiveResultsView(ReadReplicaMixin, AsyncLoginRequiredMixin, View):
+    """``LiveResultsView`` for ASGI deployments: polls answered from the cache never leave the event loop"""
+    
+    async def get(self, request, election_id):
+        version = await ResultsVersion.acurrent(election_id)
+        etag = quote_etag(f'{election_id}-{version}')
+        
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        
+        cache_key = f'live_results:{election_id}:{version}'
+        body = await cache.aget(cache_key)
+        if body is None:
+            election = await aget_object_or_404(Election, id=election_id)
+            body = json.dumps(await sync_to_async(results_payload)(election), cls=DjangoJSONEncoder)
+            await cache.aset(cache_key, body, settings.LIVE_RESULTS_CACHE_TIMEOUT)
+        
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class LiveResultsStreamView(ReadReplicaMixin, View):
+    """Server-Sent Events feed of live results.
+    
+    Served through asgi.py, the connection stays open and receives every
+    change. A WSGI worker would be held for as long as the viewer watches,
+    so there the current results are sent once with a reconnection delay
+    and the browser's EventSource polls.
+    """
+    
+    async def get(self, request, election_id):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        
+        election = await aget_object_or_404(Election, id=election_id)
+        snapshot = await sync_to_async(results_payload)(election)
+        
+        if not isinstance(request, ASGIRequest):
+            body = format_retry(settings.LIVE_RESULTS_STREAM_RETRY_SECONDS) + format_event('snapshot', snapshot)
+            response = HttpResponse(body, content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            return response
+        
+        response = StreamingHttpResponse(
+            stream_results(election.id, snapshot),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+def report_file_response(job):
+    return FileResponse(
+        job.file.open('rb'),
+        as_attachment=True,
+        filename=f'{job.election.title}_results.{RENDERERS[job.format][1]}'
+    )
+
+class ReportExportMixin:
+    """Serve a results report rendered by the background worker pool.
+    
+    Reports are cached per results version: the first request queues a
+    job and gets a pending page, later requests download the stored file.
+    """
+    report_format = None
+    
     def get(self, request, election_id):
         election = get_object_or_404(Election, id=election_id)
+        # Close an ended election first so the report is keyed to its final version
+        get_snapshot(election)
+        job = request_report(election, self.report_format)
         
-        positions_data = []
-        positions = Position.objects.filter(election=election)
-        
-        for position in positions:
-            candidates = Candidate.objects.filter(position=position, is_active=True)
-            candidates_data = []
-            
-            for candidate in candidates:
-                vote_count = Vote.objects.filter(candidate=candidate, position=position, election=election).count()
-                candidates_data.append({
-                    'name': candidate.name,
-                    'party': candidate.party,
-                    'votes': vote_count
-                })
-            
-            positions_data.append({
-                'position': position.title,
-                'candidates': candidates_data
-            })
+        if job.status == 'DONE':
+            return report_file_response(job)
         
+        context = {
+            'election': election,
+            'job': job,
+        }
+        return render(request, 'results/report_pending.html', context, status=202)
+
+# Report exports always write their job, and the job's version must be
+# read from the primary the worker renders from, so they skip the replica
+class ExportResultsCSVView(LoginRequiredMixin, AdminTallyMixin, ReportExportMixin, View):
+    report_format = 'CSV'
+
+class ExportResultsPDFView(LoginRequiredMixin, AdminTallyMixin, ReportExportMixin, View):
+    report_format = 'PDF'
+
+class ReportStatusView(LoginRequiredMixin, AdminTallyMixin, View):
+    # Polled right after the job is created, so it reads the primary
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id)
         return JsonResponse({
-            'election': election.title,
-            'positions': positions_data
+            'id': job.id,
+            'election': job.election_id,
+            'format': job.format,
+            'version': job.version,
+            'status': job.status,
+            'error': job.error,
+            'download_url': reverse('report_download', args=[job.id]) if job.status == 'DONE' else None,
         })
 
-class ExportResultsCSVView(LoginRequiredMixin, AdminTallyMixin, View):
+class ReportDownloadView(LoginRequiredMixin, AdminTallyMixin, View):
+    """Download the file of one finished report job, whatever the current results version"""
+    
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob.objects.select_related('election'), id=job_id, status='DONE')
+        return report_file_response(job)
+
+class ExportVotesView(ReadReplicaMixin, LoginRequiredMixin, AdminTallyMixin, View):
+    """Stream every raw vote of an election for auditors as CSV or gzipped JSON Lines"""
+    
     def get(self, request, election_id):
         election = get_object_or_404(Election, id=election_id)
+        export_format = request.GET.get('format', 'csv')
         
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{election.title}_results.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Election Results', election.title])
-        writer.writerow(['Generated on', election.end_date])
-        writer.writerow([])
-        
-        positions = Position.objects.filter(election=election)
-        for position in positions:
-            writer.writerow([f'Position: {position.title}'])
-            writer.writerow(['Candidate', 'Party', 'Votes', 'Percentage'])
-            
-            candidates = Candidate.objects.filter(position=position, is_active=True)
-            total_votes = Vote.objects.filter(position=position, election=election).count()
-            
-            for candidate in candidates:
-                vote_count = Vote.objects.filter(candidate=candidate, position=position, election=election).count()
-                percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0
-                writer.writerow([
-                    candidate.name,
-                    candidate.party,
-                    vote_count,
-                    f"{percentage:.2f}%"
-                ])
-            
-            writer.writerow(['Total Votes', '', total_votes, '100%'])
-            writer.writerow([])
+        if export_format == 'jsonl':
+            response = StreamingHttpResponse(stream_votes_jsonl_gzip(election), content_type='application/gzip')
+            response['Content-Disposition'] = f'attachment; filename="{election.title}_votes.jsonl.gz"'
+        elif export_format == 'csv':
+            response = StreamingHttpResponse(stream_votes_csv(election), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{election.title}_votes.csv"'
+        else:
+            return HttpResponseBadRequest("Unsupported export format.")
         
+        response['X-Accel-Buffering'] = 'no'
         return response
 
-class ExportResultsPDFView(LoginRequiredMixin, AdminTallyMixin, View):
+class CoVotingView(ReadReplicaMixin, LoginRequiredMixin, AdminTallyMixin, View):
+    """Ticket-splitting analysis: cross-position co-votes and straight-ticket rates"""
+    template_name = 'results/covoting.html'
+    
     def get(self, request, election_id):
         election = get_object_or_404(Election, id=election_id)
+        version = ResultsVersion.current(election.id)
         
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title = Paragraph(f"Election Results: {election.title}", styles['Title'])
-        elements.append(title)
-        elements.append(Paragraph(f"Generated on: {election.end_date}", styles['Normal']))
-        elements.append(Paragraph("<br/>", styles['Normal']))
-        
-        positions = Position.objects.filter(election=election)
-        for position in positions:
-            # Position header
-            elements.append(Paragraph(f"Position: {position.title}", styles['Heading2']))
-            
-            # Table data
-            data = [['Candidate', 'Party', 'Votes', 'Percentage']]
-            candidates = Candidate.objects.filter(position=position, is_active=True)
-            total_votes = Vote.objects.filter(position=position, election=election).count()
-            
-            for candidate in candidates:
-                vote_count = Vote.objects.filter(candidate=candidate, position=position, election=election).count()
-                percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0
-                data.append([
-                    candidate.name,
-                    candidate.party,
-                    str(vote_count),
-                    f"{percentage:.2f}%"
-                ])
-            
-            data.append(['Total Votes', '', str(total_votes), '100%'])
-            
-            # Create table
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            elements.append(table)
-            elements.append(Paragraph("<br/>", styles['Normal']))
-        
-        doc.build(elements)
-        buffer.seek(0)
-        
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{election.title}_results.pdf"'
-        return response
+        cache_key = f'covoting:{election.id}:{version}'
+        data = cache.get(cache_key)
+        if data is None:
+            analysis = election_covoting(election)
+            support = conditional_support(analysis)
+            data = {
+                'ballots': analysis['ballots'],
+                'parties': analysis['parties'].to_dict('records'),
+                'columns': list(support.columns),
+                'rows': [
+                    (label, [None if value != value else value for value in values])
+                    for label, values in zip(support.index, support.to_numpy().tolist())
+                ],
+            }
+            cache.set(cache_key, data, settings.ANALYTICS_CACHE_TIMEOUT)
+        
+        return render(request, self.template_name, {'election': election, **data})
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+class DashboardView(ReadReplicaMixin, LoginRequiredMixin, TemplateView):
     template_name = 'results/dashboard.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['elections'] = Election.objects.all().order_by('-start_date')[:5]
+        context['stats'] = dashboard_stats()
         return context
@@ -1,11 +1,39 @@
-from django.contrib import admin
+import io
 
-# Register your models here.
 from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
+
 from .models import UserProfile
+from .roll_import import import_voter_roll
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'role', 'voter_id']
     list_filter = ['role']
     search_fields = ['user__username', 'voter_id']
+    
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='users_userprofile_import'),
+        ]
+        return urls + super().get_urls()
+    
+    def import_view(self, request):
+        """Bulk-create voters from an uploaded CSV roll"""
+        if not self.has_add_permission(request):
+            return self.admin_site.login(request)
+        
+        report = None
+        if request.method == 'POST' and request.FILES.get('roll'):
+            roll = io.TextIOWrapper(request.FILES['roll'].file, encoding='utf-8-sig', newline='')
+            report = import_voter_roll(roll)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Import voter roll',
+            'opts': self.model._meta,
+            'report': report,
+            'problems_shown': 200,
+        }
+        return TemplateResponse(request, 'admin/users/userprofile/import.html', context)
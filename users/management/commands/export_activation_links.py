@@ -0,0 +1,23 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from users.roll_import import activation_rows, pending_activation
+
+
+class Command(BaseCommand):
+    help = 'Write activation URLs for imported voters who have not set a password yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to write')
+        parser.add_argument('--base-url', default='', help='Prefix for activation URLs, e.g. https://vote.example.org')
+
+    def handle(self, *args, **options):
+        count = 0
+        with open(options['path'], 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output)
+            writer.writerow(['voter_id', 'username', 'email', 'activation_url'])
+            for row in activation_rows(pending_activation().iterator(chunk_size=5000), options['base_url']):
+                writer.writerow(row)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} activation link(s) to {options['path']}."))
@@ -0,0 +1,57 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.roll_import import activation_rows, import_voter_roll
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-create voters from a CSV roll (voter_id, username, email, first_name, '
+        'last_name) with unusable passwords, reporting duplicates and invalid rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--activation-links', help='Write the activation URL of each created voter to this CSV')
+        parser.add_argument('--base-url', default='', help='Prefix for activation URLs, e.g. https://vote.example.org')
+        parser.add_argument('--report', help='Write duplicates and errors to this CSV')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        links, on_created = None, None
+        if options['activation_links']:
+            links = open(options['activation_links'], 'w', newline='', encoding='utf-8')
+            link_writer = csv.writer(links)
+            link_writer.writerow(['voter_id', 'username', 'email', 'activation_url'])
+            on_created = lambda users: link_writer.writerows(activation_rows(users, options['base_url']))
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as roll:
+                report = import_voter_roll(roll, chunk_size=options['chunk_size'], on_created=on_created)
+        except OSError as error:
+            raise CommandError(f"Cannot read {options['path']}: {error}")
+        finally:
+            if links is not None:
+                links.close()
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as output:
+                writer = csv.writer(output)
+                writer.writerow(['line', 'problem', 'detail'])
+                for duplicate in report.duplicates:
+                    writer.writerow([duplicate['line'], f"duplicate {duplicate['field']}",
+                                     f"{duplicate['value']} ({duplicate['reason']})"])
+                for error in report.errors:
+                    writer.writerow([error['line'], 'invalid', error['message']])
+        else:
+            for duplicate in report.duplicates[:20]:
+                self.stderr.write(f"Line {duplicate['line']}: duplicate {duplicate['field']} {duplicate['value']} ({duplicate['reason']})")
+            for error in report.errors[:20]:
+                self.stderr.write(f"Line {error['line']}: {error['message']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {report.rows} row(s) in {time.perf_counter() - started:.1f}s: created {report.created}, "
+            f"{len(report.duplicates)} duplicate(s), {len(report.errors)} invalid."
+        ))
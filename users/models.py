@@ -17,8 +17,29 @@ class UserProfile(models.Model):
     role = models.CharField(max_length=15, choices=ROLE_CHOICES, default='VOTER')
     voter_id = models.CharField(max_length=20, unique=True, null=True, blank=True)
     
+    TRACKED_FIELDS = ['role', 'voter_id']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded = self.tracked_values()
+    
     def __str__(self):
         return f"{self.user.username} - {self.role}"
+    
+    def tracked_values(self):
+        # Deferred fields are absent from __dict__ and cannot have changed
+        return {name: self.__dict__[name] for name in self.TRACKED_FIELDS if name in self.__dict__}
+    
+    def changed_fields(self):
+        """Tracked fields that differ from their values when loaded or last saved"""
+        if self._state.adding:
+            return list(self.TRACKED_FIELDS)
+        current = self.tracked_values()
+        return [name for name in current if name not in self._loaded or current[name] != self._loaded[name]]
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded = self.tracked_values()
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -26,5 +47,14 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.userprofile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    # Only a profile loaded through this user can carry unsaved changes, and
+    # only those are written: the last_login update on every login used to
+    # fetch and re-save the profile for nothing
+    if created or not User.userprofile.related.is_cached(instance):
+        return
+    profile = instance.userprofile
+    if profile._state.adding:
+        profile.save()
+    elif profile.changed_fields():
+        profile.save(update_fields=profile.changed_fields())
@@ -0,0 +1,35 @@
+"""
+Role lookups for permission mixins and templates.
+
+A user's role is read once per request, with a single-column query, and
+remembered on the request, so protected views and the navigation bar
+share one lookup. It is never cached across requests: a revoked admin or
+tally role must stop working on the very next request in every worker,
+however the profile was changed.
+"""
+from users.models import UserProfile
+
+ROLE_LABELS = dict(UserProfile.ROLE_CHOICES)
+
+
+def get_role(request):
+    """Role of the request's user, or '' when anonymous or without a profile"""
+    if not hasattr(request, '_user_role'):
+        user = request.user
+        role = ''
+        if user.is_authenticated:
+            role = UserProfile.objects.filter(user_id=user.id).values_list('role', flat=True).first() or ''
+        request._user_role = role
+    return request._user_role
+
+
+def has_role(request, *roles):
+    return get_role(request) in roles
+
+
+def role(request):
+    """Context processor exposing ``user_role`` and ``user_role_display``, resolved lazily"""
+    return {
+        'user_role': lambda: get_role(request),
+        'user_role_display': lambda: ROLE_LABELS.get(get_role(request), ''),
+    }
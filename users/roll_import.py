@@ -0,0 +1,173 @@
+"""
+Bulk import of voter rolls from CSV.
+
+Rows are read in chunks and each chunk is written with two ``bulk_create``
+calls (``User`` then ``UserProfile``), so the per-user ``post_save``
+profile signals never fire. Passwords are left unusable; voters pick one
+through the activation link from ``activation_path``, which is a
+standard Django password-reset token and expires after
+``PASSWORD_RESET_TIMEOUT``.
+
+Expected columns: ``voter_id`` (required), ``username`` (defaults to the
+voter ID), ``email``, ``first_name``, ``last_name``.
+"""
+import csv
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from users.models import UserProfile
+
+REQUIRED_COLUMNS = {'voter_id'}
+username_validator = UnicodeUsernameValidator()
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.duplicates = []
+        self.errors = []
+
+    def duplicate(self, line, field, value, reason):
+        self.duplicates.append({'line': line, 'field': field, 'value': value, 'reason': reason})
+
+    def error(self, line, message):
+        self.errors.append({'line': line, 'message': message})
+
+
+def clean_row(row):
+    voter_id = (row.get('voter_id') or '').strip()
+    username = (row.get('username') or '').strip() or voter_id
+    email = (row.get('email') or '').strip()
+    first_name = (row.get('first_name') or '').strip()
+    last_name = (row.get('last_name') or '').strip()
+
+    if not voter_id:
+        raise ValidationError('voter_id is required')
+    if len(voter_id) > UserProfile._meta.get_field('voter_id').max_length:
+        raise ValidationError(f'voter_id {voter_id!r} is too long')
+    if len(username) > User._meta.get_field('username').max_length:
+        raise ValidationError(f'username {username!r} is too long')
+    username_validator(username)
+    if email:
+        validate_email(email)
+    if len(first_name) > 150 or len(last_name) > 150:
+        raise ValidationError('name is too long')
+
+    return {
+        'voter_id': voter_id,
+        'username': username,
+        'email': email,
+        'first_name': first_name,
+        'last_name': last_name,
+    }
+
+
+def import_chunk(chunk, report, seen_usernames, seen_voter_ids, on_created=None):
+    existing_usernames = set(
+        User.objects.filter(username__in=[row['username'] for _, row in chunk]).values_list('username', flat=True)
+    )
+    existing_voter_ids = set(
+        UserProfile.objects.filter(voter_id__in=[row['voter_id'] for _, row in chunk]).values_list('voter_id', flat=True)
+    )
+
+    accepted = []
+    for line, row in chunk:
+        if row['voter_id'] in existing_voter_ids:
+            report.duplicate(line, 'voter_id', row['voter_id'], 'already registered')
+        elif row['voter_id'] in seen_voter_ids:
+            report.duplicate(line, 'voter_id', row['voter_id'], 'repeated in file')
+        elif row['username'] in existing_usernames:
+            report.duplicate(line, 'username', row['username'], 'already registered')
+        elif row['username'] in seen_usernames:
+            report.duplicate(line, 'username', row['username'], 'repeated in file')
+        else:
+            accepted.append(row)
+        seen_voter_ids.add(row['voter_id'])
+        seen_usernames.add(row['username'])
+
+    if not accepted:
+        return
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=row['username'],
+                email=row['email'],
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                # Unusable password: nothing to hash on import, set on activation
+                password=UNUSABLE_PASSWORD_PREFIX,
+            )
+            for row in accepted
+        ])
+        if any(user.pk is None for user in users):
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, role='VOTER', voter_id=row['voter_id'])
+            for user, row in zip(users, accepted)
+        ])
+    report.created += len(users)
+    if on_created is not None:
+        on_created(users)
+
+
+def import_voter_roll(csvfile, chunk_size=5000, on_created=None):
+    """
+    Import a voter roll from an open text-mode CSV file; returns an ImportReport.
+
+    ``on_created`` is called with each chunk's new users (profiles attached)
+    so callers can stream activation links without holding the whole roll.
+    """
+    report = ImportReport()
+    reader = csv.DictReader(csvfile)
+    missing = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+    if missing:
+        report.error(1, f"Missing column(s): {', '.join(sorted(missing))}")
+        return report
+
+    seen_usernames, seen_voter_ids = set(), set()
+    chunk = []
+    for row in reader:
+        report.rows += 1
+        try:
+            chunk.append((reader.line_num, clean_row(row)))
+        except ValidationError as error:
+            report.error(reader.line_num, '; '.join(error.messages))
+        if len(chunk) >= chunk_size:
+            import_chunk(chunk, report, seen_usernames, seen_voter_ids, on_created)
+            chunk = []
+    if chunk:
+        import_chunk(chunk, report, seen_usernames, seen_voter_ids, on_created)
+    return report
+
+
+def activation_path(user):
+    """Relative URL where ``user`` sets their first password"""
+    uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
+    return reverse('activate', args=[uidb64, default_token_generator.make_token(user)])
+
+
+def pending_activation():
+    """Imported voters who have not chosen a password yet"""
+    return (
+        User.objects.filter(password__startswith=UNUSABLE_PASSWORD_PREFIX, userprofile__role='VOTER')
+        .select_related('userprofile')
+        .order_by('id')
+    )
+
+
+def activation_rows(users, base_url=''):
+    for user in users:
+        yield [user.userprofile.voter_id, user.username, user.email, base_url.rstrip('/') + activation_path(user)]
@@ -1,3 +1,168 @@
-from django.test import TestCase
+import io
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.models import UserProfile
+from users.roll_import import activation_path, import_voter_roll
+from users.throttle import take_token, throttle_key
+from voting.models import AuditLog
+
+ROLL = """voter_id,username,email,first_name,last_name
+V001,,ada@example.org,Ada,Lovelace
+V002,grace,grace@example.org,Grace,Hopper
+V001,,again@example.org,Ada,Again
+V003,grace,other@example.org,Other,Grace
+,,missing@example.org,No,Id
+V004,,not-an-email,Bad,Email
+"""
+
+
+@override_settings(AUDIT_LOG_BUFFERED=False)
+class VoterRollImportTests(TestCase):
+    def test_import_reports_duplicates_and_errors(self):
+        report = import_voter_roll(io.StringIO(ROLL), chunk_size=2)
+
+        self.assertEqual(report.rows, 6)
+        self.assertEqual(report.created, 2)
+        self.assertEqual([(d['line'], d['field']) for d in report.duplicates], [(4, 'voter_id'), (5, 'username')])
+        self.assertEqual([error['line'] for error in report.errors], [6, 7])
+        self.assertEqual(
+            dict(UserProfile.objects.values_list('voter_id', 'user__username')),
+            {'V001': 'V001', 'V002': 'grace'},
+        )
+        self.assertFalse(User.objects.get(username='grace').has_usable_password())
+
+        again = import_voter_roll(io.StringIO(ROLL))
+        self.assertEqual(again.created, 0)
+        self.assertEqual(len(again.duplicates), 4)
+
+    def test_activation_sets_password_once(self):
+        import_voter_roll(io.StringIO(ROLL))
+        user = User.objects.get(username='grace')
+        link = activation_path(user)
+        url = self.client.get(link, secure=True)['Location']
+        response = self.client.post(url, {
+            'new_password1': 'a-long-unique-passphrase',
+            'new_password2': 'a-long-unique-passphrase',
+        }, secure=True)
+
+        self.assertRedirects(response, '/users/login/', fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('a-long-unique-passphrase'))
+        self.assertContains(self.client.get(link, secure=True), 'invalid or has already been used')
+
+
+@override_settings(AUDIT_LOG_BUFFERED=False)
+class ProfileWriteAndRoleCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('officer', password='a-long-unique-passphrase')
+        UserProfile.objects.filter(user=self.user).update(role='TALLY_OFFICER')
+
+    def test_login_does_not_rewrite_profile(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.client.post('/users/login/', {'username': 'officer', 'password': 'a-long-unique-passphrase'}, secure=True)
+        profile_writes = [q['sql'] for q in captured if q['sql'].startswith('UPDATE') and 'users_userprofile' in q['sql']]
+        self.assertEqual(profile_writes, [])
+
+    def test_changed_profile_is_saved_with_user(self):
+        self.user.userprofile.voter_id = 'V-1'
+        self.user.save()
+        self.assertEqual(UserProfile.objects.get(user=self.user).voter_id, 'V-1')
+
+    def test_bulk_created_profile_is_not_rewritten_on_login(self):
+        user = User.objects.bulk_create([User(username='bulk', password='!')])[0]
+        UserProfile.objects.bulk_create([UserProfile(user=user, role='VOTER')])
+        UserProfile.objects.filter(user=user).update(role='ADMIN')
+        user.save(update_fields=['last_login'])
+        self.assertEqual(UserProfile.objects.get(user=user).role, 'ADMIN')
+
+    def test_role_is_read_once_per_request_and_revocation_is_immediate(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get('/results/reports/999/', secure=True).status_code, 404)
+        self.assertEqual(len([q for q in captured if 'users_userprofile' in q['sql']]), 1)
+
+        # Even a queryset update, which sends no signals, applies to the next request
+        UserProfile.objects.filter(user=self.user).update(role='VOTER')
+        self.assertEqual(self.client.get('/results/reports/999/', secure=True).status_code, 403)
+
+@override_settings(
+    AUDIT_LOG_BUFFERED=False,
+    LOGIN_THROTTLE_IP=(10, 300),
+    LOGIN_THROTTLE_USERNAME=(3, 300),
+    LOGIN_LOCKOUT_SECONDS=60,
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Keep every attempt in one counting window
+        clock = mock.patch('users.throttle.time.time', return_value=1_800_000_000.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.user = User.objects.create_user('voter', password='a-long-unique-passphrase')
+
+    def attempt(self, username='voter', password='wrong-password', ip='203.0.113.7'):
+        return self.client.post(
+            '/users/login/', {'username': username, 'password': password},
+            secure=True, REMOTE_ADDR=ip,
+        )
+
+    def test_username_lockout_is_progressive_and_audited_in_aggregate(self):
+        for _ in range(3):
+            self.assertEqual(self.attempt().status_code, 200)
+
+        # Locked out: even the right password is refused without being checked
+        response = self.attempt(password='a-long-unique-passphrase')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        for _ in range(5):
+            self.assertEqual(self.attempt(ip='198.51.100.1').status_code, 429)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        throttled = AuditLog.objects.filter(action='LOGIN_THROTTLED')
+        self.assertEqual(throttled.count(), 1)
+        self.assertIn('username voter', throttled.get().details)
+
+        # The lockout ends, but the window is still used up: the next one is twice as long
+        cache.delete(throttle_key('lock', 'username', 'voter'))
+        self.assertEqual(self.attempt()['Retry-After'], '120')
+
+    def test_forwarded_for_only_counts_behind_trusted_proxies(self):
+        # Without a trusted proxy a client rotating X-Forwarded-For still uses up its own limit
+        with self.settings(TRUSTED_PROXY_COUNT=0):
+            for number in range(10):
+                self.client.post('/users/login/', {'username': f'user{number}', 'password': 'wrong-password'},
+                                 secure=True, REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR=f'198.51.100.{number}')
+            response = self.client.post('/users/login/', {'username': 'someone-else', 'password': 'wrong-password'},
+                                        secure=True, REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR='198.51.100.99')
+            self.assertEqual(response.status_code, 429)
+
+        # Behind the default one proxy the address it appended is the client's, whatever came before it
+        for number in range(11):
+            response = self.client.post(
+                '/users/login/', {'username': f'proxied{number}', 'password': 'wrong-password'},
+                secure=True, REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR=f'198.51.100.{number}, 192.0.2.50',
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('ip 192.0.2.50', AuditLog.objects.get(action='LOGIN_THROTTLED', ip_address='192.0.2.50').details)
+
+    def test_concurrent_attempts_are_each_counted(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            allowed = list(pool.map(lambda _: take_token('ip', '203.0.113.7', 10, 300, 1_800_000_000.0), range(40)))
+        self.assertEqual(allowed.count(True), 10)
+
+    def test_ip_bucket_spans_usernames_and_success_resets_username(self):
+        for number in range(10):
+            self.assertEqual(self.attempt(username=f'user{number}').status_code, 200)
+        self.assertEqual(self.attempt(username='someone-else').status_code, 429)
+        self.assertEqual(self.attempt(ip='192.0.2.1', password='a-long-unique-passphrase').status_code, 302)
+
+        self.client.logout()
+        for _ in range(3):
+            self.assertEqual(self.attempt(ip='192.0.2.1').status_code, 200)
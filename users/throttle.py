@@ -0,0 +1,128 @@
+"""
+Login throttling against password guessing and credential stuffing.
+
+Each login attempt is counted against two limits kept in the cache: one
+for the client IP and one for the username tried
+(``LOGIN_THROTTLE_IP`` / ``LOGIN_THROTTLE_USERNAME``, as (attempts,
+period)). Attempts are counted per fixed window of the period with
+``cache.add`` and ``cache.incr``, which are atomic in Redis, so a burst
+of concurrent logins cannot all read the same count; at most twice the
+limit gets through around a window boundary. Once a window's count passes
+the limit the IP or username is locked out, for twice as long as the
+previous lockout within ``LOGIN_STRIKES_TIMEOUT``. Attempts are checked
+before ``authenticate()``, so a rejected one never costs a password hash.
+
+Rejections are counted and written to the audit log as one
+``LOGIN_THROTTLED`` entry per IP or username every
+``LOGIN_THROTTLE_AUDIT_INTERVAL`` seconds.
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from voting.audit import record_audit
+
+logger = logging.getLogger(__name__)
+
+
+def throttle_key(kind, scope, value):
+    # Usernames are free text; hash them into a cache-safe key
+    digest = hashlib.sha256(value.encode()).hexdigest()[:32]
+    return f'login_{kind}:{scope}:{digest}'
+
+
+def subjects(ip, username):
+    """(scope, value, (capacity, period)) of every bucket an attempt draws from"""
+    buckets = [('ip', ip or 'unknown', settings.LOGIN_THROTTLE_IP)]
+    if username:
+        buckets.append(('username', username.strip().lower(), settings.LOGIN_THROTTLE_USERNAME))
+    return buckets
+
+
+def window_key(scope, value, period, now):
+    return f"{throttle_key('attempts', scope, value)}:{int(now // period)}"
+
+
+def take_token(scope, value, capacity, period, now):
+    """Count an attempt in the current window; False once ``capacity`` were made"""
+    key = window_key(scope, value, period, now)
+    cache.add(key, 0, period)
+    try:
+        attempts = cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, 1, period)
+        attempts = 1
+    return attempts <= capacity
+
+
+def lock_out(scope, value, now):
+    """Lock ``value`` out, doubling the lockout for every recent one; returns its seconds"""
+    strikes_key = throttle_key('strikes', scope, value)
+    strikes = cache.get(strikes_key, 0) + 1
+    seconds = min(settings.LOGIN_LOCKOUT_SECONDS * 2 ** (strikes - 1), settings.LOGIN_LOCKOUT_MAX_SECONDS)
+    cache.set(throttle_key('lock', scope, value), now + seconds, seconds)
+    cache.set(strikes_key, strikes, settings.LOGIN_STRIKES_TIMEOUT)
+    logger.warning(f"Login locked out for {scope} {value} for {seconds}s (lockout {strikes})")
+    return seconds
+
+
+def note_rejection(scope, value, retry_after, ip):
+    count_key = throttle_key('rejected', scope, value)
+    cache.add(count_key, 0, settings.LOGIN_STRIKES_TIMEOUT)
+    try:
+        cache.incr(count_key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(count_key, 1, settings.LOGIN_STRIKES_TIMEOUT)
+
+    # The first rejection in an interval writes everything counted since the last entry
+    if cache.add(throttle_key('audited', scope, value), True, settings.LOGIN_THROTTLE_AUDIT_INTERVAL):
+        count = cache.get(count_key, 1)
+        cache.delete(count_key)
+        record_audit(
+            user=None,
+            action='LOGIN_THROTTLED',
+            details=f'{count} login attempt(s) rejected for {scope} {value}, locked out for {retry_after}s more',
+            ip_address=ip
+        )
+
+
+def check_login(ip, username):
+    """Seconds until ``ip`` may try ``username`` again, or 0 to go ahead with this attempt"""
+    now = time.time()
+    buckets = subjects(ip, username)
+
+    retry_after, rejected_by = 0, None
+    for scope, value, _ in buckets:
+        locked_until = cache.get(throttle_key('lock', scope, value))
+        if locked_until is not None and locked_until > now:
+            retry_after, rejected_by = math.ceil(locked_until - now), (scope, value)
+            break
+    else:
+        for scope, value, (capacity, period) in buckets:
+            if not take_token(scope, value, capacity, period, now):
+                retry_after, rejected_by = lock_out(scope, value, now), (scope, value)
+                break
+
+    if rejected_by is not None:
+        note_rejection(*rejected_by, retry_after, ip)
+    return retry_after
+
+
+def login_succeeded(ip, username):
+    """Give the IP its attempt back and forget the username's failures"""
+    now = time.time()
+    for scope, value, (_, period) in subjects(ip, username):
+        if scope == 'ip':
+            try:
+                cache.decr(window_key(scope, value, period, now))
+            except ValueError:
+                # Counted in a window that has already ended
+                pass
+        else:
+            cache.delete_many([window_key(scope, value, period, now), throttle_key('strikes', scope, value)])
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import UserLoginView, UserLogoutView, RegisterView, ProfileView
+from .views import UserLoginView, UserLogoutView, RegisterView, ProfileView, ActivateAccountView
 
 urlpatterns = [
     path('login/', UserLoginView.as_view(), name='login'),
     path('logout/', UserLogoutView.as_view(), name='logout'),
     path('register/', RegisterView.as_view(), name='register'),
+    path('activate/<uidb64>/<token>/', ActivateAccountView.as_view(), name='activate'),
     path('profile/', ProfileView.as_view(), name='profile'),
 ]
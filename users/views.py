@@ -1,14 +1,19 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.views import PasswordResetConfirmView
 from django.views import View
 from django.views.generic import TemplateView, CreateView, FormView, ListView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from .models import UserProfile
-from voting.models import AuditLog
+from .roles import has_role
+from .throttle import check_login, login_succeeded
+from voting.audit import record_audit
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +22,14 @@ class BaseView:
     
     @staticmethod
     def get_client_ip(request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        # Each trusted proxy appends the address it was connected from, so
+        # only the last TRUSTED_PROXY_COUNT entries of X-Forwarded-For are
+        # genuine; anything before them was sent by the client
+        proxies = settings.TRUSTED_PROXY_COUNT
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if proxies and len(forwarded) >= proxies:
+            return forwarded[-proxies]
+        return request.META.get('REMOTE_ADDR')
 
 class UserLoginView(FormView, BaseView):
     template_name = 'users/login.html'
@@ -40,12 +47,24 @@ class UserLoginView(FormView, BaseView):
     def post(self, request, *args, **kwargs):
         username = request.POST.get('username')
         password = request.POST.get('password')
+        ip = self.get_client_ip(request)
+        
+        # Throttled attempts are turned away before any password hashing
+        retry_after = check_login(ip, username)
+        if retry_after:
+            minutes = math.ceil(retry_after / 60)
+            messages.error(request, f"Too many login attempts. Please try again in {minutes} minute(s).")
+            response = render(request, self.template_name, {'error': 'Too many login attempts'}, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
+        
         user = authenticate(request, username=username, password=password)
         
         if user is not None:
+            login_succeeded(ip, username)
             login(request, user)
             # Log the login
-            AuditLog.objects.create(
+            record_audit(
                 user=user,
                 action='LOGIN',
                 details=f'User {username} logged in successfully',
@@ -63,7 +82,7 @@ class UserLogoutView(View, BaseView):
     def get(self, request, *args, **kwargs):
         if request.user.is_authenticated:
             username = request.user.username
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action='LOGOUT',
                 details=f'User {username} logged out',
@@ -99,7 +118,7 @@ class RegisterView(CreateView, BaseView):
             profile.save()
             
             # Log the registration
-            AuditLog.objects.create(
+            record_audit(
                 user=user,
                 action='LOGIN',
                 details=f'New user registered: {user.username}',
@@ -111,6 +130,22 @@ class RegisterView(CreateView, BaseView):
             return redirect(self.success_url)
         return render(request, self.template_name, {'form': form})
 
+class ActivateAccountView(PasswordResetConfirmView, BaseView):
+    """First password for voters imported with an unusable one"""
+    template_name = 'users/activate.html'
+    success_url = reverse_lazy('login')
+    
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        record_audit(
+            user=form.user,
+            action='LOGIN',
+            details=f'Account activated: {form.user.username}',
+            ip_address=self.get_client_ip(self.request)
+        )
+        messages.success(self.request, "Your account is active. Please log in.")
+        return response
+
 class ProfileView(LoginRequiredMixin, TemplateView):
     template_name = 'users/profile.html'
     login_url = reverse_lazy('login')
@@ -129,8 +164,7 @@ class AdminOnlyMixin(UserPassesTestMixin):
     
     def test_func(self):
         return self.request.user.is_authenticated and \
-               hasattr(self.request.user, 'userprofile') and \
-               self.request.user.userprofile.role == 'ADMIN'
+               has_role(self.request, 'ADMIN')
 
 class UserListView(LoginRequiredMixin, AdminOnlyMixin, ListView):
     model = UserProfile
@@ -1,3 +1,97 @@
-from django.contrib import admin
+from datetime import datetime, time
 
-# Register your models here.
+from django.contrib import admin, messages
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from results.snapshots import is_closable
+
+from .archive import search_archive, load_manifest
+from .merkle import publish_root
+from .models import AuditLog, MerkleTree
+
+@admin.register(AuditLog)
+class AuditLogAdmin(admin.ModelAdmin):
+    list_display = ['timestamp', 'user', 'action', 'details', 'ip_address']
+    list_filter = ['action']
+    search_fields = ['user__username', 'details', 'ip_address']
+    date_hierarchy = 'timestamp'
+    list_select_related = ['user']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        # Old rows leave only through archive_audit_log
+        return False
+    
+    def get_urls(self):
+        urls = [
+            path('archive/', self.admin_site.admin_view(self.archive_view), name='voting_auditlog_archive'),
+        ]
+        return urls + super().get_urls()
+    
+    def archive_view(self, request):
+        """Search audit entries that have been moved to the archive files"""
+        params = request.GET
+        start = parse_date(params.get('start', ''))
+        end = parse_date(params.get('end', ''))
+        user_id = params.get('user_id', '')
+        
+        searched = any(params.get(key) for key in ['start', 'end', 'action', 'user_id', 'text'])
+        entries = []
+        if searched:
+            entries = search_archive(
+                start=timezone.make_aware(datetime.combine(start, time.min)) if start else None,
+                end=timezone.make_aware(datetime.combine(end, time.max)) if end else None,
+                action=params.get('action') or None,
+                user_id=int(user_id) if user_id.isdigit() else None,
+                text=params.get('text') or None,
+            )
+        
+        manifest = load_manifest()
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Archived audit log',
+            'opts': self.model._meta,
+            'entries': entries,
+            'searched': searched,
+            'params': params,
+            'actions': AuditLog.ACTION_CHOICES,
+            'archived_files': len(manifest['files']),
+            'archived_rows': sum(entry['rows'] for entry in manifest['files']),
+        }
+        return TemplateResponse(request, 'admin/voting/auditlog/archive.html', context)
+
+@admin.register(MerkleTree)
+class MerkleTreeAdmin(admin.ModelAdmin):
+    list_display = ['election', 'size', 'published_size', 'published_root', 'published_at']
+    list_select_related = ['election']
+    readonly_fields = ['election', 'size', 'published_size', 'published_root', 'signature', 'published_at']
+    actions = ['publish']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Sign and publish the root of closed elections')
+    def publish(self, request, queryset):
+        # A root published early freezes the tree size, leaving later votes without proofs
+        published, still_open = 0, []
+        for tree in queryset.select_related('election'):
+            if not is_closable(tree.election):
+                still_open.append(tree.election.title)
+                continue
+            publish_root(tree.election)
+            published += 1
+        self.message_user(request, f"Published {published} root(s).")
+        if still_open:
+            self.message_user(
+                request,
+                f"Not published, voting or its grace period has not ended: {', '.join(still_open)}",
+                messages.WARNING,
+            )
@@ -0,0 +1,165 @@
+"""
+Archival of old AuditLog rows into compressed, day-bucketed JSON Lines files.
+
+Each archived batch writes one ``auditlog-<day>-<part>.jsonl.gz`` file per
+day it covers under ``AUDIT_ARCHIVE_DIR/<year>/<month>/``, records it in
+``manifest.json`` (rows, id and time range, SHA-256) and only then deletes
+the batch from the table, so a crash never loses rows: at worst a batch is
+archived twice.
+"""
+import gzip
+import hashlib
+import json
+import os
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from voting.models import AuditLog
+
+MANIFEST_NAME = 'manifest.json'
+# Ids per DELETE, below SQLite's 999 bound-parameter limit
+DELETE_CHUNK_SIZE = 900
+
+
+def archive_dir():
+    return settings.AUDIT_ARCHIVE_DIR
+
+
+def load_manifest(root=None):
+    path = os.path.join(root or archive_dir(), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'files': []}
+    with open(path, encoding='utf-8') as manifest:
+        return json.load(manifest)
+
+
+def save_manifest(manifest, root=None):
+    root = root or archive_dir()
+    path = os.path.join(root, MANIFEST_NAME)
+    temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as output:
+        json.dump(manifest, output, indent=2)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temporary, path)
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as archived:
+        for block in iter(lambda: archived.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def serialize(row):
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'action': row['action'],
+        'details': row['details'],
+        'ip_address': row['ip_address'],
+        'timestamp': row['timestamp'].isoformat(),
+    }
+
+
+def write_bucket(root, day, rows):
+    part = uuid.uuid4().hex[:8]
+    relative = os.path.join(f'{day:%Y}', f'{day:%m}', f'auditlog-{day:%Y-%m-%d}-{part}.jsonl.gz')
+    path = os.path.join(root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as compressed:
+            for row in rows:
+                compressed.write((json.dumps(serialize(row)) + '\n').encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+    return {
+        'path': relative,
+        'day': f'{day:%Y-%m-%d}',
+        'rows': len(rows),
+        'first_id': rows[0]['id'],
+        'last_id': rows[-1]['id'],
+        'first_timestamp': min(row['timestamp'] for row in rows).isoformat(),
+        'last_timestamp': max(row['timestamp'] for row in rows).isoformat(),
+        'sha256': sha256_of(path),
+    }
+
+
+def archive_audit_log(cutoff, batch_size=50000, root=None):
+    """Move audit rows older than ``cutoff`` to the archive; returns rows archived"""
+    root = root or archive_dir()
+    os.makedirs(root, exist_ok=True)
+    manifest = load_manifest(root)
+    archived = 0
+    last_id = 0
+
+    while True:
+        rows = list(
+            AuditLog.objects.filter(timestamp__lt=cutoff, id__gt=last_id)
+            .order_by('id')
+            .values('id', 'user_id', 'action', 'details', 'ip_address', 'timestamp')[:batch_size]
+        )
+        if not rows:
+            break
+
+        buckets = defaultdict(list)
+        for row in rows:
+            buckets[row['timestamp'].date()].append(row)
+        for day, day_rows in sorted(buckets.items()):
+            manifest['files'].append(write_bucket(root, day, day_rows))
+        save_manifest(manifest, root)
+
+        # Only the rows written out: a row that got its id before the read
+        # but committed after it lies inside the batch's id range unarchived
+        ids = [row['id'] for row in rows]
+        for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+            AuditLog.objects.filter(id__in=ids[start:start + DELETE_CHUNK_SIZE]).delete()
+        archived += len(rows)
+        last_id = rows[-1]['id']
+
+    return archived
+
+
+def verify_archive(root=None):
+    """Return the manifest entries whose file is missing or fails its checksum"""
+    root = root or archive_dir()
+    broken = []
+    for entry in load_manifest(root)['files']:
+        path = os.path.join(root, entry['path'])
+        if not os.path.exists(path) or sha256_of(path) != entry['sha256']:
+            broken.append(entry)
+    return broken
+
+
+def search_archive(start=None, end=None, action=None, user_id=None, text=None, limit=200, root=None):
+    """Scan the archive files overlapping [start, end] for matching entries"""
+    root = root or archive_dir()
+    matches = []
+    for entry in sorted(load_manifest(root)['files'], key=lambda entry: entry['first_timestamp']):
+        if start and parse_datetime(entry['last_timestamp']) < start:
+            continue
+        if end and parse_datetime(entry['first_timestamp']) > end:
+            continue
+        with gzip.open(os.path.join(root, entry['path']), 'rt', encoding='utf-8') as archived:
+            for line in archived:
+                row = json.loads(line)
+                timestamp = parse_datetime(row['timestamp'])
+                if start and timestamp < start:
+                    continue
+                if end and timestamp > end:
+                    continue
+                if action and row['action'] != action:
+                    continue
+                if user_id and row['user_id'] != user_id:
+                    continue
+                if text and text.lower() not in row['details'].lower():
+                    continue
+                row['timestamp'] = timestamp
+                matches.append(row)
+                if len(matches) >= limit:
+                    return matches
+    return matches
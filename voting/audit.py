@@ -0,0 +1,116 @@
+"""
+Buffered AuditLog writer.
+
+Request code calls ``record_audit`` which only appends the entry to an
+in-process buffer; a background thread writes the buffer with one
+``bulk_create`` every ``AUDIT_FLUSH_INTERVAL_MS`` or as soon as
+``AUDIT_FLUSH_BATCH_SIZE`` entries are waiting. A batch that cannot be
+written, for whatever reason, is appended to ``AUDIT_FALLBACK_PATH``
+(JSON Lines, fsynced) and can be loaded back with
+``manage.py replay_audit_log``. The buffer is flushed when the worker
+process exits.
+
+Set ``AUDIT_LOG_BUFFERED = False`` to write entries synchronously.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from voting.models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file_lock = threading.Lock()
+        self.entries = []
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def record(self, entries):
+        if not getattr(settings, 'AUDIT_LOG_BUFFERED', True):
+            AuditLog.objects.bulk_create([AuditLog(**entry) for entry in entries])
+            return
+
+        with self.lock:
+            self.ensure_started()
+            self.entries.extend(entries)
+            full = len(self.entries) >= settings.AUDIT_FLUSH_BATCH_SIZE
+        if full:
+            self.wakeup.set()
+
+    def ensure_started(self):
+        # A forked worker inherits the buffer but not the flusher thread
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.entries = []
+            self.thread = None
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name='audit-writer', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(settings.AUDIT_FLUSH_INTERVAL_MS / 1000)
+            self.wakeup.clear()
+            # The thread must outlive any one failed batch
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit flush failed")
+
+    def flush(self):
+        with self.lock:
+            entries, self.entries = self.entries, []
+        if not entries:
+            return
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create([AuditLog(**entry) for entry in entries])
+        except Exception:
+            # The entries are already out of the buffer: whatever went wrong, keep them
+            logger.exception(f"Could not write {len(entries)} audit entries, saving them to the fallback file")
+            self.spill(entries)
+        finally:
+            close_old_connections()
+
+    def spill(self, entries):
+        lines = ''.join(json.dumps(entry, default=str) + '\n' for entry in entries)
+        with self.file_lock:
+            with open(settings.AUDIT_FALLBACK_PATH, 'a', encoding='utf-8') as fallback:
+                fallback.write(lines)
+                fallback.flush()
+                os.fsync(fallback.fileno())
+
+
+writer = AuditWriter()
+atexit.register(writer.flush)
+
+
+def audit_entry(user, action, details, ip_address=None):
+    return {
+        'user_id': user.id if user is not None else None,
+        'action': action,
+        'details': details,
+        'ip_address': ip_address,
+        'timestamp': timezone.now(),
+    }
+
+
+def record_audit(user, action, details, ip_address=None):
+    """Queue one AuditLog entry; the timestamp is taken now, not at flush time"""
+    writer.record([audit_entry(user, action, details, ip_address)])
+
+
+def record_audit_many(entries):
+    """Queue several entries built with ``audit_entry``"""
+    writer.record(entries)
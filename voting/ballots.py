@@ -0,0 +1,175 @@
+"""
+Reading, checking and recording one voter's ballot.
+
+Plurality positions submit one ``position_<id>`` radio value, approval
+positions any number of ``position_<id>`` checkboxes and ranked positions
+a ``rank_<position id>_<candidate id>`` preference number per candidate.
+Approval and ranked selections are stored on the vote as a packed array
+of little-endian uint32 candidate ids (four bytes per preference), which
+the results tally engine reads straight into NumPy.
+
+The views read and check a ballot with their own (sync or async) queries
+and hand it to ``record_ballot``, which writes it in one transaction.
+"""
+import numpy as np
+from django.db import IntegrityError, transaction
+
+from results.models import CandidateTally, ResultsSnapshot, ResultsVersion
+from voting.audit import audit_entry, record_audit_many
+from voting.merkle import append_leaves
+from voting.models import Participation, Vote
+
+RANKING_DTYPE = np.dtype('<u4')
+
+
+def pack_ranking(candidate_ids):
+    return np.asarray(candidate_ids, dtype=RANKING_DTYPE).tobytes()
+
+
+def unpack_ranking(data):
+    return np.frombuffer(data, dtype=RANKING_DTYPE).tolist()
+
+
+class InvalidSelection(ValueError):
+    def __init__(self, position):
+        super().__init__(position.title)
+        self.position = position
+
+
+class ElectionClosed(Exception):
+    """The election's final results were frozen before the ballot could commit"""
+
+
+class AlreadyVoted(Exception):
+    """The voter already has a ballot in the election"""
+
+
+def read_selection(data, position):
+    """Candidate ids chosen for a position, in preference order.
+
+    Raises ValueError for malformed or contradictory input; candidates are
+    checked against the position by the caller.
+    """
+    if position.ballot_type == 'APPROVAL':
+        candidate_ids = [int(value) for value in data.getlist(f'position_{position.id}')]
+        if len(set(candidate_ids)) != len(candidate_ids):
+            raise ValueError('Candidate approved twice')
+        return candidate_ids
+
+    if position.is_ranked:
+        prefix = f'rank_{position.id}_'
+        ranks = {}
+        for key, value in data.items():
+            if not key.startswith(prefix) or not value:
+                continue
+            rank = int(value)
+            if rank < 1 or rank in ranks:
+                raise ValueError('Each preference can only be used once')
+            ranks[rank] = int(key[len(prefix):])
+        return [ranks[rank] for rank in sorted(ranks)]
+
+    candidate_id = data.get(f'position_{position.id}')
+    return [int(candidate_id)] if candidate_id else []
+
+
+def read_selections(data, positions):
+    """{position id: candidate ids} for every position voted on; raises InvalidSelection"""
+    selections = {}
+    for position in positions:
+        try:
+            candidate_ids = read_selection(data, position)
+        except ValueError:
+            raise InvalidSelection(position)
+        if candidate_ids:
+            selections[position.id] = candidate_ids
+    return selections
+
+
+def selected_ids(selections):
+    return [candidate_id for candidate_ids in selections.values() for candidate_id in candidate_ids]
+
+
+def build_ballot(positions, selections, candidates):
+    """
+    ``[(position, [candidates in preference order])]`` for the positions
+    voted on. ``candidates`` maps id to candidate for ``selected_ids``;
+    raises InvalidSelection when one is missing or stands elsewhere.
+    """
+    ballot = []
+    for position in positions:
+        if position.id not in selections:
+            continue
+        chosen = [candidates.get(candidate_id) for candidate_id in selections[position.id]]
+        if any(candidate is None or candidate.position_id != position.id for candidate in chosen):
+            raise InvalidSelection(position)
+        for candidate in chosen:
+            candidate.position = position
+        ballot.append((position, chosen))
+    return ballot
+
+
+def ballot_details(position, chosen):
+    """Audit log text for one position of a ballot"""
+    names = [candidate.name for candidate in chosen]
+    if position.is_ranked:
+        return f'Ranked {" > ".join(names)} in {position.title}'
+    if position.ballot_type == 'APPROVAL':
+        return f'Approved {", ".join(names)} in {position.title}'
+    return f'Voted for {names[0]} in {position.title}'
+
+
+def record_ballot(user, election, ballot):
+    """
+    Write a ballot with its tallies, vote tree leaves and audit entries in
+    one transaction and return the number of votes. Raises AlreadyVoted
+    when the voter already has a ballot in the election, and ElectionClosed
+    when its results have been frozen meanwhile.
+    """
+    votes = []
+    for position, chosen in ballot:
+        vote = Vote(
+            voter=user,
+            candidate=chosen[0],
+            position=position,
+            election=election
+        )
+        if position.ballot_type != 'PLURALITY':
+            vote.ranking = pack_ranking([candidate.id for candidate in chosen])
+        vote.vote_hash = vote.generate_hash()
+        votes.append(vote)
+    if not votes:
+        return 0
+
+    # Tallies count every approval but only first preferences of
+    # ranked ballots; transfers are worked out by the results count
+    counted = [
+        candidate
+        for position, chosen in ballot
+        for candidate in (chosen if position.ballot_type == 'APPROVAL' else chosen[:1])
+    ]
+
+    try:
+        with transaction.atomic():
+            # The unique participation row rejects a second ballot
+            Participation.objects.create(voter=user, election=election)
+            Vote.objects.bulk_create(votes)
+            append_leaves(election, [vote.vote_hash for vote in votes])
+            # close_election snapshots under the same tree lock, so a ballot that
+            # passed the end_date check but lost the race sees the snapshot here
+            if ResultsSnapshot.objects.filter(election=election).exists():
+                raise ElectionClosed(election.title)
+            CandidateTally.increment_many(election, counted)
+            ResultsVersion.bump(election.id)
+            audit_entries = [
+                audit_entry(user=user, action='VOTE', details=ballot_details(position, chosen))
+                for position, chosen in ballot
+            ]
+            transaction.on_commit(lambda: record_audit_many(audit_entries))
+    except IntegrityError:
+        # Only a ballot already on record means a second attempt; any other
+        # constraint failure is a fault in its own right
+        if Participation.objects.filter(voter=user, election=election).exists() or \
+                Vote.objects.filter(voter=user, election=election).exists():
+            raise AlreadyVoted(election.title)
+        raise
+    return len(votes)
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from elections.models import Election
+from voting.archive import archive_audit_log, verify_archive
+
+
+class Command(BaseCommand):
+    help = 'Move old AuditLog rows into compressed day-bucketed archive files and delete them from the table'
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument('--days', type=int, help='Archive rows older than this many days (default AUDIT_RETENTION_DAYS)')
+        cutoff.add_argument('--before', help='Archive rows older than this ISO date/time')
+        cutoff.add_argument(
+            '--closed-elections', action='store_true',
+            help='Archive everything older than the start of the earliest election still open',
+        )
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--verify', action='store_true', help='Only check archive files against the manifest')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            broken = verify_archive()
+            for entry in broken:
+                self.stderr.write(f"Missing or corrupt: {entry['path']}")
+            if broken:
+                raise CommandError(f"{len(broken)} archive file(s) failed verification")
+            self.stdout.write(self.style.SUCCESS("All archive files match the manifest."))
+            return
+
+        cutoff = self.get_cutoff(options)
+        self.stdout.write(f"Archiving audit entries older than {cutoff.isoformat()}...")
+        archived = archive_audit_log(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} audit entries."))
+
+    def get_cutoff(self, options):
+        now = timezone.now()
+        if options['before']:
+            cutoff = parse_datetime(options['before']) or parse_datetime(f"{options['before']}T00:00:00")
+            if cutoff is None:
+                raise CommandError(f"Invalid date: {options['before']}")
+            if timezone.is_naive(cutoff):
+                cutoff = timezone.make_aware(cutoff)
+            return cutoff
+        if options['closed_elections']:
+            earliest_open = Election.objects.filter(end_date__gt=now).order_by('start_date').first()
+            return earliest_open.start_date if earliest_open else now
+        days = options['days'] if options['days'] is not None else settings.AUDIT_RETENTION_DAYS
+        return now - timedelta(days=days)
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from elections.seeding import seed_election
+from voting.management.commands.loadtest import client_host, percentile
+
+MODES = {
+    'sync': {'DJANGO_ASYNC_VIEWS': '0'},
+    'async': {'DJANGO_ASYNC_VIEWS': '1'},
+}
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+async def slow_request(port, path, host, cookie, delay, timeout):
+    """GET ``path`` like a slow mobile client: the request trickles in over ``delay`` seconds"""
+    started = time.perf_counter()
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+        head = f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'
+        rest = f'Cookie: {cookie}\r\nX-Forwarded-Proto: https\r\nConnection: close\r\n\r\n'
+        writer.write(head.encode())
+        await writer.drain()
+        await asyncio.sleep(delay)
+        writer.write(rest.encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        status = int(response.split(b' ', 2)[1]) if response.startswith(b'HTTP/') else 0
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+        status = 0
+    finally:
+        if writer is not None:
+            writer.close()
+    return status, (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the site with gunicorn in the sync (WSGI) and the async (uvicorn) mode and '
+        'compare throughput and latency with many slow clients polling live results and '
+        'ballots. Runs against the configured database; use a file-based SQLite or a local '
+        'PostgreSQL, never production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=500, help='Concurrent client connections')
+        parser.add_argument('--requests', type=int, default=3, help='Requests per client')
+        parser.add_argument('--client-delay', type=float, default=0.5, help='Seconds each client takes to send its request')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes per mode')
+        parser.add_argument('--timeout', type=float, default=60.0, help='Seconds before a request counts as failed')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--modes', default='sync,async')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded election and voters')
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(sorted(unknown))}")
+
+        voters_needed = min(options['clients'], 200)
+        self.stdout.write(f"Seeding an election with {voters_needed} voter session(s)...")
+        election, voters = seed_election(
+            positions=3, candidates=4, voters=voters_needed, turnout=0,
+            title='Async Benchmark Election', prefix='async-bench',
+        )
+        cookies = []
+        for voter in voters:
+            client = Client()
+            client.force_login(voter)
+            cookies.append(f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}')
+        paths = [reverse('live_results', args=[election.id]), reverse('vote', args=[election.id])]
+
+        try:
+            results = {mode: self.run_mode(mode, options, paths, cookies) for mode in modes}
+        finally:
+            if not options['keep']:
+                election.delete()
+                User.objects.filter(id__in=[voter.id for voter in voters]).delete()
+                User.objects.filter(id=election.created_by_id).delete()
+
+        self.report(results, options)
+
+    def run_mode(self, mode, options, paths, cookies):
+        env = {
+            **os.environ,
+            **MODES[mode],
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'election_project.settings'),
+            'GUNICORN_BIND': f"127.0.0.1:{options['port']}",
+            'WEB_CONCURRENCY': str(options['workers']),
+        }
+        self.stdout.write(f"Starting gunicorn in {mode} mode with {options['workers']} worker(s)...")
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--log-level', 'warning'],
+            cwd=Path(settings.BASE_DIR), env=env,
+        )
+        try:
+            if not wait_for_port(options['port'], 30):
+                raise CommandError(f"Gunicorn did not start in {mode} mode")
+            return asyncio.run(self.load(options, paths, cookies))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    async def load(self, options, paths, cookies):
+        host = client_host()
+        samples = []
+
+        async def client(index):
+            for request in range(options['requests']):
+                samples.append(await slow_request(
+                    options['port'], paths[(index + request) % len(paths)], host,
+                    cookies[index % len(cookies)], options['client_delay'], options['timeout'],
+                ))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(index) for index in range(options['clients'])))
+        return samples, time.perf_counter() - started
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"\n{options['clients']} client(s) x {options['requests']} request(s), "
+            f"{options['client_delay']}s to send each request, {options['workers']} worker(s)"
+        )
+        header = f"{'mode':<8}{'requests':>9}{'errors':>8}{'wall s':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for mode, (samples, wall) in results.items():
+            ok = sorted(elapsed for status, elapsed in samples if status == 200)
+            errors = len(samples) - len(ok)
+            self.stdout.write(
+                f"{mode:<8}{len(samples):>9}{errors:>8}{wall:>8.1f}{len(ok) / wall:>9.1f}"
+                f"{percentile(ok, 50):>9.1f}{percentile(ok, 95):>9.1f}{percentile(ok, 99):>9.1f}"
+            )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from elections.models import Position, Candidate
+from elections.seeding import seed_election
+from voting.models import AuditLog
+from voting.query_plans import hot_queries, full_scans, disable_seqscan
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic election and print the query plans of the hot voting, results and audit queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=6)
+        parser.add_argument('--voters', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # Everything seeded here is rolled back when the command finishes
+        with transaction.atomic():
+            election, voters = seed_election(
+                positions=options['positions'],
+                candidates=options['candidates'],
+                voters=options['voters'],
+            )
+            AuditLog.objects.bulk_create([
+                AuditLog(user=voter, action='VOTE', details='Seeded audit entry')
+                for voter in voters
+            ], batch_size=2000)
+            disable_seqscan(connection)
+
+            position = Position.objects.filter(election=election).first()
+            candidate = Candidate.objects.filter(position=position).first()
+            failures = 0
+            for name, queryset in hot_queries(election, position, candidate, voters[0]).items():
+                plan = queryset.explain()
+                scans = full_scans(plan, connection.vendor)
+                failures += bool(scans)
+                status = self.style.ERROR('FULL SCAN') if scans else self.style.SUCCESS('indexed')
+                self.stdout.write(f"== {name}: {status}")
+                self.stdout.write(plan)
+                self.stdout.write('')
+
+            transaction.set_rollback(True)
+
+        if failures:
+            self.stderr.write(f"{failures} hot quer{'y' if failures == 1 else 'ies'} fell back to a full scan")
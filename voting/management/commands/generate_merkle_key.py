@@ -0,0 +1,34 @@
+import os
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from voting.merkle import load_signing_key, public_key
+
+
+class Command(BaseCommand):
+    help = 'Create the Ed25519 key that signs published vote tree roots and print its public key'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='Overwrite an existing key; roots signed with it can no longer be checked against the served key',
+        )
+
+    def handle(self, *args, **options):
+        path = settings.MERKLE_SIGNING_KEY_FILE
+        if os.path.exists(path) and not options['replace']:
+            raise CommandError(f"{path} already exists; use --replace to overwrite it")
+
+        pem = Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+        )
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'wb') as key_file:
+            key_file.write(pem)
+        load_signing_key.cache_clear()
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
+        self.stdout.write(f"Public key: {public_key()}")
@@ -0,0 +1,165 @@
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from elections.models import Position, Candidate
+from elections.seeding import seed_election
+
+LOADTEST_PASSWORD = 'load-test-password'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def client_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host and '*' not in host and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+class Recorder:
+    """Thread-safe collection of per-endpoint latency and query counts"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def timed(self, name, expected_status, request, *args, **kwargs):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            try:
+                response = request(*args, **kwargs)
+                ok = response.status_code == expected_status
+            except Exception:
+                response, ok = None, False
+            elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.samples[name].append((elapsed, len(captured)))
+            if not ok:
+                self.errors[name] += 1
+        return response
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate concurrent voters (login, ballot, submit) while results pages are '
+        'polled, and report throughput, latency percentiles and queries per request. '
+        'Runs against the configured database; use a file-based SQLite or a local '
+        'PostgreSQL, never production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=200)
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=6)
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent voter sessions')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent results pollers')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded election and voters')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['voters']} voter(s)...")
+        election, voters = seed_election(
+            positions=options['positions'],
+            candidates=options['candidates'],
+            voters=options['voters'],
+            turnout=0,
+            title='Load Test Election',
+            prefix='load',
+            password=LOADTEST_PASSWORD,
+        )
+        ballot = {
+            position.id: list(Candidate.objects.filter(position=position, is_active=True).values_list('id', flat=True))
+            for position in Position.objects.filter(election=election)
+        }
+        host = client_host()
+        recorder = Recorder()
+
+        pending = queue.Queue()
+        for voter in voters:
+            pending.put(voter.username)
+        voting_done = threading.Event()
+
+        def voter_worker():
+            try:
+                while True:
+                    try:
+                        username = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    client = Client(SERVER_NAME=host)
+                    recorder.timed('login', 302, client.post, reverse('login'),
+                                   {'username': username, 'password': LOADTEST_PASSWORD}, secure=True)
+                    recorder.timed('vote', 200, client.get, reverse('vote', args=[election.id]), secure=True)
+                    selections = {f'position_{position_id}': random.choice(candidates)
+                                  for position_id, candidates in ballot.items()}
+                    recorder.timed('cast_vote', 302, client.post, reverse('cast_vote', args=[election.id]),
+                                   selections, secure=True)
+            finally:
+                connection.close()
+
+        def reader_worker(user):
+            client = Client(SERVER_NAME=host)
+            client.force_login(user)
+            try:
+                while not voting_done.is_set():
+                    recorder.timed('position_results', 200, client.get,
+                                   reverse('position_results', args=[election.id]), secure=True)
+                    recorder.timed('live_results', 200, client.get,
+                                   reverse('live_results', args=[election.id]), secure=True)
+            finally:
+                connection.close()
+
+        readers = [threading.Thread(target=reader_worker, args=(voters[i % len(voters)],))
+                   for i in range(options['readers'])]
+        workers = [threading.Thread(target=voter_worker) for _ in range(options['concurrency'])]
+
+        started = time.perf_counter()
+        for thread in readers + workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        voting_done.set()
+        for thread in readers:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        self.report(recorder, wall)
+
+        if not options['keep']:
+            election.delete()
+            User.objects.filter(id__in=[voter.id for voter in voters]).delete()
+            User.objects.filter(id=election.created_by_id).delete()
+
+    def report(self, recorder, wall):
+        self.stdout.write(f"\nWall time {wall:.2f}s")
+        header = f"{'endpoint':<18}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name in ['login', 'vote', 'cast_vote', 'position_results', 'live_results']:
+            samples = recorder.samples.get(name, [])
+            if not samples:
+                continue
+            latencies = sorted(elapsed for elapsed, _ in samples)
+            queries = sum(count for _, count in samples) / len(samples)
+            self.stdout.write(
+                f"{name:<18}{len(samples):>9}{recorder.errors[name]:>8}{len(samples) / wall:>9.1f}"
+                f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}"
+                f"{percentile(latencies, 99):>9.1f}{queries:>9.1f}"
+            )
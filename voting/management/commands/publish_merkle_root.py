@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from elections.models import Election
+from results.snapshots import is_closable
+from voting.merkle import publish_root
+
+
+class Command(BaseCommand):
+    help = 'Sign and publish the vote tree root of closed elections'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election', type=int, action='append', dest='elections',
+            help='Publish this election ID (can be repeated); defaults to closed, unpublished elections',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Publish even if voting or its grace period has not ended; later votes then have no proof',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['elections']:
+            elections = list(Election.objects.filter(id__in=options['elections']))
+            missing = set(options['elections']) - {election.id for election in elections}
+            if missing:
+                raise CommandError(f"Election(s) not found: {', '.join(map(str, sorted(missing)))}")
+            still_open = [election.id for election in elections if not is_closable(election, now)]
+            if still_open and not options['force']:
+                raise CommandError(
+                    f"Election(s) still open: {', '.join(map(str, still_open))}; use --force to publish anyway"
+                )
+        else:
+            elections = [
+                election
+                for election in Election.objects.filter(end_date__lte=now).exclude(merkletree__published_at__isnull=False)
+                if is_closable(election, now)
+            ]
+
+        for election in elections:
+            tree = publish_root(election)
+            self.stdout.write(self.style.SUCCESS(
+                f"{election.title}: {tree.published_size} vote(s), root {tree.published_root}"
+            ))
+        if not elections:
+            self.stdout.write('No elections to publish.')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from elections.models import Election
+from voting.merkle import rebuild_tree
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild vote tree nodes from recorded votes, e.g. for votes cast before the '
+        'tree existed. Clears any published root, so publish again afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election', type=int, action='append', dest='elections',
+            help='Only rebuild this election ID (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        elections = Election.objects.all()
+        if options['elections']:
+            elections = list(elections.filter(id__in=options['elections']))
+            missing = set(options['elections']) - {election.id for election in elections}
+            if missing:
+                raise CommandError(f"Election(s) not found: {', '.join(map(str, sorted(missing)))}")
+
+        for election in elections:
+            tree = rebuild_tree(election)
+            self.stdout.write(self.style.SUCCESS(f"{election.title}: {tree.size} vote(s)"))
@@ -0,0 +1,50 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from voting.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = 'Load audit entries saved to the fallback file while the database was unavailable'
+
+    def handle(self, *args, **options):
+        path = settings.AUDIT_FALLBACK_PATH
+        replaying = f'{path}.replaying'
+
+        # Move the file aside first so the audit writer starts a fresh one
+        if os.path.exists(path):
+            if os.path.exists(replaying):
+                with open(path, encoding='utf-8') as pending, open(replaying, 'a', encoding='utf-8') as target:
+                    target.write(pending.read())
+                os.remove(path)
+            else:
+                os.replace(path, replaying)
+
+        if not os.path.exists(replaying):
+            self.stdout.write("No audit entries to replay.")
+            return
+
+        entries = []
+        with open(replaying, encoding='utf-8') as fallback:
+            for line in fallback:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                entries.append(AuditLog(
+                    user_id=entry['user_id'],
+                    action=entry['action'],
+                    details=entry['details'],
+                    ip_address=entry['ip_address'],
+                    timestamp=parse_datetime(entry['timestamp']),
+                ))
+
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(entries, batch_size=1000)
+        os.remove(replaying)
+
+        self.stdout.write(self.style.SUCCESS(f"Replayed {len(entries)} audit entries."))
@@ -0,0 +1,255 @@
+"""
+Append-only Merkle tree over each election's vote hashes.
+
+Hashing follows RFC 6962: a leaf is ``sha256(0x00 || vote_hash)`` and an
+interior node ``sha256(0x01 || left || right)``. Only the roots of perfect
+(power-of-two) subtrees are stored, as ``MerkleNode(level, index)`` rows.
+Those nodes never change once written, so appending a leaf touches at most
+``log2(n)`` rows, and the root or an inclusion proof for any tree size is
+assembled from ``O(log n)`` stored nodes fetched in a single query.
+
+The root is published when the election closes (``manage.py
+publish_merkle_root``) and signed with the deployment's Ed25519 key
+(``MERKLE_SIGNING_KEY_FILE``, created by ``manage.py generate_merkle_key``).
+The public key is served with the roots, so voters and auditors can check
+a signature over ``signed_payload`` without any secret. Without a key the
+root is published unsigned.
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from voting.models import MerkleNode, MerkleTree, Vote
+
+
+def leaf_hash(vote_hash):
+    return hashlib.sha256(b'\x00' + bytes.fromhex(vote_hash)).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def subtree_keys(start, size):
+    """(level, index) of the perfect subtrees covering [start, start + size), left to right"""
+    keys = []
+    for level in range(size.bit_length() - 1, -1, -1):
+        if size & (1 << level):
+            keys.append((level, start >> level))
+            start += 1 << level
+    return keys
+
+
+def fold(hashes):
+    """Combine perfect-subtree roots, left to right, into the RFC 6962 root of their range"""
+    root = hashes[-1]
+    for left in reversed(hashes[:-1]):
+        root = node_hash(left, root)
+    return root
+
+
+def proof_ranges(index, size):
+    """Leaf ranges whose roots form the audit path of leaf ``index``, bottom-up"""
+    ranges = []
+    start = 0
+    while size > 1:
+        split = 1 << ((size - 1).bit_length() - 1)
+        if index < split:
+            ranges.append((start + split, size - split))
+            size = split
+        else:
+            ranges.append((start, split))
+            start += split
+            index -= split
+            size -= split
+    return list(reversed(ranges))
+
+
+def load_nodes(election_id, keys):
+    if not keys:
+        return {}
+    levels = {level for level, _ in keys}
+    indexes = {index for _, index in keys}
+    rows = MerkleNode.objects.filter(
+        election_id=election_id, level__in=levels, index__in=indexes
+    ).values_list('level', 'index', 'hash')
+    return {(level, index): value for level, index, value in rows if (level, index) in keys}
+
+
+def append_leaves(election, vote_hashes):
+    """
+    Append vote hashes to the election's tree; call inside the ballot transaction.
+
+    The tree row is locked for the rest of the transaction so leaf positions
+    are handed out in commit order.
+    """
+    tree, _ = MerkleTree.objects.select_for_update().get_or_create(election=election)
+    size = tree.size
+    nodes = load_nodes(election.id, set(subtree_keys(0, size)))
+    created = []
+
+    for vote_hash in vote_hashes:
+        level, index, value = 0, size, leaf_hash(vote_hash)
+        nodes[(level, index)] = value
+        created.append(MerkleNode(election=election, level=level, index=index, hash=value))
+        # Every odd index completes a subtree with its left sibling
+        while index & 1:
+            value = node_hash(nodes[(level, index - 1)], value)
+            level, index = level + 1, index >> 1
+            nodes[(level, index)] = value
+            created.append(MerkleNode(election=election, level=level, index=index, hash=value))
+        size += 1
+
+    MerkleNode.objects.bulk_create(created)
+    MerkleTree.objects.filter(pk=tree.pk).update(size=size)
+    return size
+
+
+def root_for(election_id, size):
+    if size == 0:
+        return hashlib.sha256(b'').hexdigest()
+    keys = subtree_keys(0, size)
+    nodes = load_nodes(election_id, set(keys))
+    return fold([nodes[key] for key in keys])
+
+
+def inclusion_proof(election, vote_hash):
+    """
+    Audit path for ``vote_hash`` against the published root, or the current
+    root while the election is still open. Returns None for unknown hashes.
+    """
+    tree = MerkleTree.objects.filter(election=election).first()
+    if tree is None:
+        return None
+    size = tree.published_size if tree.published_size is not None else tree.size
+
+    leaf = leaf_hash(vote_hash)
+    index = (
+        MerkleNode.objects.filter(election=election, level=0, hash=leaf, index__lt=size)
+        .values_list('index', flat=True)
+        .first()
+    )
+    if index is None:
+        return None
+
+    ranges = proof_ranges(index, size)
+    root_keys = subtree_keys(0, size)
+    keys = set(root_keys)
+    for start, length in ranges:
+        keys.update(subtree_keys(start, length))
+    nodes = load_nodes(election.id, keys)
+
+    return {
+        'election': election.id,
+        'vote_hash': vote_hash,
+        'leaf_hash': leaf,
+        'leaf_index': index,
+        'tree_size': size,
+        'path': [fold([nodes[key] for key in subtree_keys(start, length)]) for start, length in ranges],
+        'root': fold([nodes[key] for key in root_keys]),
+        'signature': tree.signature if tree.published_size is not None else None,
+    }
+
+
+def verify_inclusion(leaf, index, size, path, root):
+    """RFC 9162 section 2.1.3.2 inclusion proof verification"""
+    if index >= size:
+        return False
+    fn, sn, value = index, size - 1, leaf
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            value = node_hash(sibling, value)
+            while not fn & 1 and fn != 0:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            value = node_hash(value, sibling)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and value == root
+
+
+def signed_payload(election_id, size, root):
+    return f'election:{election_id}:size:{size}:root:{root}'
+
+
+@lru_cache
+def load_signing_key(path):
+    with open(path, 'rb') as key_file:
+        key = serialization.load_pem_private_key(key_file.read(), password=None)
+    if not isinstance(key, Ed25519PrivateKey):
+        raise ImproperlyConfigured(f'{path} does not hold an Ed25519 private key')
+    return key
+
+
+def signing_key():
+    """The deployment's Ed25519 private key, or None if none is configured"""
+    path = getattr(settings, 'MERKLE_SIGNING_KEY_FILE', '')
+    if not path or not os.path.exists(path):
+        return None
+    return load_signing_key(path)
+
+
+def public_key():
+    """Hex of the raw public key that verifies published roots, or '' without a key"""
+    key = signing_key()
+    if key is None:
+        return ''
+    return key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+
+
+def sign_root(election_id, size, root):
+    key = signing_key()
+    if key is None:
+        return ''
+    return key.sign(signed_payload(election_id, size, root).encode()).hex()
+
+
+def verify_signature(public_key_hex, election_id, size, root, signature):
+    """Whether ``signature`` (hex) signs the root with the key ``public_key_hex``"""
+    try:
+        key = Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_key_hex))
+        key.verify(bytes.fromhex(signature), signed_payload(election_id, size, root).encode())
+    except (InvalidSignature, ValueError):
+        return False
+    return True
+
+
+def publish_root(election):
+    """Freeze the tree size, then sign and store the root; returns the tree"""
+    with transaction.atomic():
+        tree, _ = MerkleTree.objects.select_for_update().get_or_create(election=election)
+        root = root_for(election.id, tree.size)
+        tree.published_size = tree.size
+        tree.published_root = root
+        tree.signature = sign_root(election.id, tree.size, root)
+        tree.published_at = timezone.now()
+        tree.save()
+    return tree
+
+
+def rebuild_tree(election, batch_size=10000):
+    """Rebuild an election's tree from its votes in id order (cast order)"""
+    with transaction.atomic():
+        MerkleNode.objects.filter(election=election).delete()
+        MerkleTree.objects.update_or_create(
+            election=election,
+            defaults={'size': 0, 'published_size': None, 'published_root': '', 'signature': '', 'published_at': None},
+        )
+        batch = []
+        for vote_hash in Vote.objects.filter(election=election).order_by('id').values_list('vote_hash', flat=True).iterator(chunk_size=batch_size):
+            batch.append(vote_hash)
+            if len(batch) >= batch_size:
+                append_leaves(election, batch)
+                batch = []
+        if batch:
+            append_leaves(election, batch)
+    return MerkleTree.objects.get(election=election)
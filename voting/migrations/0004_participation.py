@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def backfill_participation(apps, schema_editor):
+    Vote = apps.get_model('voting', 'Vote')
+    Participation = apps.get_model('voting', 'Participation')
+    Participation.objects.bulk_create([
+        Participation(voter_id=row['voter'], election_id=row['election'], cast_at=row['cast_at'])
+        for row in Vote.objects.values('voter', 'election').annotate(cast_at=Min('timestamp')).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0002_alter_candidate_photo'),
+        ('voting', '0003_vote_auditlog_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Participation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cast_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='vote',
+            name='vote_voter_election_idx',
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='election',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elections.election'),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='voter',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='participation',
+            unique_together={('voter', 'election')},
+        ),
+        migrations.RunPython(backfill_participation, migrations.RunPython.noop),
+    ]
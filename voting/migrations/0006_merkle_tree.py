@@ -0,0 +1,75 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:13
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_trees(apps, schema_editor):
+    # Same RFC 6962 hashing as voting.merkle, over existing votes in id order
+    Election = apps.get_model('elections', 'Election')
+    Vote = apps.get_model('voting', 'Vote')
+    MerkleTree = apps.get_model('voting', 'MerkleTree')
+    MerkleNode = apps.get_model('voting', 'MerkleNode')
+    for election_id in Election.objects.values_list('id', flat=True):
+        nodes = {}
+        created = []
+        size = 0
+        hashes = Vote.objects.filter(election_id=election_id).order_by('id').values_list('vote_hash', flat=True)
+        for vote_hash in hashes.iterator(chunk_size=10000):
+            level, index = 0, size
+            value = hashlib.sha256(b'\x00' + bytes.fromhex(vote_hash)).hexdigest()
+            nodes[(level, index)] = value
+            created.append(MerkleNode(election_id=election_id, level=level, index=index, hash=value))
+            while index & 1:
+                left = nodes.pop((level, index - 1))
+                value = hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(value)).hexdigest()
+                del nodes[(level, index)]
+                level, index = level + 1, index >> 1
+                nodes[(level, index)] = value
+                created.append(MerkleNode(election_id=election_id, level=level, index=index, hash=value))
+            size += 1
+            if len(created) >= 10000:
+                MerkleNode.objects.bulk_create(created)
+                created = []
+        MerkleNode.objects.bulk_create(created)
+        MerkleTree.objects.create(election_id=election_id, size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0002_alter_candidate_photo'),
+        ('voting', '0005_alter_auditlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MerkleTree',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('published_size', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('published_root', models.CharField(blank=True, max_length=64)),
+                ('signature', models.CharField(blank=True, max_length=255)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='elections.election')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MerkleNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('index', models.PositiveBigIntegerField()),
+                ('hash', models.CharField(max_length=64)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elections.election')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['election', 'hash'], name='merklenode_election_hash_idx')],
+                'unique_together': {('election', 'level', 'index')},
+            },
+        ),
+        migrations.RunPython(backfill_trees, migrations.RunPython.noop),
+    ]
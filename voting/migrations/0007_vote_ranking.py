@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0006_merkle_tree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='ranking',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0007_vote_ranking'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action',
+            field=models.CharField(choices=[('VOTE', 'Vote Cast'), ('LOGIN', 'User Login'), ('LOGOUT', 'User Logout'), ('LOGIN_THROTTLED', 'Login Throttled')], max_length=20),
+        ),
+    ]
@@ -1,5 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 import hashlib
 import uuid
 
@@ -10,31 +15,126 @@ class Vote(models.Model):
     election = models.ForeignKey('elections.Election', on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
     vote_hash = models.CharField(max_length=64)
+    # Ranked and approval positions: every preference in order, packed by
+    # voting.ballots.pack_ranking; ``candidate`` is the first of them
+    ranking = models.BinaryField(null=True, blank=True)
     
     class Meta:
         unique_together = ['voter', 'position', 'election']
+        indexes = [
+            # Per-candidate results counts and the grouped tally rebuild
+            models.Index(fields=['election', 'position', 'candidate'], name='vote_election_pos_cand_idx'),
+        ]
+    
+    def generate_hash(self):
+        unique_string = f"{self.voter_id}{self.candidate_id}{self.position_id}{uuid.uuid4()}"
+        return hashlib.sha256(unique_string.encode()).hexdigest()
     
     def save(self, *args, **kwargs):
         if not self.vote_hash:
-            unique_string = f"{self.voter.id}{self.candidate.id}{self.position.id}{uuid.uuid4()}"
-            self.vote_hash = hashlib.sha256(unique_string.encode()).hexdigest()
+            self.vote_hash = self.generate_hash()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Vote by {self.voter.username} for {self.candidate.name}"
 
+class Participation(models.Model):
+    """One row per voter per election, written with the ballot.
+    
+    Serves as the has-voted check, the guard against a second concurrent
+    ballot (through the unique key) and the turnout count.
+    """
+    voter = models.ForeignKey(User, on_delete=models.CASCADE)
+    election = models.ForeignKey('elections.Election', on_delete=models.CASCADE)
+    cast_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['voter', 'election']
+    
+    def __str__(self):
+        return f"{self.voter.username} voted in {self.election.title}"
+    
+    @classmethod
+    def has_voted(cls, voter, election):
+        return cls.objects.filter(voter=voter, election=election).exists()
+    
+    @classmethod
+    async def ahas_voted(cls, voter, election):
+        return await cls.objects.filter(voter=voter, election=election).aexists()
+    
+    @classmethod
+    def turnout(cls, election):
+        return cls.objects.filter(election=election).count()
+
+class MerkleTree(models.Model):
+    """Append-only Merkle tree over an election's vote hashes (RFC 6962 hashing)"""
+    election = models.OneToOneField('elections.Election', on_delete=models.CASCADE)
+    size = models.PositiveBigIntegerField(default=0)
+    published_size = models.PositiveBigIntegerField(null=True, blank=True)
+    published_root = models.CharField(max_length=64, blank=True)
+    signature = models.CharField(max_length=255, blank=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Merkle tree for {self.election.title} ({self.size} leaves)"
+
+class MerkleNode(models.Model):
+    """Root hash of the perfect subtree covering leaves [index * 2**level, (index + 1) * 2**level)"""
+    election = models.ForeignKey('elections.Election', on_delete=models.CASCADE)
+    level = models.PositiveSmallIntegerField()
+    index = models.PositiveBigIntegerField()
+    hash = models.CharField(max_length=64)
+    
+    class Meta:
+        unique_together = ['election', 'level', 'index']
+        indexes = [
+            # Leaf lookups when building inclusion proofs
+            models.Index(fields=['election', 'hash'], name='merklenode_election_hash_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.election_id}:{self.level}:{self.index}"
+
 class AuditLog(models.Model):
     ACTION_CHOICES = [
         ('VOTE', 'Vote Cast'),
         ('LOGIN', 'User Login'),
         ('LOGOUT', 'User Logout'),
+        ('LOGIN_THROTTLED', 'Login Throttled'),
     ]
     
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     details = models.TextField()
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # A user's recent activity
+            models.Index(fields=['user', '-timestamp'], name='auditlog_user_time_idx'),
+            # Activity of one kind over a time window
+            models.Index(fields=['action', '-timestamp'], name='auditlog_action_time_idx'),
+            # Time-range scans across all actions
+            models.Index(fields=['timestamp'], name='auditlog_time_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username if self.user else 'Unknown'} - {self.action} - {self.timestamp}"
+
+def invalidate_ballot(election_id):
+    """Drop the cached ballot fragment rendered by voting/vote.html"""
+    cache.delete(make_template_fragment_key('ballot', [election_id]))
+
+@receiver(post_save, sender='elections.Position')
+@receiver(post_delete, sender='elections.Position')
+def position_ballot_changed(sender, instance, **kwargs):
+    invalidate_ballot(instance.election_id)
+
+@receiver(post_save, sender='elections.Candidate')
+@receiver(post_delete, sender='elections.Candidate')
+def candidate_ballot_changed(sender, instance, **kwargs):
+    from elections.models import Position
+    election_id = Position.objects.filter(pk=instance.position_id).values_list('election_id', flat=True).first()
+    if election_id is not None:
+        invalidate_ballot(election_id)
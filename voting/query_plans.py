@@ -0,0 +1,59 @@
+import re
+from datetime import timedelta
+
+from django.db.models import Count
+from django.utils import timezone
+
+from voting.models import Vote, AuditLog, Participation
+from results.models import CandidateTally
+
+
+def hot_queries(election, position, candidate, voter):
+    """The voting, results and audit queries that must stay on an index"""
+    since = timezone.now() - timedelta(days=1)
+    return {
+        'results_candidate_count': Vote.objects.filter(
+            election=election, position=position, candidate=candidate
+        ),
+        'results_grouped_counts': Vote.objects.filter(
+            election=election
+        ).values('position', 'candidate').annotate(votes=Count('id')).order_by(),
+        'results_tally_read': CandidateTally.objects.filter(
+            election=election
+        ).values_list('position', 'candidate', 'votes'),
+        'has_voted': Participation.objects.filter(voter=voter, election=election),
+        'turnout': Participation.objects.filter(election=election),
+        'audit_user_history': AuditLog.objects.filter(user=voter).order_by('-timestamp')[:10],
+        'audit_action_history': AuditLog.objects.filter(
+            action='VOTE', timestamp__gte=since
+        ).order_by('-timestamp')[:50],
+    }
+
+
+def disable_seqscan(connection):
+    """Make the planner report whether an index is usable at all.
+
+    Seeded datasets are small enough that PostgreSQL would rightly choose a
+    sequential scan, which says nothing about production tables; turning
+    seqscans off for the current transaction means a seqscan only shows up
+    when no index can serve the query. SQLite without ANALYZE statistics
+    already prefers any usable index.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+
+def full_scans(plan, vendor):
+    """Return the tables a query plan reads with a sequential/full table scan"""
+    if vendor == 'postgresql':
+        return re.findall(r'Seq Scan on (\w+)', plan)
+    if vendor == 'sqlite':
+        # SQLite reports "SCAN <table>" for full scans and
+        # "SCAN <table> USING [COVERING] INDEX ..." for index scans
+        return [
+            match.group(1)
+            for match in re.finditer(r'SCAN (\w+)(?: USING (?:COVERING )?INDEX)?', plan)
+            if 'USING' not in match.group(0)
+        ]
+    return []
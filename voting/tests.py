@@ -1,3 +1,446 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from election_project import urls as project_urls
+from elections.models import Election, Position, Candidate
+from elections.seeding import seed_election
+from results.models import CandidateTally, ResultsVersion, rebuild_tallies
+from results.views import AsyncLiveResultsView
+from voting import archive
+from voting.archive import archive_audit_log, load_manifest, search_archive, verify_archive
+from voting.audit import AuditWriter, audit_entry
+from voting.ballots import AlreadyVoted, record_ballot
+from voting.merkle import (
+    append_leaves, inclusion_proof, leaf_hash, load_signing_key, node_hash, publish_root, rebuild_tree,
+    root_for, verify_inclusion, verify_signature,
+)
+from voting.models import AuditLog, MerkleTree, Participation, Vote
+from voting.query_plans import hot_queries, full_scans, disable_seqscan
+from voting.views import AsyncCastVoteView, AsyncVoteView
+
+
+class HotQueryPlanTests(TestCase):
+    """The voting, results and audit hot paths must not fall back to full table scans"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.election, cls.voters = seed_election(positions=3, candidates=4, voters=300)
+        AuditLog.objects.bulk_create([
+            AuditLog(user=voter, action='VOTE', details='Seeded audit entry')
+            for voter in cls.voters
+        ])
+        cls.position = Position.objects.filter(election=cls.election).first()
+        cls.candidate = Candidate.objects.filter(position=cls.position).first()
+
+    def test_hot_queries_use_indexes(self):
+        disable_seqscan(connection)
+        queries = hot_queries(self.election, self.position, self.candidate, self.voters[0])
+        for name, queryset in queries.items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                self.assertEqual(full_scans(plan, connection.vendor), [], plan)
+
+
+def reference_root(leaves):
+    """RFC 6962 MTH computed directly from the leaf hashes"""
+    if len(leaves) == 1:
+        return leaves[0]
+    split = 1 << ((len(leaves) - 1).bit_length() - 1)
+    return node_hash(reference_root(leaves[:split]), reference_root(leaves[split:]))
+
+
+class MerkleTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.election, _ = seed_election(positions=2, candidates=3, voters=21)
+        cls.hashes = list(Vote.objects.filter(election=cls.election).order_by('id').values_list('vote_hash', flat=True))
+
+    def test_incremental_root_matches_reference(self):
+        rebuild_tree(self.election)
+        for size in range(1, len(self.hashes) + 1):
+            with self.subTest(size=size):
+                expected = reference_root([leaf_hash(value) for value in self.hashes[:size]])
+                self.assertEqual(root_for(self.election.id, size), expected)
+
+    def test_appends_in_batches_match_rebuild(self):
+        root = root_for(self.election.id, MerkleTree.objects.get(election=self.election).size)
+        rebuild_tree(self.election)
+        self.assertEqual(root_for(self.election.id, len(self.hashes)), root)
+        extra = ['ab' * 32, 'cd' * 32, 'ef' * 32]
+        append_leaves(self.election, extra[:1])
+        append_leaves(self.election, extra[1:])
+        expected = reference_root([leaf_hash(value) for value in self.hashes + extra])
+        self.assertEqual(root_for(self.election.id, len(self.hashes) + 3), expected)
+
+    def test_every_vote_has_a_valid_proof_against_the_published_root(self):
+        tree = publish_root(self.election)
+        append_leaves(self.election, ['ab' * 32])
+        for vote_hash in self.hashes:
+            proof = inclusion_proof(self.election, vote_hash)
+            self.assertEqual(proof['tree_size'], tree.published_size)
+            self.assertEqual(proof['root'], tree.published_root)
+            self.assertTrue(verify_inclusion(proof['leaf_hash'], proof['leaf_index'], proof['tree_size'], proof['path'], proof['root']))
+            self.assertFalse(verify_inclusion(leaf_hash('00' * 32), proof['leaf_index'], proof['tree_size'], proof['path'], proof['root']))
+        self.assertIsNone(inclusion_proof(self.election, 'ab' * 32))
+
+
+    def test_published_root_is_signed_for_anyone_holding_the_public_key(self):
+        key_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, key_dir, ignore_errors=True)
+        self.addCleanup(load_signing_key.cache_clear)
+        with override_settings(MERKLE_SIGNING_KEY_FILE=os.path.join(key_dir, 'merkle.pem')):
+            self.assertEqual(publish_root(self.election).signature, '')
+
+            call_command('generate_merkle_key', stdout=io.StringIO())
+            with self.assertRaises(CommandError):
+                call_command('generate_merkle_key', stdout=io.StringIO())
+            tree = publish_root(self.election)
+            self.client.force_login(User.objects.create_user('auditor'))
+            published = self.client.get(reverse('merkle_root', args=[self.election.id]), secure=True).json()
+
+        # Only public data is needed to check the signature
+        args = (self.election.id, published['published_size'], published['published_root'], published['signature'])
+        self.assertEqual(published['signature'], tree.signature)
+        self.assertTrue(verify_signature(published['public_key'], *args))
+        self.assertFalse(verify_signature(published['public_key'], self.election.id, tree.published_size + 1, *args[2:]))
+        self.assertFalse(verify_signature(published['public_key'], self.election.id, tree.published_size, 'ab' * 32, args[3]))
+
+    def test_admin_publishes_only_closed_elections(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='a-long-unique-passphrase'))
+        tree = MerkleTree.objects.get(election=self.election)
+        url = reverse('admin:voting_merkletree_changelist')
+
+        self.client.post(url, {'action': 'publish', '_selected_action': [tree.pk]}, secure=True)
+        tree.refresh_from_db()
+        self.assertIsNone(tree.published_size)
+
+        Election.objects.filter(id=self.election.id).update(end_date=timezone.now() - timedelta(hours=1))
+        self.client.post(url, {'action': 'publish', '_selected_action': [tree.pk]}, secure=True)
+        tree.refresh_from_db()
+        self.assertEqual(tree.published_size, len(self.hashes))
+
+
+class AsyncUrls:
+    """The project URLs with the async views in front, as with ASYNC_VIEWS on"""
+    urlpatterns = [
+        path('voting/election/<int:election_id>/', AsyncVoteView.as_view(), name='vote'),
+        path('voting/election/<int:election_id>/cast/', AsyncCastVoteView.as_view(), name='cast_vote'),
+        path('results/election/<int:election_id>/live/', AsyncLiveResultsView.as_view(), name='live_results'),
+        path('', include(project_urls)),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncUrls)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.election, cls.voters = seed_election(positions=2, candidates=3, voters=2, turnout=0)
+        cls.positions = list(Position.objects.filter(election=cls.election).order_by('id'))
+        cls.ballot = {
+            f'position_{position.id}': Candidate.objects.filter(position=position).values_list('id', flat=True).first()
+            for position in cls.positions
+        }
+
+    def setUp(self):
+        # Ballot fragments cached by other tests may carry the same election id
+        cache.clear()
+
+    async def test_ballot_is_shown_and_cast_once(self):
+        await self.async_client.aforce_login(self.voters[0])
+        response = await self.async_client.get(reverse('vote', args=[self.election.id]), secure=True)
+        self.assertContains(response, f'name="position_{self.positions[0].id}"')
+
+        url = reverse('cast_vote', args=[self.election.id])
+        version = await ResultsVersion.acurrent(self.election.id)
+        response = await self.async_client.post(url, self.ballot, secure=True)
+        self.assertRedirects(response, reverse('election_list'), fetch_redirect_response=False)
+        self.assertEqual(await Vote.objects.filter(voter=self.voters[0]).acount(), 2)
+        self.assertTrue(await Participation.ahas_voted(self.voters[0], self.election))
+        self.assertEqual(await ResultsVersion.acurrent(self.election.id), version + 1)
+
+        await self.async_client.post(url, self.ballot, secure=True)
+        self.assertEqual(await Vote.objects.filter(voter=self.voters[0]).acount(), 2)
+
+    async def test_live_results_revalidate_with_etag(self):
+        await self.async_client.aforce_login(self.voters[1])
+        url = reverse('live_results', args=[self.election.id])
+        response = await self.async_client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['positions']), 2)
+
+        response = await self.async_client.get(url, secure=True, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_anonymous_users_are_sent_to_login(self):
+        response = await self.async_client.get(reverse('vote', args=[self.election.id]), secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(settings.LOGIN_URL))
+
+
+class TallyIncrementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.election = Election.objects.create(
+            title='Tally Election',
+            description='',
+            start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=1),
+            is_active=True,
+            created_by=User.objects.create_user('tally-owner'),
+        )
+        cls.positions = [
+            Position.objects.create(election=cls.election, title=title, description='')
+            for title in ['Mayor', 'Clerk']
+        ]
+        cls.candidates = {
+            position.id: [
+                Candidate.objects.create(position=position, name=f'{position.title} {number}', party='', manifesto='')
+                for number in range(3)
+            ]
+            for position in cls.positions
+        }
+        cls.voters = [User.objects.create_user(f'tally-voter-{number}') for number in range(4)]
+
+    def cast(self, voter, choices):
+        self.client.force_login(voter)
+        return self.client.post(reverse('cast_vote', args=[self.election.id]), {
+            f'position_{position.id}': self.candidates[position.id][choice].id
+            for position, choice in zip(self.positions, choices)
+        }, secure=True)
+
+    def tallies(self):
+        return dict(CandidateTally.objects.filter(election=self.election).values_list('candidate_id', 'votes'))
+
+    def test_ballots_increment_the_tallies_they_count(self):
+        for voter, choices in zip(self.voters, [(0, 1), (0, 2), (1, 2), (0, 2)]):
+            self.cast(voter, choices)
+
+        first, second = (self.candidates[position.id] for position in self.positions)
+        self.assertEqual(self.tallies(), {first[0].id: 3, first[1].id: 1, second[1].id: 1, second[2].id: 3})
+        live = self.tallies()
+        rebuild_tallies([self.election])
+        self.assertEqual(self.tallies(), live)
+
+
+class VoteTransactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.election, (cls.voter,) = seed_election(positions=2, candidates=2, voters=1, turnout=0)
+        cls.ballot = {
+            f'position_{position.id}': Candidate.objects.filter(position=position).values_list('id', flat=True).first()
+            for position in Position.objects.filter(election=cls.election)
+        }
+
+    def state(self):
+        return (
+            Vote.objects.filter(election=self.election).count(),
+            Participation.objects.filter(election=self.election).count(),
+            sorted(CandidateTally.objects.filter(election=self.election).values_list('candidate_id', 'votes')),
+            ResultsVersion.current(self.election.id),
+            list(MerkleTree.objects.filter(election=self.election).values_list('size', flat=True)),
+        )
+
+    def test_rejected_ballot_leaves_nothing_behind(self):
+        url = reverse('cast_vote', args=[self.election.id])
+        self.client.force_login(self.voter)
+        self.client.post(url, self.ballot, secure=True)
+        after_first = self.state()
+        self.assertEqual(after_first[:2], (2, 1))
+
+        # Without the participation row the ballot gets as far as the votes,
+        # whose unique constraint then rejects it halfway through the transaction
+        Participation.objects.filter(election=self.election).delete()
+        response = self.client.post(url, self.ballot, secure=True)
+
+        self.assertRedirects(response, reverse('election_list'), fetch_redirect_response=False)
+        self.assertEqual(self.state(), (after_first[0], 0, *after_first[2:]))
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)][-1],
+            'You have already voted in this election.',
+        )
+
+    def test_other_constraint_failures_are_not_reported_as_a_second_ballot(self):
+        position = Position.objects.filter(election=self.election).first()
+        candidate = Candidate.objects.filter(position=position).first()
+
+        # Two votes for one position break the vote constraint on a first ballot
+        with self.assertRaises(IntegrityError) as raised:
+            record_ballot(self.voter, self.election, [(position, [candidate]), (position, [candidate])])
+        self.assertNotIsInstance(raised.exception, AlreadyVoted)
+        self.assertEqual(self.state()[:2], (0, 0))
+
+        record_ballot(self.voter, self.election, [(position, [candidate])])
+        with self.assertRaises(AlreadyVoted):
+            record_ballot(self.voter, self.election, [(position, [candidate])])
+
+
+class BallotCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_editing_a_candidate_drops_the_cached_ballot(self):
+        election, (voter,) = seed_election(positions=1, candidates=2, voters=1, turnout=0)
+        candidate = Candidate.objects.filter(position__election=election).first()
+        url = reverse('vote', args=[election.id])
+        self.client.force_login(voter)
+        self.assertContains(self.client.get(url, secure=True), candidate.name)
+
+        # update() skips the signals, so the cached fragment is still served
+        Candidate.objects.filter(pk=candidate.pk).update(name='Renamed Quietly')
+        self.assertNotContains(self.client.get(url, secure=True), 'Renamed Quietly')
+
+        candidate.name = 'Renamed In Admin'
+        candidate.save()
+        self.assertContains(self.client.get(url, secure=True), 'Renamed In Admin')
+
+        Position.objects.create(election=election, title='Treasurer', description='')
+        self.assertContains(self.client.get(url, secure=True), 'Treasurer')
+
+
+AUDIT_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    AUDIT_LOG_BUFFERED=True, AUDIT_FALLBACK_PATH=os.path.join(AUDIT_DIR, 'audit_fallback.jsonl'),
+    AUDIT_FLUSH_BATCH_SIZE=3, AUDIT_FLUSH_INTERVAL_MS=60000,
+)
+class AuditWriterTests(TransactionTestCase):
+    """Flushes commit and close connections, so these run outside a test transaction"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(AUDIT_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.fallback = settings.AUDIT_FALLBACK_PATH
+        self.writer = AuditWriter()
+
+    def entry(self, details):
+        return audit_entry(user=None, action='LOGIN', details=details, ip_address='192.0.2.1')
+
+    def test_entries_are_buffered_until_flushed(self):
+        self.writer.entries.append(self.entry('first'))
+        self.assertEqual(AuditLog.objects.count(), 0)
+        self.writer.flush()
+        self.assertEqual(list(AuditLog.objects.values_list('details', flat=True)), ['first'])
+        self.assertEqual(self.writer.entries, [])
+
+    def test_full_buffer_wakes_the_flusher(self):
+        self.writer.record([self.entry('one'), self.entry('two')])
+        time.sleep(0.2)
+        self.assertEqual(AuditLog.objects.count(), 0)
+
+        self.writer.record([self.entry('three')])
+        deadline = time.monotonic() + 5
+        while AuditLog.objects.count() < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_failed_batches_are_spilled_and_replayed(self):
+        # Rejected by the database, and failing before it is even reached
+        rejected = {**self.entry('rejected'), 'timestamp': None}
+        malformed = {**self.entry('malformed'), 'unexpected': 'field'}
+        with self.assertLogs('voting.audit', 'ERROR'):
+            self.writer.entries.append(rejected)
+            self.writer.flush()
+            self.writer.entries.append(malformed)
+            self.writer.flush()
+        self.assertEqual(AuditLog.objects.count(), 0)
+        with open(self.fallback, encoding='utf-8') as fallback:
+            self.assertEqual([json.loads(line)['details'] for line in fallback], ['rejected', 'malformed'])
+
+        # Drop the entry the database can never take, then load the rest
+        with open(self.fallback, encoding='utf-8') as fallback:
+            lines = fallback.readlines()[1:]
+        with open(self.fallback, 'w', encoding='utf-8') as fallback:
+            fallback.writelines(lines)
+        call_command('replay_audit_log', stdout=io.StringIO())
+        self.assertEqual(list(AuditLog.objects.values_list('details', 'ip_address')), [('malformed', '192.0.2.1')])
+        self.assertFalse(os.path.exists(self.fallback))
+
+
+ARCHIVE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(AUDIT_ARCHIVE_DIR=ARCHIVE_DIR)
+class AuditArchiveTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(ARCHIVE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(ARCHIVE_DIR, ignore_errors=True)
+        self.now = timezone.now()
+
+    def add_entries(self, count, days_ago, details='entry'):
+        AuditLog.objects.bulk_create([
+            AuditLog(action='LOGIN', details=f'{details} {number}', timestamp=self.now - timedelta(days=days_ago, minutes=number % 60))
+            for number in range(count)
+        ], batch_size=5000)
+
+    def test_old_rows_are_written_checksummed_and_deleted(self):
+        self.add_entries(5, days_ago=120, details='old')
+        self.add_entries(4, days_ago=100, details='older')
+        self.add_entries(3, days_ago=1, details='recent')
+
+        call_command('archive_audit_log', '--days', '90', '--batch-size', '4', stdout=io.StringIO())
+
+        self.assertEqual(sorted(AuditLog.objects.values_list('details', flat=True)), ['recent 0', 'recent 1', 'recent 2'])
+        manifest = load_manifest()
+        self.assertEqual(sum(entry['rows'] for entry in manifest['files']), 9)
+        for entry in manifest['files']:
+            with gzip.open(os.path.join(ARCHIVE_DIR, entry['path']), 'rt', encoding='utf-8') as archived:
+                self.assertEqual(len(archived.readlines()), entry['rows'])
+        self.assertEqual(verify_archive(), [])
+        self.assertEqual(len(search_archive(text='older')), 4)
+
+        # A changed file no longer matches its checksum
+        with open(os.path.join(ARCHIVE_DIR, manifest['files'][0]['path']), 'ab') as archived:
+            archived.write(b'tampered')
+        self.assertEqual(verify_archive(), manifest['files'][:1])
+        with self.assertRaises(CommandError):
+            call_command('archive_audit_log', '--verify', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_row_committed_after_the_read_is_kept_for_the_next_run(self):
+        self.add_entries(6, days_ago=120)
+        late_id, timestamp = AuditLog.objects.order_by('id').values_list('id', 'timestamp')[2]
+        AuditLog.objects.filter(id=late_id).delete()
+        write_bucket = archive.write_bucket
+
+        def write_while_a_flush_commits(*args, **kwargs):
+            # A buffered flush took its id before the read and commits only now
+            if not AuditLog.objects.filter(id=late_id).exists():
+                AuditLog.objects.create(id=late_id, action='LOGIN', details='late', timestamp=timestamp)
+            return write_bucket(*args, **kwargs)
+
+        with mock.patch.object(archive, 'write_bucket', write_while_a_flush_commits):
+            self.assertEqual(archive_audit_log(self.now - timedelta(days=90)), 5)
+        self.assertEqual(list(AuditLog.objects.values_list('details', flat=True)), ['late'])
+        self.assertEqual(archive_audit_log(self.now - timedelta(days=90)), 1)
+        self.assertEqual(len(search_archive(text='late')), 1)
+
+    def test_batches_past_the_default_sqlite_parameter_limit(self):
+        self.add_entries(33000, days_ago=120)
+        self.assertEqual(archive_audit_log(self.now - timedelta(days=90)), 33000)
+        self.assertFalse(AuditLog.objects.exists())
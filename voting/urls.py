@@ -1,9 +1,19 @@
-from django.urls import path
-from .views import ElectionListView, VoteView, CastVoteView, VoteConfirmationView
+from django.conf import settings
+from django.urls import path, re_path
+from .views import (
+    ElectionListView, VoteView, CastVoteView, VoteConfirmationView,
+    MerkleRootView, InclusionProofView, AsyncVoteView, AsyncCastVoteView,
+)
+
+if settings.ASYNC_VIEWS:
+    VoteView, CastVoteView = AsyncVoteView, AsyncCastVoteView
 
 urlpatterns = [
     path('', ElectionListView.as_view(), name='election_list'),
     path('election/<int:election_id>/', VoteView.as_view(), name='vote'),
     path('election/<int:election_id>/cast/', CastVoteView.as_view(), name='cast_vote'),
+    path('election/<int:election_id>/merkle/', MerkleRootView.as_view(), name='merkle_root'),
+    re_path(r'^election/(?P<election_id>[0-9]+)/merkle/proof/(?P<vote_hash>[0-9a-fA-F]{64})/$',
+            InclusionProofView.as_view(), name='inclusion_proof'),
     path('confirmation/', VoteConfirmationView.as_view(), name='vote_confirmation'),
 ]
@@ -1,14 +1,22 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
 from django.views.generic import ListView, TemplateView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.utils import timezone
+from django.conf import settings
+from django.db.models import Prefetch
 from elections.models import Election, Position, Candidate
-from voting.models import Vote, AuditLog
+from voting.models import Participation, MerkleTree
+from voting.ballots import AlreadyVoted, ElectionClosed, InvalidSelection, build_ballot, read_selections, record_ballot, selected_ids
+from voting.merkle import inclusion_proof, public_key, root_for
+from election_project.async_views import AsyncLoginRequiredMixin, arender
+from election_project.db_router import ReadReplicaMixin
+from asgiref.sync import sync_to_async
 
-class ElectionListView(LoginRequiredMixin, ListView):
+class ElectionListView(ReadReplicaMixin, LoginRequiredMixin, ListView):
     model = Election
     template_name = 'voting/election_list.html'
     context_object_name = 'elections'
@@ -16,17 +24,27 @@ class ElectionListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return Election.objects.filter(is_active=True)
 
+def ballot_positions(election):
+    return Position.objects.filter(election=election).order_by('id').prefetch_related(
+        Prefetch(
+            'candidate_set',
+            queryset=Candidate.objects.filter(is_active=True).order_by('id'),
+            to_attr='active_candidates',
+        )
+    )
+
 class VoteView(LoginRequiredMixin, View):
     template_name = 'voting/vote.html'
     
     def get(self, request, election_id):
         try:
             election = Election.objects.get(id=election_id, is_active=True)
-            positions = Position.objects.filter(election=election)
+            
+            # Only evaluated when the cached ballot fragment is missing
+            positions = ballot_positions(election)
             
             # Check if user has already voted in this election
-            user_votes = Vote.objects.filter(voter=request.user, election=election)
-            if user_votes.exists():
+            if Participation.has_voted(request.user, election):
                 messages.warning(request, "You have already voted in this election.")
                 return redirect('election_list')
             
@@ -42,6 +60,7 @@ class VoteView(LoginRequiredMixin, View):
             context = {
                 'election': election,
                 'positions': positions,
+                'ballot_cache_timeout': settings.BALLOT_CACHE_TIMEOUT,
             }
             return render(request, self.template_name, context)
             
@@ -55,7 +74,7 @@ class CastVoteView(LoginRequiredMixin, View):
             election = Election.objects.get(id=election_id, is_active=True)
             
             # Check if user has already voted
-            if Vote.objects.filter(voter=request.user, election=election).exists():
+            if Participation.has_voted(request.user, election):
                 messages.error(request, "You have already voted in this election.")
                 return redirect('election_list')
             
@@ -65,35 +84,27 @@ class CastVoteView(LoginRequiredMixin, View):
                 messages.error(request, "Voting is not allowed at this time.")
                 return redirect('election_list')
             
-            # Process votes for each position
-            positions = Position.objects.filter(election=election)
-            vote_count = 0
+            # Collect the submitted selections and check every candidate with one query
+            positions = list(Position.objects.filter(election=election))
+            try:
+                selections = read_selections(request.POST, positions)
+                candidates = Candidate.objects.filter(
+                    id__in=selected_ids(selections), position__election=election
+                ).in_bulk()
+                ballot = build_ballot(positions, selections, candidates)
+            except InvalidSelection as invalid:
+                messages.error(request, f"Invalid candidate for {invalid.position.title}")
+                return redirect('vote', election_id=election_id)
             
-            for position in positions:
-                candidate_id = request.POST.get(f'position_{position.id}')
-                if candidate_id:
-                    try:
-                        candidate = Candidate.objects.get(id=candidate_id, position=position)
-                        
-                        # Create vote
-                        vote = Vote.objects.create(
-                            voter=request.user,
-                            candidate=candidate,
-                            position=position,
-                            election=election
-                        )
-                        vote_count += 1
-                        
-                        # Log the vote
-                        AuditLog.objects.create(
-                            user=request.user,
-                            action='VOTE',
-                            details=f'Voted for {candidate.name} in {position.title}'
-                        )
-                        
-                    except Candidate.DoesNotExist:
-                        messages.error(request, f"Invalid candidate for {position.title}")
-                        return redirect('vote', election_id=election_id)
+            # Write the whole ballot, its tallies and audit entries together
+            try:
+                vote_count = record_ballot(request.user, election, ballot)
+            except AlreadyVoted:
+                messages.error(request, "You have already voted in this election.")
+                return redirect('election_list')
+            except ElectionClosed:
+                messages.error(request, "Voting has closed for this election.")
+                return redirect('election_list')
             
             if vote_count > 0:
                 messages.success(request, f"Thank you for voting! You cast {vote_count} vote(s).")
@@ -106,5 +117,110 @@ class CastVoteView(LoginRequiredMixin, View):
             messages.error(request, "Election not found.")
             return redirect('election_list')
 
+class AsyncVoteView(AsyncLoginRequiredMixin, View):
+    """``VoteView`` for ASGI deployments: checks run on the async ORM"""
+    template_name = 'voting/vote.html'
+    
+    async def get(self, request, election_id):
+        try:
+            election = await Election.objects.aget(id=election_id, is_active=True)
+        except Election.DoesNotExist:
+            messages.error(request, "Election not found or not active.")
+            return redirect('election_list')
+        
+        if await Participation.ahas_voted(request.user, election):
+            messages.warning(request, "You have already voted in this election.")
+            return redirect('election_list')
+        
+        now = timezone.now()
+        if now < election.start_date:
+            messages.error(request, "This election has not started yet.")
+            return redirect('election_list')
+        if now > election.end_date:
+            messages.error(request, "This election has ended.")
+            return redirect('election_list')
+        
+        context = {
+            'election': election,
+            'positions': ballot_positions(election),
+            'ballot_cache_timeout': settings.BALLOT_CACHE_TIMEOUT,
+        }
+        return await arender(request, self.template_name, context)
+
+class AsyncCastVoteView(AsyncLoginRequiredMixin, View):
+    """``CastVoteView`` for ASGI deployments: checks run on the async ORM,
+    the ballot transaction in a worker thread"""
+    
+    async def post(self, request, election_id):
+        try:
+            election = await Election.objects.aget(id=election_id, is_active=True)
+        except Election.DoesNotExist:
+            messages.error(request, "Election not found.")
+            return redirect('election_list')
+        
+        if await Participation.ahas_voted(request.user, election):
+            messages.error(request, "You have already voted in this election.")
+            return redirect('election_list')
+        
+        now = timezone.now()
+        if now < election.start_date or now > election.end_date:
+            messages.error(request, "Voting is not allowed at this time.")
+            return redirect('election_list')
+        
+        positions = [position async for position in Position.objects.filter(election=election)]
+        try:
+            selections = read_selections(request.POST, positions)
+            candidates = await Candidate.objects.filter(
+                id__in=selected_ids(selections), position__election=election
+            ).ain_bulk()
+            ballot = build_ballot(positions, selections, candidates)
+        except InvalidSelection as invalid:
+            messages.error(request, f"Invalid candidate for {invalid.position.title}")
+            return redirect('vote', election_id=election_id)
+        
+        # The async ORM has no transactions, so the write runs as one sync unit
+        try:
+            vote_count = await sync_to_async(record_ballot)(request.user, election, ballot)
+        except AlreadyVoted:
+            messages.error(request, "You have already voted in this election.")
+            return redirect('election_list')
+        except ElectionClosed:
+            messages.error(request, "Voting has closed for this election.")
+            return redirect('election_list')
+        
+        if vote_count > 0:
+            messages.success(request, f"Thank you for voting! You cast {vote_count} vote(s).")
+        else:
+            messages.warning(request, "No votes were cast.")
+        return redirect('election_list')
+
 class VoteConfirmationView(LoginRequiredMixin, TemplateView):
     template_name = 'voting/vote_confirmation.html'
+
+class MerkleRootView(LoginRequiredMixin, View):
+    """Current vote tree root, plus the signed root and its public key once the election is closed"""
+    
+    def get(self, request, election_id):
+        election = get_object_or_404(Election, id=election_id)
+        tree = MerkleTree.objects.filter(election=election).first()
+        size = tree.size if tree else 0
+        return JsonResponse({
+            'election': election.id,
+            'tree_size': size,
+            'root': root_for(election.id, size),
+            'published_size': tree.published_size if tree else None,
+            'published_root': tree.published_root if tree else '',
+            'signature': tree.signature if tree else '',
+            'public_key': public_key(),
+            'published_at': tree.published_at if tree else None,
+        })
+
+class InclusionProofView(LoginRequiredMixin, View):
+    """Audit path proving a vote hash is a leaf of the election's tree"""
+    
+    def get(self, request, election_id, vote_hash):
+        election = get_object_or_404(Election, id=election_id)
+        proof = inclusion_proof(election, vote_hash.lower())
+        if proof is None:
+            return JsonResponse({'error': 'Vote hash not found in this election.'}, status=404)
+        return JsonResponse(proof)